@@ -0,0 +1,35 @@
+"""index finished jobs
+
+Finished jobs are deleted once past their retention (app.jobs); the pruner
+finds them by status and finished_at. Built CONCURRENTLY so workers can
+keep claiming jobs.
+
+Revision ID: 3b7e9c1f5a28
+Revises: 8f2c4a6d1b93
+Create Date: 2026-10-18 21:26:44.190382
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b7e9c1f5a28'
+down_revision: Union[str, None] = '8f2c4a6d1b93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Concurrent builds need autocommit. A build cut short (e.g. a deploy
+    # timeout) keeps its name as an INVALID index, hence the drop first.
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_jobs_finished', table_name='jobs', postgresql_concurrently=True, if_exists=True)
+        op.create_index('ix_jobs_finished', 'jobs', ['status', 'finished_at'], unique=False, postgresql_concurrently=True, postgresql_where=sa.text("status IN ('succeeded', 'failed')"))
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_jobs_finished', table_name='jobs', postgresql_concurrently=True, if_exists=True)
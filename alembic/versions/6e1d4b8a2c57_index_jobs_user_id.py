@@ -0,0 +1,35 @@
+"""index jobs.user_id
+
+Deleting a user cascades to their jobs, which without an index scans the
+whole jobs table. Partial, as most jobs belong to no user. Built
+CONCURRENTLY so workers can keep claiming jobs.
+
+Revision ID: 6e1d4b8a2c57
+Revises: 3b7e9c1f5a28
+Create Date: 2026-10-19 09:14:37.620815
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6e1d4b8a2c57'
+down_revision: Union[str, None] = '3b7e9c1f5a28'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Not IF NOT EXISTS: an interrupted build would have left an INVALID index
+    # under this name, which must be rebuilt rather than kept.
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_jobs_user_id', table_name='jobs', postgresql_concurrently=True, if_exists=True)
+        op.create_index('ix_jobs_user_id', 'jobs', ['user_id'], unique=False, postgresql_concurrently=True, postgresql_where=sa.text('user_id IS NOT NULL'))
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_jobs_user_id', table_name='jobs', postgresql_concurrently=True, if_exists=True)
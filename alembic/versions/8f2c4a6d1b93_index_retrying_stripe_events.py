@@ -0,0 +1,34 @@
+"""index retrying stripe_events
+
+Failed events are parked as 'retrying' and requeued at the start of every
+consumer run. Built CONCURRENTLY so webhooks can keep recording events.
+
+Revision ID: 8f2c4a6d1b93
+Revises: d2a7f4c9e815
+Create Date: 2026-10-18 20:41:09.552731
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8f2c4a6d1b93'
+down_revision: Union[str, None] = 'd2a7f4c9e815'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # In an autocommit block for CONCURRENTLY; the drop clears an INVALID
+    # index an interrupted attempt at this upgrade may have left.
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_stripe_events_retrying', table_name='stripe_events', postgresql_concurrently=True, if_exists=True)
+        op.create_index('ix_stripe_events_retrying', 'stripe_events', ['id'], unique=False, postgresql_concurrently=True, postgresql_where=sa.text("status = 'retrying'"))
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_stripe_events_retrying', table_name='stripe_events', postgresql_concurrently=True, if_exists=True)
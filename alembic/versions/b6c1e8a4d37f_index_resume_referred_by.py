@@ -0,0 +1,34 @@
+"""index resumes.referred_by
+
+Partner exports (GET /resumes/export?referred_by=...) select a referrer's
+resumes. Built CONCURRENTLY so the table stays writable.
+
+Revision ID: b6c1e8a4d37f
+Revises: a3f9d6e1b274
+Create Date: 2026-10-18 17:05:41.318207
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b6c1e8a4d37f'
+down_revision: Union[str, None] = 'a3f9d6e1b274'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Outside a transaction, as CONCURRENTLY requires. An interrupted build of
+    # this index leaves it INVALID under the same name; rebuild it.
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_resumes_referred_by', table_name='resumes', postgresql_concurrently=True, if_exists=True)
+        op.create_index('ix_resumes_referred_by', 'resumes', ['referred_by'], unique=False, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_resumes_referred_by', table_name='resumes', postgresql_concurrently=True, if_exists=True)
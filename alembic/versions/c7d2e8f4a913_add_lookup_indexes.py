@@ -0,0 +1,63 @@
+"""add lookup indexes
+
+Indexes for the columns every request filters on: resumes.user_id, the
+resume_id foreign key of each section table (used by the document renderer and
+section syncs) and a unique lower(email) index for case-insensitive login.
+
+The indexes are built CONCURRENTLY so the tables stay writable. The
+lower(email) index fails if two accounts differ only in email case; merge
+those first.
+
+Revision ID: c7d2e8f4a913
+Revises: 9e3f5b1c7a20
+Create Date: 2026-10-18 12:40:05.227913
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7d2e8f4a913'
+down_revision: Union[str, None] = '9e3f5b1c7a20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+FOREIGN_KEY_INDEXES = [
+    ('ix_resumes_user_id', 'resumes', 'user_id'),
+    ('ix_educations_resume_id', 'educations', 'resume_id'),
+    ('ix_experiences_resume_id', 'experiences', 'resume_id'),
+    ('ix_driving_licenses_resume_id', 'driving_licenses', 'resume_id'),
+    ('ix_training_awards_resume_id', 'training_awards', 'resume_id'),
+    ('ix_others_resume_id', 'others', 'resume_id'),
+]
+
+
+def upgrade() -> None:
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block. None of
+    # these indexes exist before this revision, so any found under their names
+    # is left over from an interrupted run of it, possibly INVALID (for
+    # lower(email): duplicate emails), neither used nor enforced. Each is
+    # dropped and built afresh rather than kept by IF NOT EXISTS.
+    with op.get_context().autocommit_block():
+        for name, table, column in FOREIGN_KEY_INDEXES:
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
+            op.create_index(name, table, [column], unique=False, postgresql_concurrently=True)
+        op.drop_index('ix_users_email_lower', table_name='users', postgresql_concurrently=True, if_exists=True)
+        op.create_index(
+            'ix_users_email_lower',
+            'users',
+            [sa.text('lower(email)')],
+            unique=True,
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_users_email_lower', table_name='users', postgresql_concurrently=True, if_exists=True)
+        for name, table, _ in reversed(FOREIGN_KEY_INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
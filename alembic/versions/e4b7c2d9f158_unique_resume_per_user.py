@@ -0,0 +1,45 @@
+"""unique resume per user
+
+Makes ix_resumes_user_id unique, so one resume per user is enforced by the
+database and resume creation can use INSERT ... ON CONFLICT DO NOTHING.
+
+The unique index is built CONCURRENTLY next to the old one and then takes its
+name. It fails if a user already has several resumes; remove the extra ones
+first.
+
+Revision ID: e4b7c2d9f158
+Revises: 5d8a1f3c6e42
+Create Date: 2026-10-18 15:21:09.640833
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4b7c2d9f158'
+down_revision: Union[str, None] = '5d8a1f3c6e42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _swap_user_id_index(unique: bool) -> None:
+    # CREATE/DROP INDEX CONCURRENTLY cannot run inside a transaction block.
+    with op.get_context().autocommit_block():
+        # A failed concurrent build (duplicate user_ids) leaves an INVALID
+        # index behind; swapping that in would leave ON CONFLICT (user_id)
+        # without an arbiter, so start over instead of reusing it.
+        op.drop_index('ix_resumes_user_id_new', table_name='resumes', postgresql_concurrently=True, if_exists=True)
+        op.create_index('ix_resumes_user_id_new', 'resumes', ['user_id'], unique=unique, postgresql_concurrently=True)
+        op.drop_index('ix_resumes_user_id', table_name='resumes', postgresql_concurrently=True, if_exists=True)
+        op.execute('ALTER INDEX ix_resumes_user_id_new RENAME TO ix_resumes_user_id')
+
+
+def upgrade() -> None:
+    _swap_user_id_index(unique=True)
+
+
+def downgrade() -> None:
+    _swap_user_id_index(unique=False)
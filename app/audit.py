@@ -0,0 +1,132 @@
+"""Schema performance audit.
+
+    python -m app.audit
+
+1. Static: every foreign key column in Base.metadata should lead some index,
+   otherwise joins/deletes through it scan the child table.
+2. Dynamic: EXPLAIN the queries the app issues on its hot paths with sequential
+   scans disabled. If Postgres still picks a Seq Scan, no index can serve the
+   query, whatever the table size is today.
+3. Contract: the resume documents rendered by Postgres (app/documents.py) must
+   be byte for byte what schemas.Resume produces from the ORM objects.
+
+Exits non-zero when anything is flagged, so it can run in CI against a
+migrated database.
+"""
+import asyncio
+import json
+import sys
+
+from sqlalchemy import func, select, text
+from sqlalchemy.dialects import postgresql
+
+from app.database import AsyncSessionFactory, engine
+from app.documents import get_resume_document, resume_document
+from app.models import (
+    Base,
+    DrivingLicense,
+    Education,
+    LanguageSkill,
+    Others,
+    Resume,
+    StripePayment,
+    TrainingAward,
+    User,
+)
+from app.models.resume import Experience
+from app.schemas import resume as schemas
+
+
+def unindexed_foreign_keys() -> list[str]:
+    problems = []
+    for table in Base.metadata.sorted_tables:
+        leading_columns = {
+            next(iter(index.columns)).name
+            for index in table.indexes
+            if index.columns
+        }
+        leading_columns |= {
+            next(iter(constraint.columns)).name
+            for constraint in table.constraints
+            if getattr(constraint, "columns", None) and not hasattr(constraint, "elements")
+        }
+        for fk in table.foreign_keys:
+            if fk.parent.name not in leading_columns:
+                problems.append(f"{table.name}.{fk.parent.name} -> {fk.target_fullname} has no index")
+    return problems
+
+
+def hot_queries():
+    """(label, statement) for the lookups the routers issue on every request."""
+    yield "resume document by id/user", select(resume_document()).where(Resume.id == 1, Resume.user_id == 1)
+    yield "resumes by user", select(Resume).where(Resume.user_id == 1)
+    yield "user by email", select(User).where(func.lower(User.email) == func.lower("someone@example.com"))
+    yield "payment by intent id", select(StripePayment).where(StripePayment.stripe_payment_intent_id == "pi_x")
+    # What selectin loading / section syncs issue against each child table
+    for model in (Experience, Education, LanguageSkill, DrivingLicense, TrainingAward, Others):
+        yield f"{model.__tablename__} by resume_id", select(model).where(model.resume_id.in_([1, 2, 3]))
+
+
+def sequential_scans(plan: dict) -> list[str]:
+    scans = []
+    if plan.get("Node Type") == "Seq Scan":
+        scans.append(plan.get("Relation Name", "?"))
+    for child in plan.get("Plans", []):
+        scans.extend(sequential_scans(child))
+    return scans
+
+
+async def explain_hot_queries() -> list[str]:
+    problems = []
+    dialect = postgresql.psycopg.dialect()
+    async with engine.connect() as connection:
+        await connection.execute(text("SET enable_seqscan = off"))
+        for label, statement in hot_queries():
+            sql = str(statement.compile(dialect=dialect, compile_kwargs={"literal_binds": True}))
+            result = await connection.execute(text(f"EXPLAIN (FORMAT JSON) {sql}"))
+            plan = result.scalar()
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            for relation in sequential_scans(plan[0]["Plan"]):
+                problems.append(f"{label}: sequential scan on {relation}")
+        await connection.rollback()
+    return problems
+
+
+async def mismatched_resume_documents(sample: int = 200) -> list[str]:
+    problems = []
+    async with AsyncSessionFactory() as session:
+        # The documents render timestamps in UTC; have the ORM load them that way too
+        await session.execute(text("SET LOCAL TIME ZONE 'UTC'"))
+        result = await session.execute(select(Resume).order_by(Resume.id.desc()).limit(sample))
+        for resume in result.scalars().all():
+            model = schemas.Resume.model_validate(resume)
+            # Only experiences have an ordered relationship; documents order every section by id
+            for section in ("experiences", "education", "driving_license", "training_awards", "others"):
+                getattr(model, section).sort(key=lambda item: item.id)
+            expected = model.model_dump_json()
+            actual = (await get_resume_document(session, resume.id, resume.user_id)).document
+            if actual != expected:
+                at = next((i for i, (a, b) in enumerate(zip(actual, expected)) if a != b), min(len(actual), len(expected)))
+                problems.append(
+                    f"resume {resume.id}: document differs at offset {at}: "
+                    f"{actual[max(at - 20, 0):at + 20]!r} != {expected[max(at - 20, 0):at + 20]!r}"
+                )
+        await session.rollback()
+    return problems
+
+
+async def main() -> int:
+    problems = unindexed_foreign_keys()
+    problems += await explain_hot_queries()
+    problems += await mismatched_resume_documents()
+    await engine.dispose()
+    for problem in problems:
+        print(f"FLAG  {problem}")
+    if not problems:
+        print("OK    no unindexed foreign keys, sequential scans on hot queries or resume document mismatches")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,532 @@
+"""Benchmarks of the resume read and write paths.
+
+    python -m app.benchmarks [json] [--resumes 5] [--experiences 60] [--seconds 3]
+    python -m app.benchmarks pdf [--renders 48] [--experiences 10]
+    python -m app.benchmarks loaders [--resumes 5] [--requests 500]
+    python -m app.benchmarks commits
+    python -m app.benchmarks logins [--logins 8] [--readers 4] [--seconds 3]
+    python -m app.benchmarks auth [--tokens 10000] [--requests 50000]
+    python -m app.benchmarks sql [--requests 2000] [--database]
+
+json: requests per second of GET /resumes/ with large resumes, per JSON strategy.
+
+Serves the same synthetic resumes through a throwaway app, in process (httpx
+over ASGI, no sockets, no database), once per way the app has produced JSON:
+
+    stdlib       response_model + FastAPI's stock JSONResponse (before orjson)
+    orjson       response_model + app.responses.ORJSONResponse (the default now)
+    model_dump   app.responses.model_response (the PUT endpoints)
+    passthrough  pre-rendered bytes, as GET /resumes/ returns Postgres' document
+
+The numbers only compare serialization paths; they leave out the database.
+
+pdf: resume PDFs rendered per second by app.pdf's worker function on a
+process pool of 1 worker and of every core, and the rate per core.
+
+loaders: p50/p99 latency and SQL statements per load of one resume, through
+the relationship loading GET /resumes/{id} used to do (a SELECT per section)
+and through the single-query document it does now. Needs the database
+(DATABASE_URL) and reads the resumes already in it.
+
+commits: transactions committed and SQL statements run by each resume write
+endpoint, called through the app in process against the database. Creates a
+throwaway user and resume and deletes both afterwards.
+
+logins: latency of resume GETs while concurrent logins verify bcrypt hashes,
+with bcrypt run inline in the handler (as before the password pool) and on
+app.utils' bounded pool. Also counts logins answered 503 because the pool
+was full. In process, no database.
+
+auth: time per call of the get_current_user dependency over that many
+distinct valid tokens, with the verified-token cache and without it (every
+call decodes and checks the JWT).
+
+sql: per-call cost of turning the hot lookups into SQL: compiling a fresh
+select() every time, a fresh select() found in SQLAlchemy's compiled cache
+(it still has to be built and cache-keyed), and the lambda statements the
+models use. With --database, also the execution latency of those statements
+against the database with and without psycopg server-side prepared
+statements, i.e. the planning Postgres skips for a prepared statement.
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+
+import httpx
+from fastapi import FastAPI, Response
+from fastapi.responses import JSONResponse
+from sqlalchemy import delete, func, lambda_stmt, select
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.database import SQLALCHEMY_DATABASE_URL, AsyncSessionFactory, engine, get_connect_args
+from app.dependencies import auth
+from app.documents import get_resume_document, resume_document
+from app.main import app as main_app
+from app.metrics import RequestStats, current_request_stats, db_commits, db_query_duration
+from app.models.resume import Resume
+from app.models.stripe_payment import StripePayment
+from app.models.users import User
+from app.pdf import DEFAULT_TEMPLATE, _render_pdf
+from app.responses import ORJSONResponse, model_response
+from app.schemas import resume as schemas
+from app.utils import PasswordHasherBusy, create_access_token, password_context, verify_and_update_password
+
+
+def synthetic_resumes(count: int, experiences: int) -> list[dict]:
+    start = date(2010, 1, 1)
+    resumes = []
+    for resume_id in range(1, count + 1):
+        def section(n: int, **fields) -> list[dict]:
+            return [{"id": i, "resume_id": resume_id, **fields} for i in range(1, n + 1)]
+
+        resumes.append({
+            "id": resume_id,
+            "user_id": resume_id,
+            "resume_title": "Senior Software Engineer",
+            "first_name": "Alex",
+            "last_name": "Morgan",
+            "date_of_birth": date(1990, 5, 17),
+            "nationality": "British",
+            "address_line_1": "1 High Street",
+            "address_line_2": None,
+            "postal_code": "AB1 2CD",
+            "city": "London",
+            "country": "United Kingdom",
+            "email_address": "alex@example.com",
+            "contact_number": "+44 20 7946 0000",
+            "responsibilities": "Leading a team of engineers. " * 10,
+            "referred_by": "RSR Academy",
+            "job_applied_for": "Staff Engineer",
+            "resume_image": None,
+            "resume_image_variants": None,
+            "version": 12,
+            "updated_at": datetime(2026, 10, 18, 12, 0, tzinfo=timezone.utc),
+            "experiences": [
+                {
+                    "id": i,
+                    "resume_id": resume_id,
+                    "employer": f"Employer {i}",
+                    "website": "https://example.com",
+                    "location": "London",
+                    "occupation": "Engineer",
+                    "from_date": start + timedelta(days=90 * i),
+                    "to_date": start + timedelta(days=90 * i + 80),
+                    "currently_working": False,
+                    "about_company": "A company that builds things. " * 5,
+                    "responsibilities": "Designed, built and ran services. " * 15,
+                }
+                for i in range(1, experiences + 1)
+            ],
+            "education": section(3, title_of_qualification="BSc Computer Science", organization_name="University",
+                                 from_date=date(2008, 9, 1), to_date=date(2011, 6, 30), city="Leeds", country="UK"),
+            "language_skills": {"id": 1, "resume_id": resume_id, "language": "English", "other_languages": "French, German"},
+            "driving_license": section(1, license_type="B", license_issued_date=date(2009, 1, 1), license_expiry_date=date(2039, 1, 1)),
+            "training_awards": section(5, title="Award", awarding_institute="Institute", from_date=date(2015, 1, 1),
+                                       to_date=None, location="London"),
+            "others": section(4, sectiontitle="Volunteering", title="Mentor", description="Mentoring juniors. " * 5),
+        })
+    return resumes
+
+
+def build_app(resumes: list[dict]) -> FastAPI:
+    app = FastAPI()
+    prerendered = model_response(list[schemas.Resume], resumes).body
+
+    @app.get("/stdlib", response_model=list[schemas.Resume], response_class=JSONResponse)
+    async def stdlib():
+        return resumes
+
+    @app.get("/orjson", response_model=list[schemas.Resume], response_class=ORJSONResponse)
+    async def orjson_response():
+        return resumes
+
+    @app.get("/model_dump")
+    async def model_dump():
+        return model_response(list[schemas.Resume], resumes)
+
+    @app.get("/passthrough")
+    async def passthrough():
+        return Response(prerendered, media_type="application/json")
+
+    return app
+
+
+async def requests_per_second(client: httpx.AsyncClient, path: str, seconds: float) -> float:
+    await client.get(path)  # warm-up
+    count, started = 0, time.perf_counter()
+    while (elapsed := time.perf_counter() - started) < seconds:
+        response = await client.get(path)
+        response.raise_for_status()
+        count += 1
+    return count / elapsed
+
+
+async def json_benchmark(args):
+    app = build_app(synthetic_resumes(args.resumes, args.experiences))
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        size = len((await client.get("/passthrough")).content)
+        print(f"{args.resumes} resumes x {args.experiences} experiences, {size / 1024:.0f} KiB per response")
+        baseline = None
+        for path in ("/stdlib", "/orjson", "/model_dump", "/passthrough"):
+            rps = await requests_per_second(client, path, args.seconds)
+            baseline = baseline or rps
+            print(f"{path[1:]:<12} {rps:8.0f} req/s  {rps / baseline:5.2f}x")
+
+
+def renders_per_second(workers: int, document: bytes, renders: int, output_dir: Path) -> float:
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        def render_all(count: int):
+            futures = [
+                executor.submit(_render_pdf, document, DEFAULT_TEMPLATE, output_dir / f"{i}.pdf", None)
+                for i in range(count)
+            ]
+            return [future.result() for future in futures]
+
+        render_all(workers)  # warm-up: start the workers and load the templates
+        started = time.perf_counter()
+        render_all(renders)
+        return renders / (time.perf_counter() - started)
+
+
+def pdf_benchmark(args):
+    document = model_response(schemas.Resume, synthetic_resumes(1, args.experiences)[0]).body
+    cores = os.cpu_count() or 1
+    with tempfile.TemporaryDirectory() as output_dir:
+        size = _render_pdf(document, DEFAULT_TEMPLATE, Path(output_dir) / "size.pdf", None)
+        print(f"1 resume x {args.experiences} experiences, {size / 1024:.0f} KiB per PDF, {cores} cores")
+        for workers in sorted({1, cores}):
+            rate = renders_per_second(workers, document, args.renders, Path(output_dir))
+            print(f"{workers:>3} worker(s) {rate:8.1f} renders/s  {rate / workers:6.1f} renders/s per core")
+
+
+def percentile(samples: list[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def latency_summary(samples: list[float]) -> str:
+    return f"p50 {percentile(samples, 0.5) * 1000:7.2f} ms  p99 {percentile(samples, 0.99) * 1000:7.2f} ms"
+
+
+@contextmanager
+def counting_statements():
+    """RequestStats collecting the SQL statements and commits run inside the block."""
+    stats = RequestStats()
+    token = current_request_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        current_request_stats.reset(token)
+
+
+async def load_with_relationships(db, resume_id: int, user_id: int) -> bytes:
+    # The resume row, then one selectin query per section, then Pydantic
+    resume = await Resume.get_owned(db, resume_id, user_id)
+    return schemas.Resume.model_validate(resume).model_dump_json().encode()
+
+
+async def load_document(db, resume_id: int, user_id: int) -> bytes:
+    return (await get_resume_document(db, resume_id, user_id)).document.encode()
+
+
+async def loaders_benchmark(args):
+    async with AsyncSessionFactory() as session:
+        result = await session.execute(select(Resume.id, Resume.user_id).order_by(Resume.id).limit(args.resumes))
+        owners = result.all()
+    if not owners:
+        print("No resumes in the database to load")
+        return
+
+    print(f"{args.requests} loads over {len(owners)} resume(s)")
+    for name, load in (("selectin", load_with_relationships), ("document", load_document)):
+        latencies, statements = [], 0
+        for i in range(-len(owners), args.requests):  # the first round warms up
+            resume_id, user_id = owners[i % len(owners)]
+            with counting_statements() as stats:
+                started = time.perf_counter()
+                async with AsyncSessionFactory() as session:
+                    await load(session, resume_id, user_id)
+                elapsed = time.perf_counter() - started
+            if i >= 0:
+                latencies.append(elapsed)
+                statements += stats.queries
+        print(f"{name:<9} {latency_summary(latencies)}  {statements / args.requests:5.1f} statements/load")
+    await engine.dispose()
+
+
+def write_calls(resume: dict) -> list[tuple[str, str, dict | None]]:
+    """(method, path, JSON body) of the resume write endpoints, in an order that works on a new resume."""
+    base = f"/resumes/{resume['id']}"
+    experiences = [
+        {"employer": f"Employer {i}", "location": "London", "occupation": "Engineer",
+         "from_date": f"201{i}-01-01", "to_date": f"201{i}-12-31", "responsibilities": "Built things."}
+        for i in range(3)
+    ]
+    return [
+        ("PUT", base, {
+            "resume_title": "Benchmark", "first_name": "Bench", "last_name": "Mark", "date_of_birth": "1990-01-01",
+            "nationality": "British", "address_line_1": "1 High Street", "postal_code": "AB1 2CD", "city": "London",
+            "country": "United Kingdom", "contact_number": "0", "responsibilities": "Benchmarking.",
+        }),
+        ("PUT", f"{base}/experiences/multi/", {"job_applied_for": "Engineer", "experiences": experiences}),
+        ("PUT", f"{base}/education/multi/", {"educations": [
+            {"title_of_qualification": "BSc", "organization_name": "University", "from_date": "2008-09-01",
+             "to_date": "2011-06-30", "city": "Leeds", "country": "UK"},
+        ]}),
+        ("PUT", f"{base}/language-skills/", {"language": "English", "other_languages": "French"}),
+        ("PUT", f"{base}/driving-license/", {"license_type": "B", "license_issued_date": "2009-01-01",
+                                              "license_expiry_date": "2039-01-01"}),
+        ("PUT", f"{base}/training-award/", {"title": "Award", "awarding_institute": "Institute",
+                                             "from_date": "2015-01-01", "location": "London"}),
+        ("PUT", f"{base}/others/", {"sectiontitle": "Volunteering", "title": "Mentor", "description": "Mentoring."}),
+        ("GET", base, None),
+        ("DELETE", base, None),
+    ]
+
+
+async def commits_benchmark(args):
+    email = f"benchmark-{uuid.uuid4().hex}@example.invalid"
+    async with AsyncSessionFactory() as session:
+        user_id = await User.create_if_absent(session, first_name="Benchmark", last_name="User", email=email, password="!", phone="0")
+        await session.commit()
+
+    headers = {"Authorization": f"Bearer {create_access_token(email, user_id)}"}
+    transport = httpx.ASGITransport(app=main_app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", headers=headers) as client:
+            async def call(method: str, path: str, body: dict | None) -> httpx.Response:
+                commits, statements = db_commits.value, db_query_duration.snapshot()["count"]
+                response = await client.request(method, path, json=body)
+                response.raise_for_status()
+                commits, statements = db_commits.value - commits, db_query_duration.snapshot()["count"] - statements
+                print(f"{method:<6} {path:<42} {commits:3d} commit(s) {statements:4d} statement(s)")
+                return response
+
+            resume = (await call("POST", "/resumes/", {"resume_title": "Benchmark"})).json()
+            for method, path, body in write_calls(resume):
+                await call(method, path, body)
+    finally:
+        async with AsyncSessionFactory() as session:
+            resume = await Resume.get_one(session, [Resume.user_id == user_id])
+            if resume is not None:
+                await session.delete(resume)
+            await session.execute(delete(User).where(User.id == user_id))
+            await session.commit()
+        await engine.dispose()
+
+
+def build_login_app(hashed: str, resume_body: bytes) -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/inline")
+    async def inline_login():
+        return {"verified": password_context.verify("benchmark", hashed)}
+
+    @app.post("/pool")
+    async def pool_login():
+        try:
+            verified, _ = await verify_and_update_password("benchmark", hashed)
+        except PasswordHasherBusy:
+            return Response(status_code=503)
+        return {"verified": verified}
+
+    @app.get("/resume")
+    async def resume():
+        return Response(resume_body, media_type="application/json")
+
+    return app
+
+
+async def logins_benchmark(args):
+    hashed = password_context.hash("benchmark")
+    resume_body = model_response(schemas.Resume, synthetic_resumes(1, args.experiences)[0]).body
+    transport = httpx.ASGITransport(app=build_login_app(hashed, resume_body))
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        print(f"{args.logins} clients logging in, {args.readers} reading a resume, {args.seconds:.0f}s per mode")
+        for mode in ("inline", "pool"):
+            latencies, logins, rejected = [], 0, 0
+            deadline = time.perf_counter() + args.seconds
+
+            async def log_in():
+                nonlocal logins, rejected
+                while time.perf_counter() < deadline:
+                    response = await client.post(f"/{mode}")
+                    if response.status_code == 503:
+                        rejected += 1
+                    else:
+                        response.raise_for_status()
+                        logins += 1
+
+            async def read():
+                # Timed from when each GET was due, so time spent waiting for
+                # a blocked event loop counts (a GET every 10ms per reader)
+                due = time.perf_counter()
+                while due < deadline:
+                    await asyncio.sleep(max(due - time.perf_counter(), 0))
+                    (await client.get("/resume")).raise_for_status()
+                    latencies.append(time.perf_counter() - due)
+                    due += 0.01
+
+            # Readers first, so they are in flight when the logins start
+            await asyncio.gather(*(read() for _ in range(args.readers)), *(log_in() for _ in range(args.logins)))
+            print(
+                f"{mode:<7} resume GET {latency_summary(latencies)}  "
+                f"{logins / args.seconds:6.1f} logins/s  {rejected} rejected"
+            )
+
+
+async def auth_benchmark(args):
+    tokens = [create_access_token(f"user{i}@example.com", i) for i in range(args.tokens)]
+    requests = random.choices(tokens, k=args.requests)
+    print(f"{args.requests} requests over {args.tokens} distinct tokens")
+    shared_cache = auth.token_cache
+    try:
+        for label, cache in (("no cache", auth.VerifiedTokenCache(0)), ("cache", auth.VerifiedTokenCache(args.tokens))):
+            auth.token_cache = cache
+            for token in tokens:  # warm-up, and fills the cache
+                await auth.get_current_user(token)
+            started = time.perf_counter()
+            for token in requests:
+                await auth.get_current_user(token)
+            per_call = (time.perf_counter() - started) / args.requests
+            print(f"{label:<9} {per_call * 1e6:8.2f} µs per request")
+    finally:
+        auth.token_cache = shared_cache
+
+
+# The hot lookups as the models write them (lambda statements) and as they
+# were written before (a fresh select() per call)
+
+def user_by_email(email: str):
+    return lambda_stmt(lambda: select(User).where(func.lower(User.email) == func.lower(email)))
+
+
+def resume_by_owner(resume_id: int, user_id: int):
+    return lambda_stmt(lambda: select(Resume).where(Resume.id == resume_id, Resume.user_id == user_id))
+
+
+def resume_document_by_owner(resume_id: int, user_id: int):
+    return lambda_stmt(
+        lambda: select(resume_document(), Resume.version, Resume.updated_at)
+        .where(Resume.id == resume_id, Resume.user_id == user_id)
+    )
+
+
+def payment_by_intent_id(intent_id: str):
+    return lambda_stmt(lambda: select(StripePayment).where(StripePayment.stripe_payment_intent_id == intent_id))
+
+
+HOT_LOOKUPS = [
+    (
+        "user by email",
+        lambda i: select(User).where(func.lower(User.email) == func.lower(f"user{i}@example.com")),
+        lambda i: user_by_email(f"user{i}@example.com"),
+    ),
+    (
+        "resume by id/user",
+        lambda i: select(Resume).where(Resume.id == i, Resume.user_id == i),
+        lambda i: resume_by_owner(i, i),
+    ),
+    (
+        "resume document",
+        lambda i: select(resume_document(), Resume.version, Resume.updated_at).where(Resume.id == i, Resume.user_id == i),
+        lambda i: resume_document_by_owner(i, i),
+    ),
+    (
+        "payment by intent id",
+        lambda i: select(StripePayment).where(StripePayment.stripe_payment_intent_id == f"pi_{i}"),
+        lambda i: payment_by_intent_id(f"pi_{i}"),
+    ),
+]
+
+
+def compile_time(build, dialect, compiled_cache: dict | None, requests: int) -> float:
+    # _compile_w_cache is what Connection.execute() does with a statement
+    build(0)._compile_w_cache(dialect, compiled_cache=compiled_cache, column_keys=[])  # warm-up
+    started = time.perf_counter()
+    for i in range(1, requests + 1):
+        build(i)._compile_w_cache(dialect, compiled_cache=compiled_cache, column_keys=[])
+    return (time.perf_counter() - started) / requests
+
+
+def compile_benchmark(args):
+    dialect = engine.dialect
+    print(f"µs per statement over {args.requests} calls, each with new parameters")
+    print(f"{'':<22} {'compile':>9} {'cached':>9} {'lambda':>9}")
+    for label, fresh, cached_lambda in HOT_LOOKUPS:
+        timings = (
+            compile_time(fresh, dialect, None, args.requests),
+            compile_time(fresh, dialect, {}, args.requests),
+            compile_time(cached_lambda, dialect, {}, args.requests),
+        )
+        print(f"{label:<22} " + " ".join(f"{timing * 1e6:9.1f}" for timing in timings))
+
+
+async def planning_benchmark(args):
+    print(f"\nexecution latency over {args.requests} calls")
+    for label, threshold in (("unprepared", None), ("prepared", 1)):
+        bench_engine = create_async_engine(
+            SQLALCHEMY_DATABASE_URL,
+            connect_args={**get_connect_args(), "prepare_threshold": threshold},
+        )
+        async with bench_engine.connect() as connection:
+            for lookup, _, build in HOT_LOOKUPS:
+                await connection.execute(build(0))  # warm-up, and prepares it
+                latencies = []
+                for i in range(1, args.requests + 1):
+                    started = time.perf_counter()
+                    await connection.execute(build(i))
+                    latencies.append(time.perf_counter() - started)
+                print(f"{label:<11} {lookup:<22} {latency_summary(latencies)}")
+        await bench_engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("benchmark", nargs="?", choices=("json", "pdf", "loaders", "commits", "logins", "auth", "sql"), default="json")
+    parser.add_argument("--resumes", type=int, default=5)
+    parser.add_argument("--experiences", type=int)
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--renders", type=int, default=48)
+    parser.add_argument("--requests", type=int)
+    parser.add_argument("--tokens", type=int, default=10_000)
+    parser.add_argument("--database", action="store_true")
+    parser.add_argument("--logins", type=int, default=8)
+    parser.add_argument("--readers", type=int, default=4)
+    args = parser.parse_args()
+
+    if args.benchmark == "pdf":
+        args.experiences = args.experiences or 10
+        pdf_benchmark(args)
+    elif args.benchmark == "loaders":
+        args.requests = args.requests or 500
+        asyncio.run(loaders_benchmark(args))
+    elif args.benchmark == "commits":
+        asyncio.run(commits_benchmark(args))
+    elif args.benchmark == "logins":
+        args.experiences = args.experiences or 10
+        asyncio.run(logins_benchmark(args))
+    elif args.benchmark == "auth":
+        args.requests = args.requests or 50_000
+        asyncio.run(auth_benchmark(args))
+    elif args.benchmark == "sql":
+        args.requests = args.requests or 2000
+        compile_benchmark(args)
+        if args.database:
+            asyncio.run(planning_benchmark(args))
+    else:
+        args.experiences = args.experiences or 60
+        asyncio.run(json_benchmark(args))
+
+
+if __name__ == "__main__":
+    main()
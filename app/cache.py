@@ -0,0 +1,203 @@
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import NamedTuple
+
+from app.metrics import (
+    resume_cache_evictions,
+    resume_cache_hits,
+    resume_cache_invalidations,
+    resume_cache_misses,
+)
+
+logger = logging.getLogger(__name__)
+
+REDIS_URL = os.getenv("REDIS_URL")
+# redis, memory or none; without REDIS_URL nothing is cached unless memory is asked for
+RESUME_CACHE_BACKEND = os.getenv("RESUME_CACHE_BACKEND", "redis" if REDIS_URL else "none")
+RESUME_CACHE_TTL_SECONDS = int(os.getenv("RESUME_CACHE_TTL_SECONDS", "300"))
+RESUME_CACHE_MAX_BYTES = int(os.getenv("RESUME_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+
+class CachedResponse(NamedTuple):
+    """Final response bytes plus the validator headers sent with them."""
+
+    body: bytes
+    headers: dict[str, str]
+
+    def to_bytes(self) -> bytes:
+        return json.dumps(self.headers).encode() + b"\n" + self.body
+
+    @classmethod
+    def from_bytes(cls, value: bytes) -> "CachedResponse":
+        headers, body = value.split(b"\n", 1)
+        return cls(body, json.loads(headers))
+
+
+class ResponseCache:
+    """Read-through cache of serialized responses.
+
+    Backends implement _get/_set/_delete on raw bytes. The public methods keep
+    the hit/miss counters and never raise: a broken cache degrades to reading
+    from the database, it doesn't fail the request.
+    """
+
+    async def get(self, key: str) -> CachedResponse | None:
+        try:
+            value = await self._get(key)
+        except Exception:
+            logger.exception("Resume cache read failed")
+            value = None
+        if value is None:
+            resume_cache_misses.inc()
+            return None
+        resume_cache_hits.inc()
+        return CachedResponse.from_bytes(value)
+
+    async def set(self, key: str, response: CachedResponse):
+        try:
+            await self._set(key, response.to_bytes())
+        except Exception:
+            logger.exception("Resume cache write failed")
+
+    async def delete(self, *keys: str):
+        try:
+            await self._delete(*keys)
+        except Exception:
+            logger.exception("Resume cache invalidation failed")
+        resume_cache_invalidations.inc(len(keys))
+
+    async def close(self):
+        pass
+
+    async def _get(self, key: str) -> bytes | None:
+        raise NotImplementedError
+
+    async def _set(self, key: str, value: bytes):
+        raise NotImplementedError
+
+    async def _delete(self, *keys: str):
+        raise NotImplementedError
+
+
+class NullResponseCache(ResponseCache):
+    async def _get(self, key: str) -> bytes | None:
+        return None
+
+    async def _set(self, key: str, value: bytes):
+        pass
+
+    async def _delete(self, *keys: str):
+        pass
+
+
+class LRUResponseCache(ResponseCache):
+    """Per-process LRU bounded by the total size of the cached bytes.
+
+    Each worker keeps its own copy, and a superseded entry is only dropped
+    early by the worker that made the change (the others let it age out), so
+    prefer the redis backend with several workers. Only touched from the
+    event loop, and no method awaits, so it needs no lock.
+    """
+
+    def __init__(self, max_bytes: int = RESUME_CACHE_MAX_BYTES, ttl: int = RESUME_CACHE_TTL_SECONDS):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.size = 0
+        self._entries: OrderedDict[str, tuple[float, bytes]] = OrderedDict()
+
+    def _pop(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry[1])
+
+    async def _get(self, key: str) -> bytes | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            self._pop(key)
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def _set(self, key: str, value: bytes):
+        self._pop(key)
+        if len(value) > self.max_bytes:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self.size += len(value)
+        while self.size > self.max_bytes:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self.size -= len(evicted)
+            resume_cache_evictions.inc()
+
+    async def _delete(self, *keys: str):
+        for key in keys:
+            self._pop(key)
+
+
+class RedisResponseCache(ResponseCache):
+    """Cache shared by every worker, on any server speaking the Redis protocol.
+
+    Needs the redis package, which is only imported when no client is passed
+    in; tests can hand over any stand-in with async get/set/delete. Eviction
+    is left to the server (maxmemory-policy allkeys-lru), so it doesn't show
+    up in resume_cache_evictions_total.
+    """
+
+    def __init__(self, client=None, url: str | None = REDIS_URL, ttl: int = RESUME_CACHE_TTL_SECONDS):
+        if client is None:
+            import redis.asyncio as redis
+
+            client = redis.Redis.from_url(url or "redis://localhost:6379/0")
+        self.ttl = ttl
+        self._client = client
+
+    async def _get(self, key: str) -> bytes | None:
+        return await self._client.get(key)
+
+    async def _set(self, key: str, value: bytes):
+        await self._client.set(key, value, ex=self.ttl)
+
+    async def _delete(self, *keys: str):
+        await self._client.delete(*keys)
+
+    async def close(self):
+        close = getattr(self._client, "aclose", None) or getattr(self._client, "close", None)
+        if close is not None:
+            await close()
+
+
+def resume_cache_key(user_id: int, resume_id: int, version: int) -> str:
+    # The owner is part of the key, so a hit needs no ownership query. So is
+    # the version: a response is only ever stored under the version it was
+    # rendered from, so a read racing a write can't cache stale bytes under
+    # the new version.
+    return f"resume:v2:{user_id}:{resume_id}:{version}"
+
+
+_resume_cache: ResponseCache | None = None
+
+
+def get_resume_cache() -> ResponseCache:
+    """Cache selected by RESUME_CACHE_BACKEND: 'redis' (the default with REDIS_URL), 'memory' or 'none' (the default otherwise)."""
+    global _resume_cache
+    if _resume_cache is None:
+        if RESUME_CACHE_BACKEND == "redis":
+            _resume_cache = RedisResponseCache()
+        elif RESUME_CACHE_BACKEND == "none":
+            _resume_cache = NullResponseCache()
+        else:
+            _resume_cache = LRUResponseCache()
+    return _resume_cache
+
+
+async def close_resume_cache():
+    global _resume_cache
+    if _resume_cache is not None:
+        await _resume_cache.close()
+        _resume_cache = None
@@ -1,27 +1,94 @@
+import hashlib
+import logging
+import os
+import time
+from collections import OrderedDict
 from typing import Annotated
 
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from ..database import get_async_db
+from ..models.users import User
 from ..utils import decode_access_token
 
 oauth2_bearer = OAuth2PasswordBearer(tokenUrl='auth/')
 
+logger = logging.getLogger(__name__)
+
+# Verified tokens are cached until their `exp`, so repeat requests from the
+# same session skip the HMAC check and JSON parsing.
+TOKEN_CACHE_SIZE = int(os.getenv('TOKEN_CACHE_SIZE', 10_000))
+
+
+class VerifiedTokenCache:
+    """LRU of verified token claims keyed by token digest, bounded by size and by token expiry."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._entries: OrderedDict[bytes, tuple[float, dict]] = OrderedDict()
+
+    def get(self, token: str) -> dict | None:
+        key = hashlib.sha256(token.encode()).digest()
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, user = entry
+        if expires_at <= time.time():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return user
+
+    def set(self, token: str, user: dict, expires_at: float):
+        if self.maxsize <= 0:
+            return
+        key = hashlib.sha256(token.encode()).digest()
+        self._entries[key] = (expires_at, user)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+
+token_cache = VerifiedTokenCache(TOKEN_CACHE_SIZE)
+
  
 async def get_current_user(token: Annotated[str, Depends(oauth2_bearer)]):
-    print("get current user")
+    cached_user = token_cache.get(token)
+    if cached_user is not None:
+        return cached_user
+
     try:
         payload = decode_access_token(token)
-        print(payload)
-        email: str | None = payload.get('sub')
-        user_id: int | None = payload.get('id')
-    
-        if email is None or user_id is None:
-            print("email or user_id is None")
-            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Could not validate user.')
-        
-        return {'email': email, 'id': user_id}
     except JWTError as e:
-        print(f"JWT error: {str(e)}")
+        logger.info(f"JWT error: {str(e)}")
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Could not validate user.')
+
+    email: str | None = payload.get('sub')
+    user_id: int | None = payload.get('id')
+
+    if email is None or user_id is None:
+        logger.info("Token is missing email or user_id")
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Could not validate user.')
+
+    user = {'email': email, 'id': user_id}
+    expires_at = payload.get('exp')
+    if expires_at is not None:
+        token_cache.set(token, user, float(expires_at))
+    return user
+
+
+async def get_staff_user(
+    current_user: Annotated[dict, Depends(get_current_user)],
+    db: Annotated[AsyncSession, Depends(get_async_db)],
+) -> User:
+    """The current user, who must be staff or a superuser (403 otherwise)."""
+    user = await User.get_by_id(db, current_user['id'])
+    if user is None or not (user.is_staff or user.is_superuser):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail='Not allowed.')
+    return user
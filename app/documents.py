@@ -0,0 +1,122 @@
+"""Resume JSON rendered by Postgres.
+
+resume_document() builds, in one query, exactly the bytes
+schemas.Resume(...).model_dump_json() would produce for the resume: the
+schema's fields in its order, compact separators and Pydantic's formats for
+timestamps. The read endpoints return those bytes as they are, without
+building ORM objects or running Pydantic. The contract is checked against the
+ORM/Pydantic path by `python -m app.audit`.
+"""
+from sqlalchemy import JSON, DateTime, Text, case, cast, func, lambda_stmt, literal, select
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.resume import (
+    DrivingLicense,
+    Education,
+    Experience,
+    LanguageSkill,
+    Others,
+    Resume,
+    TrainingAward,
+)
+from app.schemas import resume as schemas
+
+
+def _iso_timestamp(column):
+    # Pydantic's format: UTC with a Z suffix, microseconds only when non-zero
+    utc = func.timezone("UTC", column)
+    fraction = case((func.date_trunc("second", column) == column, literal("")), else_=func.to_char(utc, ".US"))
+    return case((column.is_(None), None), else_=func.to_char(utc, 'YYYY-MM-DD"T"HH24:MI:SS') + fraction + "Z")
+
+
+def _compact_object(column):
+    # json columns keep the text they were stored with (ASCII-escaped, with
+    # spaces); re-render flat string maps compactly, in stored order
+    entries = func.json_each_text(column).table_valued("key", "value", with_ordinality="ordinality")
+    pairs = select(
+        func.string_agg(
+            cast(func.to_json(entries.c.key), Text) + ":" + cast(func.to_json(entries.c.value), Text),
+            aggregate_order_by(literal(","), entries.c.ordinality),
+        )
+    )
+    return case((column.is_(None), None), else_=cast("{" + func.coalesce(pairs.scalar_subquery(), "") + "}", JSON))
+
+
+def _field(column):
+    if isinstance(column.type, DateTime):
+        return _iso_timestamp(column)
+    if isinstance(column.type, JSON):
+        return _compact_object(column)
+    return column
+
+
+def _fields(model, schema, sections: dict | None = None) -> list:
+    """One labelled expression per field of `schema`, in the schema's order."""
+    sections = sections or {}
+    return [
+        (sections[name] if name in sections else _field(model.__table__.c[name])).label(name)
+        for name in schema.model_fields
+    ]
+
+
+def _section(model, schema, many: bool = True):
+    rows = select(*_fields(model, schema)).where(model.resume_id == Resume.id).correlate(Resume)
+    if many:
+        rows = rows.subquery("section")
+        items = func.string_agg(
+            cast(func.row_to_json(rows.table_valued()), Text),
+            aggregate_order_by(literal(","), rows.c.id),
+        )
+        return select(cast("[" + func.coalesce(items, "") + "]", JSON)).scalar_subquery()
+    rows = rows.limit(1).subquery("section")
+    return select(func.row_to_json(rows.table_valued())).scalar_subquery()
+
+
+def resume_document():
+    """Text of the whole resume document, for use with FROM resumes."""
+    document = (
+        select(*_fields(Resume, schemas.Resume, {
+            "experiences": _section(Experience, schemas.Experience),
+            "education": _section(Education, schemas.Education),
+            "language_skills": _section(LanguageSkill, schemas.LanguageSkill, many=False),
+            "driving_license": _section(DrivingLicense, schemas.DrivingLicense),
+            "training_awards": _section(TrainingAward, schemas.TrainingAward),
+            "others": _section(Others, schemas.Others),
+        }))
+        .correlate(Resume)
+        .subquery("document")
+    )
+    return select(cast(func.row_to_json(document.table_valued()), Text)).scalar_subquery().label("document")
+
+
+async def get_resume_document(db: AsyncSession, resume_id: int, user_id: int):
+    """(document, version, updated_at) of an owned resume, or None."""
+    query = lambda_stmt(
+        lambda: select(resume_document(), Resume.version, Resume.updated_at)
+        .where(Resume.id == resume_id, Resume.user_id == user_id)
+    )
+    result = await db.execute(query)
+    return result.one_or_none()
+
+
+async def get_user_resume_documents(db: AsyncSession, user_id: int):
+    """(id, document, version, updated_at) of every resume of a user, ordered by id."""
+    query = lambda_stmt(
+        lambda: select(Resume.id, resume_document(), Resume.version, Resume.updated_at)
+        .where(Resume.user_id == user_id)
+        .order_by(Resume.id)
+    )
+    result = await db.execute(query)
+    return result.all()
+
+
+async def stream_resume_documents(db: AsyncSession, where_conditions: list, batch_size: int = 100):
+    """(id, first_name, last_name, document, version) of matching resumes by id, from a server-side cursor."""
+    query = (
+        select(Resume.id, Resume.first_name, Resume.last_name, resume_document(), Resume.version)
+        .where(*where_conditions)
+        .order_by(Resume.id)
+        .execution_options(yield_per=batch_size)
+    )
+    return await db.stream(query)
@@ -0,0 +1,106 @@
+"""Bulk resume export: many resumes as PDFs in one streamed ZIP archive.
+
+Resumes are read from a server-side cursor EXPORT_BATCH_SIZE at a time; each
+batch is rendered in parallel on the PDF pool (through the render cache, so
+unchanged resumes aren't rendered again) and added to the archive, which is
+written to the response as it grows. Memory stays bounded by one batch
+whatever the number of resumes.
+"""
+import asyncio
+import io
+import logging
+import os
+import re
+import unicodedata
+import zipfile
+from pathlib import Path
+from typing import AsyncIterator
+
+from starlette.concurrency import run_in_threadpool
+
+from app.database import AsyncSessionFactory
+from app.documents import stream_resume_documents
+from app.pdf import DEFAULT_TEMPLATE, PDF_WORKERS, PdfRendererBusy
+from app.render_cache import RenderKey, render_cached_resume_pdf
+
+logger = logging.getLogger(__name__)
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", 2 * PDF_WORKERS))
+# How long an export waits when interactive downloads have the PDF pool full
+EXPORT_BUSY_RETRY_SECONDS = float(os.getenv("EXPORT_BUSY_RETRY_SECONDS", "0.5"))
+
+
+class _ZipStream(io.RawIOBase):
+    """Write-only, unseekable sink for ZipFile; drain() hands over what was written so far.
+
+    Being unseekable makes ZipFile write sizes in data descriptors after each
+    entry instead of seeking back to the local header.
+    """
+
+    def __init__(self):
+        self._chunks: list[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def archive_name(resume_id: int, first_name: str | None, last_name: str | None) -> str:
+    name = unicodedata.normalize("NFKD", f"{first_name or ''} {last_name or ''}").encode("ascii", "ignore").decode()
+    name = re.sub(r"[^A-Za-z0-9]+", "-", name).strip("-")
+    return f"resume-{resume_id}-{name}.pdf" if name else f"resume-{resume_id}.pdf"
+
+
+async def _render(key: RenderKey, document: str) -> Path:
+    # An export can wait for the pool; an interactive download would get a 503
+    while True:
+        try:
+            return await render_cached_resume_pdf(key, document)
+        except PdfRendererBusy:
+            await asyncio.sleep(EXPORT_BUSY_RETRY_SECONDS)
+
+
+async def _render_batch(batch: list) -> list[Path | Exception]:
+    renders = (_render(RenderKey(row.id, row.version, DEFAULT_TEMPLATE, "pdf"), row.document) for row in batch)
+    return await asyncio.gather(*renders, return_exceptions=True)
+
+
+async def stream_resume_zip(where_conditions: list) -> AsyncIterator[bytes]:
+    """ZIP archive of the matching resumes' PDFs, yielded as it is written.
+
+    A resume that fails to render is left out and named in errors.txt at the
+    end of the archive; the response has long started by then.
+    """
+    stream = _ZipStream()
+    archive = zipfile.ZipFile(stream, mode="w", compression=zipfile.ZIP_STORED)  # PDFs are compressed already
+    failed = []
+    # The request's session is closed before a streaming body is sent, so the
+    # export reads through its own session and server-side cursor.
+    async with AsyncSessionFactory() as session:
+        result = await stream_resume_documents(session, where_conditions, EXPORT_BATCH_SIZE)
+        async for batch in result.partitions():
+            for row, path in zip(batch, await _render_batch(batch)):
+                if isinstance(path, Exception):
+                    logger.error(f"Exporting resume {row.id} failed: {path!r}")
+                    failed.append(row.id)
+                    continue
+                try:
+                    await run_in_threadpool(archive.write, path, archive_name(row.id, row.first_name, row.last_name))
+                except FileNotFoundError:
+                    # Evicted from the render cache in the meantime
+                    failed.append(row.id)
+                    continue
+                yield stream.drain()
+
+    if failed:
+        archive.writestr("errors.txt", "".join(f"Resume {resume_id} could not be rendered.\n" for resume_id in failed))
+    archive.close()
+    yield stream.drain()
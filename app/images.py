@@ -0,0 +1,71 @@
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from PIL import Image, ImageOps
+
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", 2))
+
+# name -> (longest edge in px, Pillow format, file extension, save options)
+IMAGE_DERIVATIVES = {
+    "thumb": (200, "JPEG", "jpg", {"quality": 80, "optimize": True, "progressive": True}),
+    "web": (600, "WEBP", "webp", {"quality": 80, "method": 4}),
+    "print": (1600, "JPEG", "jpg", {"quality": 90, "optimize": True, "progressive": True}),
+}
+DEFAULT_DERIVATIVE = "print"
+
+_image_executor: ProcessPoolExecutor | None = None
+
+
+class InvalidImage(Exception):
+    pass
+
+
+def _render_derivatives(source: Path, output_dir: Path, stem: str) -> dict[str, str]:
+    """Runs in a worker process: write every derivative of `source`, return name -> filename."""
+    try:
+        with Image.open(source) as image:
+            # Apply the EXIF orientation to the pixels; the metadata itself is
+            # not copied to the derivatives.
+            image = ImageOps.exif_transpose(image)
+            if image.mode in ("RGBA", "LA", "P"):
+                image = _flatten(image)
+            elif image.mode != "RGB":
+                image = image.convert("RGB")
+            filenames = {}
+            for name, (size, image_format, extension, options) in IMAGE_DERIVATIVES.items():
+                derivative = image.copy()
+                derivative.thumbnail((size, size), Image.Resampling.LANCZOS)
+                filename = f"{stem}-{name}.{extension}"
+                temp_path = output_dir / f".{filename}.part"
+                derivative.save(temp_path, image_format, **options)
+                os.replace(temp_path, output_dir / filename)
+                filenames[name] = filename
+            return filenames
+    except (OSError, Image.DecompressionBombError) as e:
+        raise InvalidImage(str(e)) from None
+
+
+def _flatten(image: Image.Image) -> Image.Image:
+    # JPEG has no alpha channel; composite transparent images onto white.
+    image = image.convert("RGBA")
+    background = Image.new("RGB", image.size, (255, 255, 255))
+    background.paste(image, mask=image.getchannel("A"))
+    return background
+
+
+async def generate_image_derivatives(source: Path, output_dir: Path, stem: str) -> dict[str, str]:
+    """Resize/re-encode `source` into IMAGE_DERIVATIVES on the image process pool."""
+    global _image_executor
+    if _image_executor is None:
+        _image_executor = ProcessPoolExecutor(max_workers=IMAGE_WORKERS)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_image_executor, _render_derivatives, source, output_dir, stem)
+
+
+def shutdown_image_pool():
+    global _image_executor
+    if _image_executor is not None:
+        _image_executor.shutdown(wait=False, cancel_futures=True)
+        _image_executor = None
@@ -0,0 +1,200 @@
+"""Background jobs stored in Postgres (see app.models.job.Job).
+
+Handlers are registered by name with @job_handler, next to the code they
+belong to, and take the job's payload:
+
+    @job_handler(RENDER_PDF_JOB)
+    async def prewarm_resume_pdf(payload: dict): ...
+
+Requests enqueue with enqueue_job(db, name, payload), inside their unit of
+work. JOB_WORKERS asyncio workers claim and run jobs, either in the web
+process (started from the lifespan unless JOB_WORKERS_IN_PROCESS=false) or in
+a separate process with `python -m app.worker`. Nothing but Postgres is
+needed: workers poll every JOB_POLL_SECONDS, and a job enqueued by this
+process wakes its local workers as soon as it is committed.
+
+A failed job is retried with exponential backoff until its max_attempts.
+Finished jobs are kept for JOB_RETENTION_SECONDS (failed ones for
+JOB_FAILED_RETENTION_SECONDS), then deleted by a pruning task that runs next
+to the workers.
+"""
+import asyncio
+import logging
+import os
+import random
+import time
+from datetime import timedelta
+from typing import Awaitable, Callable
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import AsyncSessionFactory, after_commit
+from app.metrics import job_duration
+from app.models.job import Job
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 4))
+JOB_WORKERS_IN_PROCESS = os.getenv("JOB_WORKERS_IN_PROCESS", "true").lower() == "true"
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "2"))
+# A running job whose worker hasn't finished it by then is assumed lost and run again
+JOB_LEASE = timedelta(seconds=int(os.getenv("JOB_LEASE_SECONDS", 300)))
+# Handlers are stopped well before the lease runs out, so the failure is
+# recorded while the job is still ours and no other worker starts it meanwhile
+JOB_TIMEOUT_SECONDS = JOB_LEASE.total_seconds() - min(
+    float(os.getenv("JOB_LEASE_MARGIN_SECONDS", "30")), JOB_LEASE.total_seconds() / 2
+)
+JOB_BACKOFF_BASE_SECONDS = float(os.getenv("JOB_BACKOFF_BASE_SECONDS", "5"))
+JOB_BACKOFF_MAX_SECONDS = float(os.getenv("JOB_BACKOFF_MAX_SECONDS", "900"))
+JOB_RETENTION = {
+    "succeeded": timedelta(seconds=int(os.getenv("JOB_RETENTION_SECONDS", 24 * 3600))),
+    "failed": timedelta(seconds=int(os.getenv("JOB_FAILED_RETENTION_SECONDS", 7 * 24 * 3600))),
+}
+JOB_PRUNE_SECONDS = float(os.getenv("JOB_PRUNE_SECONDS", "600"))
+JOB_PRUNE_BATCH = 1000
+
+JobHandler = Callable[[dict], Awaitable[None]]
+JOB_HANDLERS: dict[str, JobHandler] = {}
+
+_wakeup: asyncio.Event | None = None
+_workers: list[asyncio.Task] = []
+
+
+def job_handler(name: str) -> Callable[[JobHandler], JobHandler]:
+    def register(handler: JobHandler) -> JobHandler:
+        JOB_HANDLERS[name] = handler
+        return handler
+
+    return register
+
+
+def _get_wakeup() -> asyncio.Event:
+    global _wakeup
+    if _wakeup is None:
+        _wakeup = asyncio.Event()
+    return _wakeup
+
+
+async def _wake_workers():
+    _get_wakeup().set()
+
+
+async def enqueue_job(
+    db: AsyncSession,
+    name: str,
+    payload: dict,
+    priority: int = 0,
+    delay: timedelta | None = None,
+    max_attempts: int = 5,
+    user_id: int | None = None,
+) -> Job:
+    """Add a job to the request's transaction; it becomes runnable when that commits."""
+    if name not in JOB_HANDLERS:
+        raise KeyError(f"No job handler named {name!r}")
+    job = await Job.enqueue(db, name, payload, priority, delay, max_attempts, user_id)
+    if delay is None:
+        after_commit(db, _wake_workers)
+    return job
+
+
+def backoff(attempts: int) -> timedelta:
+    """Delay before retry number `attempts`: exponential, capped, with jitter."""
+    seconds = min(JOB_BACKOFF_BASE_SECONDS * 2 ** (attempts - 1), JOB_BACKOFF_MAX_SECONDS)
+    return timedelta(seconds=seconds * random.uniform(0.8, 1.2))
+
+
+async def run_next_job() -> bool:
+    """Claim and run one job; False when none is runnable."""
+    async with AsyncSessionFactory() as session:
+        job = await Job.claim_next(session, JOB_LEASE)
+        await session.commit()
+    if job is None:
+        return False
+
+    started = time.perf_counter()
+    try:
+        handler = JOB_HANDLERS[job.name]
+        await asyncio.wait_for(handler(job.payload), JOB_TIMEOUT_SECONDS)
+    except asyncio.CancelledError:
+        # Shutting down: hand the job back rather than leave it to its lease,
+        # and don't let the interruption use up one of its attempts
+        await _record(Job.release, job.id, job.locked_until)
+        raise
+    except Exception as e:
+        job_duration.labels(job.name, "failed").observe(time.perf_counter() - started)
+        logger.exception(f"Job {job.id} ({job.name}) failed on attempt {job.attempts}")
+        retry_in = backoff(job.attempts) if job.attempts < job.max_attempts else None
+        await _record(Job.mark_failed, job.id, repr(e), retry_in)
+    else:
+        job_duration.labels(job.name, "succeeded").observe(time.perf_counter() - started)
+        await _record(Job.mark_succeeded, job.id)
+    return True
+
+
+async def _record(outcome, *args):
+    async with AsyncSessionFactory() as session:
+        await outcome(session, *args)
+        await session.commit()
+
+
+async def _worker(number: int):
+    wakeup = _get_wakeup()
+    while True:
+        # Cleared first, so a job enqueued while this one runs isn't missed
+        wakeup.clear()
+        try:
+            if await run_next_job():
+                continue
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # The database is unreachable or similar; back off like an idle poll
+            logger.exception(f"Job worker {number} could not claim a job")
+        try:
+            await asyncio.wait_for(wakeup.wait(), JOB_POLL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def prune_finished_jobs() -> int:
+    """Fail jobs that died on their last attempt, then delete finished jobs past
+    their retention, a batch per transaction; returns how many were deleted."""
+    async with AsyncSessionFactory() as session:
+        if failed := await Job.fail_exhausted(session):
+            logger.warning(f"{failed} job(s) lost their worker on their last attempt and were failed")
+        await session.commit()
+    deleted = 0
+    for status, retention in JOB_RETENTION.items():
+        while True:
+            async with AsyncSessionFactory() as session:
+                count = await Job.delete_finished(session, status, retention, JOB_PRUNE_BATCH)
+                await session.commit()
+            deleted += count
+            if count < JOB_PRUNE_BATCH:
+                break
+    return deleted
+
+
+async def _pruner():
+    while True:
+        try:
+            await prune_finished_jobs()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Pruning finished jobs failed")
+        await asyncio.sleep(JOB_PRUNE_SECONDS)
+
+
+def start_job_workers(count: int = JOB_WORKERS):
+    _workers.extend(asyncio.create_task(_worker(number)) for number in range(count))
+    if count:
+        _workers.append(asyncio.create_task(_pruner()))
+
+
+async def stop_job_workers():
+    """Cancel the workers and the pruner; jobs the workers were running go back to the queue."""
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
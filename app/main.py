@@ -1,12 +1,42 @@
-from pathlib import Path
+from contextlib import asynccontextmanager
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 
-from app.routers import auth, resume, stripe_payment, users
+from app.cache import close_resume_cache
+from app.images import shutdown_image_pool
+from app.middleware import RequestMetricsMiddleware
+from app.jobs import JOB_WORKERS, JOB_WORKERS_IN_PROCESS, start_job_workers, stop_job_workers
+from app.pdf import shutdown_pdf_pool
+from app.responses import ORJSONResponse
+from app.routers import auth, jobs, metrics, resume, stripe_payment, uploads, users
+from app.stripe_gateway import close_stripe_gateway
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if JOB_WORKERS_IN_PROCESS:
+        start_job_workers(JOB_WORKERS)
+    yield
+    await stop_job_workers()
+    await close_stripe_gateway()
+    await close_resume_cache()
+    shutdown_image_pool()
+    shutdown_pdf_pool()
+
+
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
+
+
+@app.exception_handler(PoolTimeoutError)
+async def database_pool_exhausted(request: Request, exc: PoolTimeoutError):
+    # Every pooled connection stayed busy for DB_POOL_TIMEOUT; shed load instead of queueing.
+    return ORJSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Server is busy, please try again shortly."},
+        headers={"Retry-After": "1"},
+    )
 
 origins = [
     "http://localhost",
@@ -26,19 +56,19 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "Last-Modified"],
 )
-
-# serving images
-
-UPLOAD_DIR = Path("uploads")
-UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
-
-# Serve the `uploads/` directory at the `/static` path
-app.mount("/static", StaticFiles(directory=UPLOAD_DIR), name="static")
+# Outermost, so the timings include CORS and every other middleware
+app.add_middleware(RequestMetricsMiddleware)
 
 
 app.include_router(users.router)
 app.include_router(auth.router)
 app.include_router(resume.router)
 app.include_router(stripe_payment.router)
+app.include_router(jobs.router)
+app.include_router(metrics.router)
+# serving images: `/static/<sha256>.<ext>` from the upload blob store, with
+# immutable caching, ETags and range requests
+app.include_router(uploads.router)
 
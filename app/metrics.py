@@ -0,0 +1,273 @@
+"""In-process metrics, exposed in the Prometheus text format at GET /metrics.
+
+Every Histogram, Counter and Gauge registers itself in REGISTRY when created;
+render_prometheus() writes them all out. Pass `labelnames` for a metric with
+labels and use .labels(*values) to get the series to update.
+"""
+import bisect
+import contextvars
+import math
+import threading
+from dataclasses import dataclass
+from typing import Callable
+
+# Upper bounds in seconds, Prometheus-style; +Inf is implied.
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+REGISTRY: list["Metric"] = []
+
+
+class Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, description: str, labelnames: tuple[str, ...] = (), registered: bool = True):
+        self.name = name
+        self.description = description
+        self.labelnames = labelnames
+        self._children: dict[tuple[str, ...], "Metric"] = {}
+        self._lock = threading.Lock()
+        if registered:
+            REGISTRY.append(self)
+
+    def labels(self, *values) -> "Metric":
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._child())
+        return child
+
+    def _child(self) -> "Metric":
+        raise NotImplementedError
+
+    def _series(self) -> list[tuple[dict[str, str], "Metric"]]:
+        if not self.labelnames:
+            return [({}, self)]
+        return [(dict(zip(self.labelnames, key)), child) for key, child in list(self._children.items())]
+
+    def _samples(self, labels: dict[str, str]) -> list[tuple[str, dict[str, str], float]]:
+        raise NotImplementedError
+
+    def expose(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.type}"]
+        for labels, series in self._series():
+            lines.extend(
+                f"{name}{_format_labels(sample_labels)} {_format_value(value)}"
+                for name, sample_labels, value in series._samples(labels)
+            )
+        return lines
+
+
+class Histogram(Metric):
+    """Cumulative-bucket latency histogram, safe to observe from worker threads."""
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+        labelnames: tuple[str, ...] = (),
+        registered: bool = True,
+    ):
+        super().__init__(name, description, labelnames, registered)
+        self.buckets = buckets
+        self._counts = [0] * (len(buckets) + 1)
+        self._sum = 0.0
+
+    def _child(self) -> "Histogram":
+        return Histogram(self.name, self.description, self.buckets, registered=False)
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counts = list(self._counts)
+            total = self._sum
+        cumulative, running = [], 0
+        for bound, count in zip((*self.buckets, float("inf")), counts):
+            running += count
+            cumulative.append((bound, running))
+        return {"buckets": cumulative, "sum": total, "count": running}
+
+    def _samples(self, labels):
+        snapshot = self.snapshot()
+        samples = [(f"{self.name}_bucket", {**labels, "le": _format_value(bound)}, count) for bound, count in snapshot["buckets"]]
+        samples.append((f"{self.name}_sum", labels, snapshot["sum"]))
+        samples.append((f"{self.name}_count", labels, snapshot["count"]))
+        return samples
+
+
+class Counter(Metric):
+    """Monotonic counter, safe to increment from worker threads."""
+
+    type = "counter"
+
+    def __init__(self, name: str, description: str, labelnames: tuple[str, ...] = (), registered: bool = True):
+        super().__init__(name, description, labelnames, registered)
+        self._value = 0
+
+    def _child(self) -> "Counter":
+        return Counter(self.name, self.description, registered=False)
+
+    def inc(self, amount: int = 1):
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self) -> int:
+        return self._value
+
+    def _samples(self, labels):
+        return [(self.name, labels, self._value)]
+
+
+class Gauge(Metric):
+    """Current value of something; set directly, or read from `collect` at scrape time.
+
+    `collect` returns the value, or a dict of values keyed by the single label.
+    """
+
+    type = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        labelnames: tuple[str, ...] = (),
+        collect: Callable[[], float | dict] | None = None,
+        registered: bool = True,
+    ):
+        super().__init__(name, description, labelnames, registered)
+        self.collect = collect
+        self._value = 0.0
+
+    def _child(self) -> "Gauge":
+        return Gauge(self.name, self.description, registered=False)
+
+    def set(self, value: float):
+        self._value = value
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount: float = 1):
+        self.inc(-amount)
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+    def _series(self):
+        if self.collect is None:
+            return super()._series()
+        values = self.collect()
+        if not isinstance(values, dict):
+            values = {None: values}
+        series = []
+        for key, value in values.items():
+            child = self._child()
+            child.set(value)
+            series.append(({} if key is None else {self.labelnames[0]: str(key)}, child))
+        return series
+
+    def _samples(self, labels):
+        return [(self.name, labels, self._value)]
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def render_prometheus() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.expose())
+    return "\n".join(lines) + "\n"
+
+
+@dataclass
+class RequestStats:
+    """Database work done on behalf of the current request (see app.middleware)."""
+
+    queries: int = 0
+    commits: int = 0
+
+
+current_request_stats: contextvars.ContextVar[RequestStats | None] = contextvars.ContextVar("current_request_stats", default=None)
+
+
+# Requests (app.middleware). `route` is the route template, e.g. /resumes/{resume_id}.
+http_request_duration = Histogram(
+    "http_request_duration_seconds",
+    "Time from receiving a request until its response was fully sent.",
+    labelnames=("method", "route"),
+)
+http_requests = Counter("http_requests_total", "Requests answered, by route and status code.", labelnames=("method", "route", "status"))
+http_requests_in_flight = Gauge("http_requests_in_flight", "Requests currently being handled.")
+
+# Database (app.database)
+pool_checkout_wait = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time spent waiting for a database connection from the pool.",
+)
+db_query_duration = Histogram("db_query_duration_seconds", "Time spent executing single SQL statements.")
+db_commits = Counter("db_commits_total", "Transactions committed.")
+db_queries_per_request = Histogram(
+    "db_queries_per_request",
+    "SQL statements executed while handling one request.",
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89),
+    labelnames=("route",),
+)
+db_commits_per_request = Histogram(
+    "db_commits_per_request",
+    "Transactions committed while handling one request.",
+    buckets=(0, 1, 2, 3, 5),
+    labelnames=("route",),
+)
+
+# Password hashing (app.utils)
+password_hash_duration = Histogram(
+    "password_hash_duration_seconds",
+    "Time spent in bcrypt per hash or verification, excluding the wait for a worker.",
+    buckets=(0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 2.0, 5.0),
+    labelnames=("operation",),
+)
+password_hash_rejected = Counter("password_hash_rejected_total", "Hash jobs rejected because the pool had too much queued work.")
+
+# Stripe (app.stripe_gateway)
+stripe_request_duration = Histogram(
+    "stripe_request_duration_seconds",
+    "Latency of Stripe API calls, SDK retries included.",
+    labelnames=("operation", "outcome"),
+)
+
+resume_cache_hits = Counter("resume_cache_hits_total", "Resume responses served from the cache.")
+resume_cache_misses = Counter("resume_cache_misses_total", "Resume responses that had to be assembled from the database.")
+resume_cache_evictions = Counter("resume_cache_evictions_total", "Entries dropped by the in-process resume cache to stay within its size limit.")
+resume_cache_invalidations = Counter("resume_cache_invalidations_total", "Resume cache entries deleted because the resume changed.")
+
+render_cache_hits = Counter("render_cache_hits_total", "Resume exports served from the render cache.")
+render_cache_misses = Counter("render_cache_misses_total", "Resume exports that were not in the render cache.")
+render_cache_evictions = Counter("render_cache_evictions_total", "Rendered files dropped to keep the render cache within its size limit.")
+
+# Background jobs (app.jobs)
+job_duration = Histogram("job_duration_seconds", "Time spent running background jobs.", labelnames=("name", "outcome"))
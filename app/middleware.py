@@ -0,0 +1,59 @@
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.metrics import (
+    RequestStats,
+    current_request_stats,
+    db_commits_per_request,
+    db_queries_per_request,
+    http_request_duration,
+    http_requests,
+    http_requests_in_flight,
+)
+
+
+def route_template(scope: Scope) -> str:
+    # FastAPI puts the matched route in the scope; its template keeps the
+    # label set small (/resumes/{resume_id}, not one series per id)
+    route = scope.get("route")
+    return getattr(route, "path_format", None) or getattr(route, "path", None) or "unmatched"
+
+
+class RequestMetricsMiddleware:
+    """Latency, status and database work of every HTTP request, by route template.
+
+    Pure ASGI, so streamed responses are timed until their last chunk is sent.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500  # if the app raises before starting a response
+
+        async def send_with_status(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        stats = RequestStats()
+        token = current_request_stats.set(stats)
+        http_requests_in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            http_requests_in_flight.dec()
+            current_request_stats.reset(token)
+            route = route_template(scope)
+            http_request_duration.labels(scope["method"], route).observe(elapsed)
+            http_requests.labels(scope["method"], route, status_code).inc()
+            db_queries_per_request.labels(route).observe(stats.queries)
+            db_commits_per_request.labels(route).observe(stats.commits)
@@ -5,6 +5,7 @@ class Base(DeclarativeBase):
     pass
 
     
+from .job import Job
 from .resume import (
     DrivingLicense,
     Education,
@@ -13,5 +14,7 @@ from .resume import (
     Resume,
     TrainingAward,
 )
+from .stripe_event import StripeEvent
 from .stripe_payment import StripePayment
+from .upload_blob import UploadBlob
 from .users import User
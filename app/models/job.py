@@ -0,0 +1,152 @@
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import JSON, BigInteger, DateTime, ForeignKey, Index, String, delete, func, literal_column, or_, select, text, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.models import Base
+
+# Inlined rather than bound, so the claim and pruning queries match the partial indexes.
+QUEUED = literal_column("'queued'")
+RUNNING = literal_column("'running'")
+FINISHED = {status: literal_column(f"'{status}'") for status in ("succeeded", "failed")}
+
+
+class Job(Base):
+    """A unit of background work, run by app.jobs workers.
+
+    Enqueued in the request's transaction, so a job exists exactly when the
+    change that asked for it was committed. Workers claim jobs with
+    SELECT ... FOR UPDATE SKIP LOCKED and hold a lease while running one; a
+    job whose lease ran out (its worker died) is claimed again.
+    """
+
+    __tablename__ = "jobs"
+    __mapper_args__ = {"eager_defaults": True}
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    name: Mapped[str] = mapped_column(String)  # key of app.jobs.JOB_HANDLERS
+    payload: Mapped[dict] = mapped_column(JSON)
+    status: Mapped[str] = mapped_column(String, default="queued", server_default=text("'queued'"))  # queued, running, succeeded, failed
+    priority: Mapped[int] = mapped_column(default=0, server_default=text("0"))  # higher runs first
+    attempts: Mapped[int] = mapped_column(default=0, server_default=text("0"))
+    max_attempts: Mapped[int] = mapped_column(default=5, server_default=text("5"))
+    run_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    locked_until: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))
+    last_error: Mapped[Optional[str]]
+    user_id: Mapped[Optional[int]] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"))  # who may see its status (indexed below)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    finished_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))
+
+    @classmethod
+    async def enqueue(
+        cls,
+        db: AsyncSession,
+        name: str,
+        payload: dict,
+        priority: int = 0,
+        delay: timedelta | None = None,
+        max_attempts: int = 5,
+        user_id: int | None = None,
+    ) -> "Job":
+        job = cls(name=name, payload=payload, priority=priority, max_attempts=max_attempts, user_id=user_id)
+        if delay is not None:
+            job.run_at = func.now() + delay
+        db.add(job)
+        await db.flush()
+        return job
+
+    @classmethod
+    async def claim_next(cls, db: AsyncSession, lease: timedelta) -> Optional["Job"]:
+        """Take the most urgent runnable job: mark it running, count the attempt and lease it."""
+        runnable = (
+            select(cls.id)
+            .where(
+                or_(
+                    (cls.status == QUEUED) & (cls.run_at <= func.now()),
+                    # A worker died running it; that counted as an attempt too
+                    (cls.status == RUNNING) & (cls.locked_until < func.now()) & (cls.attempts < cls.max_attempts),
+                )
+            )
+            .order_by(cls.priority.desc(), cls.run_at, cls.id)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        result = await db.execute(
+            update(cls)
+            .where(cls.id == runnable)
+            .values(status="running", attempts=cls.attempts + 1, locked_until=func.now() + lease)
+            .returning(cls)
+        )
+        return result.scalar_one_or_none()
+
+    @classmethod
+    async def mark_succeeded(cls, db: AsyncSession, id: int):
+        await db.execute(
+            update(cls).where(cls.id == id).values(status="succeeded", locked_until=None, last_error=None, finished_at=func.now())
+        )
+
+    @classmethod
+    async def mark_failed(cls, db: AsyncSession, id: int, error: str, retry_in: timedelta | None):
+        """Queue the job again after `retry_in`, or fail it for good when None."""
+        if retry_in is None:
+            values = {"status": "failed", "finished_at": func.now()}
+        else:
+            values = {"status": "queued", "run_at": func.now() + retry_in}
+        await db.execute(update(cls).where(cls.id == id).values(locked_until=None, last_error=error, **values))
+
+    @classmethod
+    async def release(cls, db: AsyncSession, id: int, locked_until: datetime):
+        """Queue a claimed job again right away without counting the attempt (its worker is stopping).
+
+        Only while the worker still holds the lease it claimed the job with.
+        """
+        await db.execute(
+            update(cls)
+            .where(cls.id == id, cls.status == RUNNING, cls.locked_until == locked_until)
+            .values(status="queued", attempts=cls.attempts - 1, locked_until=None, run_at=func.now())
+        )
+
+    @classmethod
+    async def fail_exhausted(cls, db: AsyncSession) -> int:
+        """Fail the jobs whose lease ran out on their last attempt; claim_next leaves them alone."""
+        result = await db.execute(
+            update(cls)
+            .where(cls.status == RUNNING, cls.locked_until < func.now(), cls.attempts >= cls.max_attempts)
+            .values(status="failed", locked_until=None, last_error="lease expired on the last attempt", finished_at=func.now())
+        )
+        return result.rowcount
+
+    @classmethod
+    async def delete_finished(cls, db: AsyncSession, status: str, older_than: timedelta, limit: int = 1000) -> int:
+        """Delete up to `limit` jobs that finished with `status` more than `older_than` ago."""
+        expired = (
+            select(cls.id)
+            .where(cls.status == FINISHED[status], cls.finished_at < func.now() - older_than)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        result = await db.execute(delete(cls).where(cls.id.in_(expired.scalar_subquery())))
+        return result.rowcount
+
+    @classmethod
+    async def get_for_user(cls, db: AsyncSession, id: int, user_id: int) -> Optional["Job"]:
+        result = await db.execute(select(cls).where(cls.id == id, cls.user_id == user_id))
+        return result.scalar_one_or_none()
+
+
+# Runnable jobs in claim order, and leases to recover
+Index(
+    "ix_jobs_queued",
+    Job.priority.desc(),
+    Job.run_at,
+    Job.id,
+    postgresql_where=Job.status == "queued",
+)
+Index("ix_jobs_running_lease", Job.locked_until, postgresql_where=Job.status == "running")
+# Deleting a user cascades to their jobs
+Index("ix_jobs_user_id", Job.user_id, postgresql_where=Job.user_id.is_not(None))
+# Finished jobs past their retention
+Index("ix_jobs_finished", Job.status, Job.finished_at, postgresql_where=Job.status.in_(["succeeded", "failed"]))
@@ -1,9 +1,27 @@
-from datetime import date
+from datetime import date, datetime
 from typing import Any, List, Optional
 
-from sqlalchemy import ForeignKey, String, select
+from sqlalchemy import (
+    JSON,
+    DateTime,
+    ForeignKey,
+    String,
+    cast,
+    column,
+    delete,
+    exists,
+    func,
+    insert,
+    lambda_stmt,
+    select,
+    text,
+    update,
+    values,
+)
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy.orm import Mapped, mapped_column, raiseload, relationship
+from sqlalchemy.orm.attributes import set_committed_value
 
 from app.models import Base
 from app.models.stripe_payment import StripePayment
@@ -12,11 +30,14 @@ from app.models.users import User
 
 class Resume(Base):
     __tablename__ = "resumes"
+    # Fetch the server-generated updated_at with RETURNING during flush.
+    __mapper_args__ = {"eager_defaults": True}
 
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
-    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), index=True, unique=True)  # one resume per user
     resume_title: Mapped[str] 
     resume_image: Mapped[Optional[str]] = mapped_column(String, nullable=True)  # Add this line
+    resume_image_variants: Mapped[Optional[dict]] = mapped_column(JSON, nullable=True)  # derivative name -> URL
     first_name: Mapped[Optional[str]]
     last_name: Mapped[Optional[str]]
     date_of_birth: Mapped[Optional[date]]
@@ -29,8 +50,12 @@ class Resume(Base):
     email_address: Mapped[Optional[str]]
     contact_number: Mapped[Optional[str]]
     responsibilities: Mapped[Optional[str]]
-    referred_by: Mapped[Optional[str]]= mapped_column(default="RSR Academy")
+    referred_by: Mapped[Optional[str]]= mapped_column(default="RSR Academy", index=True)  # partner exports filter on it
     job_applied_for: Mapped[Optional[str]]
+    # Bumped by every change to the resume or one of its sections (see
+    # bump_version); GETs use it as the ETag and PUTs as an If-Match precondition.
+    version: Mapped[int] = mapped_column(default=1, server_default=text("1"))
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
     
     experiences: Mapped[List["Experience"]] = relationship(back_populates="resume", cascade="all, delete-orphan" , lazy='selectin', order_by="Experience.id.asc()")
     education: Mapped[List["Education"]] = relationship(back_populates="resume", cascade="all, delete-orphan", lazy='selectin')
@@ -42,16 +67,35 @@ class Resume(Base):
     user: Mapped["User"] = relationship(back_populates="resumes")
 
     @classmethod
-    async def create(cls, db: AsyncSession, user_id: int, **kwargs):
-        resume = cls(**kwargs, user_id=user_id)
-        db.add(resume)
-        await db.commit()
-        await db.refresh(resume)
+    async def create(cls, db: AsyncSession, user_id: int, **kwargs) -> Optional["Resume"]:
+        """Insert the user's resume in one round trip.
+
+        INSERT ... ON CONFLICT (user_id) DO NOTHING RETURNING: returns None
+        when the user already has a resume, also when a concurrent request
+        created it first.
+        """
+        stmt = (
+            pg_insert(Resume)
+            .values(**kwargs, user_id=user_id)
+            .on_conflict_do_nothing(index_elements=[Resume.user_id])
+            .returning(Resume)
+        )
+        resume = (await db.execute(stmt)).scalar_one_or_none()
+        if resume is not None:
+            # A brand-new resume has no children; mark the collections as
+            # loaded so serializing it doesn't trigger lazy loads.
+            for section in ("experiences", "education", "driving_license", "training_awards", "others"):
+                set_committed_value(resume, section, [])
+            set_committed_value(resume, "language_skills", None)
         return resume
 
     @classmethod
-    async def get_one(cls, db: AsyncSession, where_conditions: list[Any]):
+    async def get_one(cls, db: AsyncSession, where_conditions: list[Any], with_children: bool = True):
+        # with_children=False skips the six selectin child queries; use it when
+        # the caller only needs the resume row (e.g. ownership checks).
         query = select(cls)
+        if not with_children:
+            query = query.options(raiseload("*"))
         if where_conditions:
             query = query.filter(*where_conditions)
         result = await db.execute(query)
@@ -65,22 +109,152 @@ class Resume(Base):
         result = await db.execute(query)
         return result.scalars().all()
 
+    # The hot lookups below are lambda statements: SQLAlchemy builds and
+    # compiles each one once and afterwards only extracts the bound values, and
+    # psycopg turns the repeated SQL into a server-side prepared statement.
+
+    @classmethod
+    async def get_owned(cls, db: AsyncSession, resume_id: int, user_id: int, with_children: bool = True) -> Optional["Resume"]:
+        if with_children:
+            query = lambda_stmt(lambda: select(Resume).where(Resume.id == resume_id, Resume.user_id == user_id))
+        else:
+            query = lambda_stmt(
+                lambda: select(Resume).options(raiseload("*")).where(Resume.id == resume_id, Resume.user_id == user_id)
+            )
+        result = await db.execute(query)
+        return result.scalar_one_or_none()
+
+    @classmethod
+    async def is_owned_by(cls, db: AsyncSession, resume_id: int, user_id: int) -> bool:
+        """Ownership check as a single EXISTS query, without loading the resume."""
+        query = lambda_stmt(lambda: select(exists().where(Resume.id == resume_id, Resume.user_id == user_id)))
+        result = await db.execute(query)
+        return result.scalar()
+
+    @classmethod
+    async def get_version(cls, db: AsyncSession, resume_id: int, user_id: int):
+        """(version, updated_at) of an owned resume, or None; enough to answer a conditional GET."""
+        query = lambda_stmt(
+            lambda: select(Resume.version, Resume.updated_at).where(Resume.id == resume_id, Resume.user_id == user_id)
+        )
+        result = await db.execute(query)
+        return result.one_or_none()
+
+    @classmethod
+    async def get_versions_for_user(cls, db: AsyncSession, user_id: int):
+        """(id, version, updated_at) of every resume of a user, ordered by id."""
+        query = lambda_stmt(
+            lambda: select(Resume.id, Resume.version, Resume.updated_at).where(Resume.user_id == user_id).order_by(Resume.id)
+        )
+        result = await db.execute(query)
+        return result.all()
+
+    @classmethod
+    async def bump_version(cls, db: AsyncSession, resume_id: int, user_id: int, expected_versions: list[int] | None = None):
+        """Increment the version of an owned resume and return (version, updated_at).
+
+        Returns None when the resume is not the user's or, with
+        expected_versions, when its version is none of those (a failed If-Match). The
+        row stays locked until the request's transaction ends, so concurrent
+        edits of one resume are serialized. Call it before loading the resume
+        so the loaded row already carries the new version.
+        """
+        table = cls.__table__
+        stmt = (
+            update(table)
+            .where(table.c.id == resume_id, table.c.user_id == user_id)
+            .values(version=table.c.version + 1, updated_at=func.now())
+            .returning(table.c.version, table.c.updated_at)
+        )
+        if expected_versions is not None:
+            stmt = stmt.where(table.c.version.in_(expected_versions))
+        result = await db.execute(stmt)
+        return result.one_or_none()
+
     async def update(self, db: AsyncSession, **kwargs):
         for key, value in kwargs.items():
             setattr(self, key, value)
-        await db.commit()
-        await db.refresh(self)
         return self
 
     async def delete(self, db: AsyncSession):
         await db.delete(self)
-        await db.commit()
 
-class Experience(Base):
+
+class SectionItemNotFound(Exception):
+    """Raised when a section sync references ids that do not belong to the resume."""
+
+
+class ResumeSectionMixin:
+    """Shared helpers for the child sections hanging off a resume."""
+
+    @classmethod
+    async def sync_for_resume(cls, db: AsyncSession, resume_id: int, items: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        """Make the resume's section match `items` using set-based statements.
+
+        Items without an id are inserted, items with an id are updated and any
+        other row of the section is deleted: one DELETE, an UPDATE ... FROM
+        (VALUES ...) per set of fields the updates carry and one multi-row
+        INSERT, staged in the request's transaction. An update only writes the
+        fields it has, so pass updates dumped with exclude_unset; an id given
+        twice gets both items' fields, the later one winning. Returns the
+        resulting section rows ordered by id.
+        """
+        table = cls.__table__
+        updates: dict[int, dict[str, Any]] = {}
+        for item in items:
+            if item.get("id") is not None:
+                updates[item["id"]] = {**updates.get(item["id"], {}), **item}
+        inserts = [
+            {**{key: value for key, value in item.items() if key != "id"}, "resume_id": resume_id}
+            for item in items if item.get("id") is None
+        ]
+
+        await db.execute(delete(table).where(table.c.resume_id == resume_id, table.c.id.not_in(list(updates))))
+
+        groups: dict[frozenset, list[dict[str, Any]]] = {}
+        for item in updates.values():
+            groups.setdefault(frozenset(item), []).append(item)
+
+        rows = []
+        for fields, group in groups.items():
+            columns = [c for c in table.c if c.name in fields]
+            if len(columns) == 1:
+                # Nothing to change but the id; the row only has to exist
+                result = await db.execute(
+                    select(*table.c).where(table.c.id.in_([item["id"] for item in group]), table.c.resume_id == resume_id)
+                )
+            else:
+                incoming = values(*[column(c.name, c.type) for c in columns], name="incoming").data(
+                    [tuple(item[c.name] for c in columns) for item in group]
+                )
+                result = await db.execute(
+                    update(table)
+                    .where(table.c.id == incoming.c.id, table.c.resume_id == resume_id)
+                    .values({c.name: cast(incoming.c[c.name], c.type) for c in columns if c.name != "id"})
+                    .returning(*table.c)
+                )
+            rows.extend(result.mappings().all())
+        if len(rows) != len(updates):
+            raise SectionItemNotFound(cls.__name__)
+
+        if inserts:
+            result = await db.execute(insert(table).values(inserts).returning(*table.c))
+            rows.extend(result.mappings().all())
+
+        return sorted((dict(row) for row in rows), key=lambda row: row["id"])
+
+    @classmethod
+    async def delete_for_resume(cls, db: AsyncSession, resume_id: int, id: int) -> int:
+        """Delete one section row by id, scoped to its resume. Returns the number of rows deleted."""
+        result = await db.execute(delete(cls).where(cls.id == id, cls.resume_id == resume_id))
+        return result.rowcount
+
+
+class Experience(Base, ResumeSectionMixin):
     __tablename__ = "experiences"
 
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
-    resume_id: Mapped[int] = mapped_column(ForeignKey("resumes.id", ondelete="CASCADE"))
+    resume_id: Mapped[int] = mapped_column(ForeignKey("resumes.id", ondelete="CASCADE"), index=True)
 
     employer: Mapped[str] = mapped_column(index=True)
     website: Mapped[Optional[str]]
@@ -99,8 +273,7 @@ class Experience(Base):
     async def create(cls, db: AsyncSession, resume_id: int, **kwargs):
         experience = cls(**kwargs, resume_id=resume_id)
         db.add(experience)
-        await db.commit()
-        await db.refresh(experience)
+        await db.flush()
         return experience
     
     @classmethod
@@ -114,19 +287,16 @@ class Experience(Base):
     async def update(self, db: AsyncSession, **kwargs):
         for key, value in kwargs.items():
             setattr(self, key, value)
-        await db.commit()
-        await db.refresh(self)
         return self
 
     async def delete(self, db: AsyncSession):
         await db.delete(self)
-        await db.commit()
 
-class Education(Base):
+class Education(Base, ResumeSectionMixin):
     __tablename__ = "educations"
 
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
-    resume_id: Mapped[int] = mapped_column(ForeignKey("resumes.id", ondelete="CASCADE"))
+    resume_id: Mapped[int] = mapped_column(ForeignKey("resumes.id", ondelete="CASCADE"), index=True)
 
     title_of_qualification: Mapped[str]
     organization_name: Mapped[str]
@@ -141,8 +311,7 @@ class Education(Base):
     async def create(cls, db: AsyncSession, resume_id: int, **kwargs):
         education = cls(**kwargs, resume_id=resume_id)
         db.add(education)
-        await db.commit()
-        await db.refresh(education)
+        await db.flush()
         return education    
 
     @classmethod
@@ -165,16 +334,13 @@ class Education(Base):
     async def update(self, db: AsyncSession, **kwargs):
         for key, value in kwargs.items():
             setattr(self, key, value)
-        await db.commit()
-        await db.refresh(self)
         return self
 
     async def delete(self, db: AsyncSession):
         await db.delete(self)
-        await db.commit()
 
 
-class LanguageSkill(Base):
+class LanguageSkill(Base, ResumeSectionMixin):
     __tablename__ = "language_skills"
 
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
@@ -191,8 +357,7 @@ class LanguageSkill(Base):
     async def create(cls, db: AsyncSession, resume_id: int, **kwargs):
         language_skill = cls(**kwargs, resume_id=resume_id)
         db.add(language_skill)
-        await db.commit()
-        await db.refresh(language_skill)
+        await db.flush()
         return language_skill
 
     @classmethod
@@ -213,20 +378,17 @@ class LanguageSkill(Base):
 
     async def update(self, db: AsyncSession, **kwargs):
         for key, value in kwargs.items():
-            setattr(self, key, value)   
-        await db.commit()
-        await db.refresh(self)
+            setattr(self, key, value)
         return self
 
     async def delete(self, db: AsyncSession):
         await db.delete(self)
-        await db.commit()
 
-class DrivingLicense(Base):
+class DrivingLicense(Base, ResumeSectionMixin):
     __tablename__ = "driving_licenses"
 
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
-    resume_id: Mapped[int] = mapped_column(ForeignKey("resumes.id", ondelete="CASCADE"))
+    resume_id: Mapped[int] = mapped_column(ForeignKey("resumes.id", ondelete="CASCADE"), index=True)
 
     license_type: Mapped[str]
     license_issued_date: Mapped[date]
@@ -239,8 +401,7 @@ class DrivingLicense(Base):
     async def create(cls, db: AsyncSession, resume_id: int, **kwargs):
         language_skill = cls(**kwargs, resume_id=resume_id)
         db.add(language_skill)
-        await db.commit()
-        await db.refresh(language_skill)
+        await db.flush()
         return language_skill
 
     @classmethod
@@ -261,22 +422,19 @@ class DrivingLicense(Base):
 
     async def update(self, db: AsyncSession, **kwargs):
         for key, value in kwargs.items():
-            setattr(self, key, value)   
-        await db.commit()
-        await db.refresh(self)
+            setattr(self, key, value)
         return self
 
     async def delete(self, db: AsyncSession):
         await db.delete(self)
-        await db.commit()
 
     
 
-class TrainingAward(Base):
+class TrainingAward(Base, ResumeSectionMixin):
     __tablename__ = "training_awards"
 
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
-    resume_id: Mapped[int] = mapped_column(ForeignKey("resumes.id", ondelete="CASCADE"))
+    resume_id: Mapped[int] = mapped_column(ForeignKey("resumes.id", ondelete="CASCADE"), index=True)
 
     title: Mapped[str]
     awarding_institute: Mapped[str]
@@ -290,8 +448,7 @@ class TrainingAward(Base):
     async def create(cls, db: AsyncSession, resume_id: int, **kwargs):
         language_skill = cls(**kwargs, resume_id=resume_id)
         db.add(language_skill)
-        await db.commit()
-        await db.refresh(language_skill)
+        await db.flush()
         return language_skill
 
     @classmethod
@@ -312,20 +469,17 @@ class TrainingAward(Base):
 
     async def update(self, db: AsyncSession, **kwargs):
         for key, value in kwargs.items():
-            setattr(self, key, value)   
-        await db.commit()
-        await db.refresh(self)
+            setattr(self, key, value)
         return self
 
     async def delete(self, db: AsyncSession):
         await db.delete(self)
-        await db.commit()
 
-class Others(Base):
+class Others(Base, ResumeSectionMixin):
     __tablename__ = "others"
 
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
-    resume_id: Mapped[int] = mapped_column(ForeignKey("resumes.id", ondelete="CASCADE"))
+    resume_id: Mapped[int] = mapped_column(ForeignKey("resumes.id", ondelete="CASCADE"), index=True)
 
     sectiontitle: Mapped[str]
     title: Mapped[str]
@@ -337,8 +491,7 @@ class Others(Base):
     async def create(cls, db: AsyncSession, resume_id: int, **kwargs):
         language_skill = cls(**kwargs, resume_id=resume_id)
         db.add(language_skill)
-        await db.commit()
-        await db.refresh(language_skill)
+        await db.flush()
         return language_skill
 
     @classmethod
@@ -359,11 +512,8 @@ class Others(Base):
 
     async def update(self, db: AsyncSession, **kwargs):
         for key, value in kwargs.items():
-            setattr(self, key, value)   
-        await db.commit()
-        await db.refresh(self)
+            setattr(self, key, value)
         return self
 
     async def delete(self, db: AsyncSession):
-        await db.delete(self)
-        await db.commit()
\ No newline at end of file
+        await db.delete(self)
\ No newline at end of file
@@ -0,0 +1,103 @@
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import JSON, DateTime, Index, String, case, exists, func, lambda_stmt, literal_column, select, text, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.models import Base
+
+# Inlined rather than bound, so even a generic plan of a prepared statement
+# matches the partial indexes on pending and retrying events.
+PENDING = literal_column("'pending'")
+RETRYING = literal_column("'retrying'")
+
+
+class StripeEvent(Base):
+    """Durable log of Stripe webhook events, keyed by Stripe's event id.
+
+    The webhook only records events; their effects are applied afterwards, in
+    order and exactly once, by app.stripe_events.process_pending_stripe_events.
+    """
+
+    __tablename__ = "stripe_events"
+
+    id: Mapped[str] = mapped_column(String, primary_key=True)  # evt_...
+    type: Mapped[str] = mapped_column(String)
+    payload: Mapped[dict] = mapped_column(JSON)
+    stripe_created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+    received_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    status: Mapped[str] = mapped_column(String, default="pending", server_default=text("'pending'"))  # pending, retrying, processed, failed
+    attempts: Mapped[int] = mapped_column(default=0, server_default=text("0"))
+    last_error: Mapped[Optional[str]]
+    processed_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))
+
+    @classmethod
+    async def record(cls, db: AsyncSession, id: str, type: str, payload: dict, stripe_created_at: datetime) -> bool:
+        """INSERT ... ON CONFLICT DO NOTHING; False when Stripe is redelivering an event we already have."""
+        stmt = (
+            insert(cls)
+            .values(id=id, type=type, payload=payload, stripe_created_at=stripe_created_at)
+            .on_conflict_do_nothing(index_elements=[cls.id])
+            .returning(cls.id)
+        )
+        result = await db.execute(stmt)
+        return result.scalar_one_or_none() is not None
+
+    @classmethod
+    async def lock_next_pending(cls, db: AsyncSession) -> Optional["StripeEvent"]:
+        """Oldest pending event, row-locked for the rest of the transaction."""
+        query = lambda_stmt(
+            lambda: select(StripeEvent)
+            .where(StripeEvent.status == PENDING)
+            .order_by(StripeEvent.stripe_created_at, StripeEvent.received_at)
+            .limit(1)
+            .with_for_update()
+        )
+        result = await db.execute(query)
+        return result.scalar_one_or_none()
+
+    @classmethod
+    async def has_pending(cls, db: AsyncSession) -> bool:
+        result = await db.execute(select(exists().where(cls.status == PENDING)))
+        return result.scalar()
+
+    @classmethod
+    async def record_failure(cls, db: AsyncSession, id: str, error: str, max_attempts: int):
+        """Count a failed attempt and park the event so later ones can proceed.
+
+        It waits as 'retrying' for requeue_retrying, or after max_attempts
+        stays 'failed'.
+        """
+        await db.execute(
+            update(cls)
+            .where(cls.id == id)
+            .values(
+                attempts=cls.attempts + 1,
+                last_error=error,
+                status=case((cls.attempts + 1 >= max_attempts, "failed"), else_="retrying"),
+            )
+        )
+
+    @classmethod
+    async def requeue_retrying(cls, db: AsyncSession) -> int:
+        """Make the parked events pending again; returns how many there were."""
+        result = await db.execute(update(cls).where(cls.status == RETRYING).values(status="pending"))
+        return result.rowcount
+
+
+# The consumer scans pending events oldest first
+Index(
+    "ix_stripe_events_pending",
+    StripeEvent.stripe_created_at,
+    StripeEvent.received_at,
+    postgresql_where=StripeEvent.status == "pending",
+)
+
+# ... and requeues the parked ones
+Index(
+    "ix_stripe_events_retrying",
+    StripeEvent.id,
+    postgresql_where=StripeEvent.status == "retrying",
+)
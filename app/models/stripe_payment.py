@@ -1,7 +1,7 @@
 from datetime import datetime
 from typing import TYPE_CHECKING, Optional
 
-from sqlalchemy import DateTime, ForeignKey, Integer, String, select
+from sqlalchemy import DateTime, ForeignKey, Integer, String, lambda_stmt, select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Mapped, foreign, mapped_column, relationship
 from sqlalchemy.sql import func
@@ -14,6 +14,9 @@ if TYPE_CHECKING:
 
 class StripePayment(Base):
     __tablename__ = "stripe_payments"
+    # Fetch server-generated columns (created_at/updated_at) with RETURNING
+    # during flush instead of a separate refresh SELECT.
+    __mapper_args__ = {"eager_defaults": True}
 
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
     payment_id: Mapped[str] = mapped_column(String, unique=True, index=True, nullable=True)
@@ -48,8 +51,7 @@ class StripePayment(Base):
     async def create(cls, db: AsyncSession, **kwargs):
         payment = cls(**kwargs)
         db.add(payment)
-        await db.commit()
-        await db.refresh(payment)
+        await db.flush()
         return payment
     
     @classmethod
@@ -60,6 +62,15 @@ class StripePayment(Base):
         result = await db.execute(stmt)
         return result.scalar_one_or_none()
 
+    @classmethod
+    async def get_by_intent_id(cls, db: AsyncSession, stripe_payment_intent_id: str):
+        # Cached lambda statement: built and compiled once, see Resume.get_owned.
+        stmt = lambda_stmt(
+            lambda: select(StripePayment).where(StripePayment.stripe_payment_intent_id == stripe_payment_intent_id)
+        )
+        result = await db.execute(stmt)
+        return result.scalar_one_or_none()
+
     @classmethod
     async def get_all(cls, db: AsyncSession, where_conditions: list = []):
         stmt = select(cls)
@@ -70,12 +81,10 @@ class StripePayment(Base):
 
     @classmethod
     async def update(cls, db: AsyncSession, payment_id: int, **kwargs):
-        payment = await cls.get(db, [cls.stripe_payment_intent_id == payment_id])
+        payment = await cls.get_by_intent_id(db, payment_id)
         if payment:
             for key, value in kwargs.items():
                 setattr(payment, key, value)
-            await db.commit()
-            await db.refresh(payment)
         return payment
 
     @classmethod
@@ -83,5 +92,4 @@ class StripePayment(Base):
         payment = await cls.get(db, [cls.id == id])
         if payment:
             await db.delete(payment)
-            await db.commit()
         return payment
\ No newline at end of file
@@ -0,0 +1,57 @@
+from datetime import datetime
+from typing import Iterable
+
+from sqlalchemy import DateTime, String, delete, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.sql import func
+
+from app.models import Base
+
+
+class UploadBlob(Base):
+    """Reference count for a content-addressed file in the blob store."""
+
+    __tablename__ = "upload_blobs"
+
+    key: Mapped[str] = mapped_column(String, primary_key=True)
+    ref_count: Mapped[int] = mapped_column(default=0, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+
+    @classmethod
+    async def add_references(cls, db: AsyncSession, keys: Iterable[str]):
+        rows = [{"key": key, "ref_count": 1} for key in keys]
+        if not rows:
+            return
+        stmt = insert(cls).values(rows)
+        await db.execute(stmt.on_conflict_do_update(
+            index_elements=[cls.key],
+            set_={"ref_count": cls.ref_count + 1},
+        ))
+
+    @classmethod
+    async def track(cls, db: AsyncSession, keys: Iterable[str]):
+        """Give `keys` a row (unreferenced) if they have none, so the collector considers their files."""
+        rows = [{"key": key, "ref_count": 0} for key in keys]
+        if rows:
+            await db.execute(insert(cls).values(rows).on_conflict_do_nothing(index_elements=[cls.key]))
+
+    @classmethod
+    async def release_references(cls, db: AsyncSession, keys: Iterable[str]):
+        keys = list(keys)
+        if keys:
+            await db.execute(update(cls).where(cls.key.in_(keys)).values(ref_count=cls.ref_count - 1))
+
+    @classmethod
+    async def delete_unreferenced(cls, db: AsyncSession, keys: Iterable[str]) -> list[str]:
+        """Drop rows of `keys` nobody references any more; returns the keys whose files can go.
+
+        The deleted rows stay locked until the transaction ends, which holds
+        off uploads referencing the same keys: delete the files before committing.
+        """
+        keys = list(keys)
+        if not keys:
+            return []
+        result = await db.execute(delete(cls).where(cls.key.in_(keys), cls.ref_count <= 0).returning(cls.key))
+        return list(result.scalars().all())
@@ -1,7 +1,8 @@
 from datetime import datetime
 from typing import TYPE_CHECKING, Any, List, Optional
 
-from sqlalchemy import DateTime, ForeignKey, Integer, desc, func, select
+from sqlalchemy import DateTime, ForeignKey, Index, Integer, desc, func, lambda_stmt, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Mapped, foreign, joinedload, mapped_column, relationship
 
@@ -15,6 +16,9 @@ if TYPE_CHECKING:
 
 class User(Base, DefaultFieldsMixin):
     __tablename__ = "users"
+    # Fetch server-generated columns (date_joined, timestamps) with RETURNING
+    # during flush instead of a separate refresh SELECT.
+    __mapper_args__ = {"eager_defaults": True}
 
     first_name: Mapped[str]
     last_name: Mapped[str]
@@ -50,26 +54,75 @@ class User(Base, DefaultFieldsMixin):
         _results = await db_session.execute(_stmt)
         return _results.scalars()
     
+    @classmethod
+    async def get_page(cls, db_session: AsyncSession, where_conditions: list[Any], before_id: int | None, limit: int):
+        """Keyset page ordered by id descending: up to `limit` users with id < before_id."""
+        _stmt = select(cls).where(*where_conditions)
+        if before_id is not None:
+            _stmt = _stmt.where(cls.id < before_id)
+        _stmt = _stmt.order_by(desc(cls.id)).limit(limit)
+        _results = await db_session.execute(_stmt)
+        return _results.scalars().all()
+
+    @classmethod
+    async def stream_all(cls, db_session: AsyncSession, where_conditions: list[Any], batch_size: int = 500):
+        """All matching users through a server-side cursor, fetched `batch_size` rows at a time."""
+        _stmt = (
+            select(cls)
+            .where(*where_conditions)
+            .order_by(desc(cls.id))
+            .execution_options(yield_per=batch_size)
+        )
+        return await db_session.stream_scalars(_stmt)
+
     @classmethod
     async def get_one(cls, database_session: AsyncSession, where_conditions: list[Any]):
         _stmt = select(cls).where(*where_conditions)
         _result = await database_session.execute(_stmt)
         return _result.scalars().first()
 
+    # Hot lookups (login, auth'd requests) as cached lambda statements; see Resume.get_owned.
+
+    @classmethod
+    async def get_by_email(cls, database_session: AsyncSession, email: str) -> Optional["User"]:
+        # Case-insensitive, served by the unique lower(email) index
+        _stmt = lambda_stmt(lambda: select(User).where(func.lower(User.email) == func.lower(email)))
+        _result = await database_session.execute(_stmt)
+        return _result.scalars().first()
+
+    @classmethod
+    async def get_by_id(cls, database_session: AsyncSession, id: int) -> Optional["User"]:
+        _stmt = lambda_stmt(lambda: select(User).where(User.id == id))
+        _result = await database_session.execute(_stmt)
+        return _result.scalars().first()
+
     @classmethod
     async def create_user(cls, db: AsyncSession, desk):
         db.add(desk)
 
+    @classmethod
+    async def create_if_absent(cls, db: AsyncSession, **kwargs) -> Optional[int]:
+        """INSERT ... ON CONFLICT DO NOTHING RETURNING id, in one round trip.
+
+        Returns None when the email is taken (the unique email and
+        lower(email) indexes), also by a concurrent signup.
+        """
+        stmt = pg_insert(User).values(**kwargs).on_conflict_do_nothing().returning(User.id)
+        result = await db.execute(stmt)
+        return result.scalar_one_or_none()
+
     @classmethod
     async def update(cls, db: AsyncSession, id: int, **kwargs):
-        user = await cls.get_one(db, [cls.id == id])
+        user = await cls.get_by_id(db, id)
         if user:
             for key, value in kwargs.items():
                 setattr(user, key, value)
-            await db.commit()
-            await db.refresh(user)
         return user
 
     def update_user(self, updated_data):
         for field, value in updated_data.items():
-            setattr(self, field, value)
\ No newline at end of file
+            setattr(self, field, value)
+
+
+# Emails are unique regardless of case; this also serves get_by_email.
+Index("ix_users_email_lower", func.lower(User.email), unique=True)
@@ -0,0 +1,135 @@
+"""Resume PDFs: Jinja2 HTML templates rendered to PDF by xhtml2pdf.
+
+Rendering is CPU-bound (layout, font metrics, image decoding), so it runs on
+a process pool of PDF_WORKERS, like the image derivatives in app/images.py.
+At most PDF_MAX_PENDING renders may be running or queued; beyond that
+render_resume_pdf raises PdfRendererBusy instead of letting requests pile up.
+"""
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from pathlib import Path
+
+import orjson
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+from markupsafe import Markup, escape
+
+from app.metrics import Gauge
+
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", os.cpu_count() or 2))
+# Renders allowed to be running or queued before new ones are rejected.
+PDF_MAX_PENDING = int(os.getenv("PDF_MAX_PENDING", 4 * PDF_WORKERS))
+# The PDF base fonts only cover Latin-1; point this at a TTF for other scripts.
+PDF_FONT_PATH = os.getenv("PDF_FONT_PATH")
+
+TEMPLATE_DIR = Path(__file__).parent / "templates" / "resume"
+RESUME_TEMPLATES = ("europass",)
+DEFAULT_TEMPLATE = "europass"
+
+_pdf_executor: ProcessPoolExecutor | None = None
+_pdf_jobs_pending = 0
+# One per worker process, built on its first render
+_environment: Environment | None = None
+
+
+class PdfRendererBusy(Exception):
+    """Raised when the PDF pool already has too much queued work."""
+
+
+class PdfRenderError(Exception):
+    pass
+
+
+def _as_date(value: date | str | None) -> date | None:
+    # Dates arrive as ISO strings from the JSON document
+    if value is None or isinstance(value, date):
+        return value
+    return date.fromisoformat(value[:10])
+
+
+def month_year(value: date | str | None) -> str:
+    value = _as_date(value)
+    return value.strftime("%b %Y") if value else ""
+
+
+def full_date(value: date | str | None) -> str:
+    value = _as_date(value)
+    return value.strftime("%d/%m/%Y") if value else ""
+
+
+def paragraphs(value: str | None) -> Markup:
+    return Markup("<br/>").join(escape(line) for line in (value or "").splitlines())
+
+
+def _get_environment() -> Environment:
+    global _environment
+    if _environment is None:
+        _environment = Environment(
+            loader=FileSystemLoader(TEMPLATE_DIR),
+            autoescape=select_autoescape(["html"]),
+        )
+        _environment.filters.update(month_year=month_year, full_date=full_date, paragraphs=paragraphs)
+    return _environment
+
+
+def _render_pdf(document: str | bytes, template: str, destination: Path, photo_path: str | None) -> int:
+    """Runs in a worker process: write the resume `document` (JSON) as a PDF, return its size."""
+    # Imported here: xhtml2pdf pulls in reportlab, which only the workers need
+    from xhtml2pdf import pisa
+
+    html = _get_environment().get_template(f"{template}.html").render(
+        resume=orjson.loads(document),
+        photo_path=photo_path,
+        font_path=PDF_FONT_PATH,
+    )
+    temp_path = destination.with_name(f".{destination.name}.part")
+    try:
+        with open(temp_path, "wb") as f:
+            result = pisa.CreatePDF(html, dest=f, encoding="utf-8")
+        if result.err:
+            raise PdfRenderError(f"{result.err} error(s) rendering {template}")
+        os.replace(temp_path, destination)
+    finally:
+        temp_path.unlink(missing_ok=True)
+    return destination.stat().st_size
+
+
+async def render_resume_pdf(document: str | bytes, template: str, destination: Path, photo_path: Path | None = None) -> int:
+    """Render `document` with `template` to `destination` on the PDF process pool."""
+    global _pdf_executor, _pdf_jobs_pending
+    if _pdf_jobs_pending >= PDF_MAX_PENDING:
+        raise PdfRendererBusy()
+    if _pdf_executor is None:
+        _pdf_executor = ProcessPoolExecutor(max_workers=PDF_WORKERS)
+    _pdf_jobs_pending += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            _pdf_executor,
+            _render_pdf,
+            document,
+            template,
+            destination,
+            None if photo_path is None else str(photo_path.resolve()),
+        )
+    finally:
+        _pdf_jobs_pending -= 1
+
+
+def pdf_pool_stats() -> dict[str, int]:
+    return {
+        "workers": PDF_WORKERS,
+        "pending": _pdf_jobs_pending,
+        "max_pending": PDF_MAX_PENDING,
+    }
+
+
+Gauge("pdf_render_pool", "PDF rendering pool size and queued work.", labelnames=("stat",), collect=pdf_pool_stats)
+
+
+def shutdown_pdf_pool():
+    global _pdf_executor
+    if _pdf_executor is not None:
+        _pdf_executor.shutdown(wait=False, cancel_futures=True)
+        _pdf_executor = None
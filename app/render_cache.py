@@ -0,0 +1,212 @@
+"""On-disk cache of rendered resume exports (PDFs).
+
+A file is named after what it was rendered from: resume id, resume version,
+template and format. Every mutation bumps the version, so a cached file can
+never be served for content it doesn't match; the superseded files are
+deleted after the mutation commits, and a background job (app.jobs) renders
+the new version ahead of time (pre-warms it) so the next download is a hit. Files are sent with
+FileResponse, which servers that support it turn into sendfile.
+
+The cache keeps at most RENDER_CACHE_MAX_BYTES, evicting least recently used
+files. Each process indexes the directory on first use; files rendered by
+another process are picked up on lookup.
+"""
+import asyncio
+import os
+from collections import OrderedDict
+from datetime import timedelta
+from pathlib import Path
+from typing import Awaitable, Callable, NamedTuple
+
+import orjson
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+from app.database import AsyncSessionFactory, after_commit
+from app.documents import get_resume_document
+from app.jobs import enqueue_job, job_handler
+from app.metrics import render_cache_evictions, render_cache_hits, render_cache_misses
+from app.pdf import DEFAULT_TEMPLATE, render_resume_pdf
+from app.storage import blob_key_from_url, get_blob_store
+from app.uploads import UPLOAD_DIR
+
+RENDER_CACHE_DIR = Path(os.getenv("RENDER_CACHE_DIR", UPLOAD_DIR / ".renders"))
+RENDER_CACHE_MAX_BYTES = int(os.getenv("RENDER_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+# Saves usually come in bursts (one PUT per section); pre-warm once they settle.
+RENDER_PREWARM_DELAY_SECONDS = float(os.getenv("RENDER_PREWARM_DELAY_SECONDS", "5"))
+RENDER_PREWARM = os.getenv("RENDER_PREWARM", "true").lower() == "true"
+RENDER_PDF_JOB = "resume.render_pdf"
+
+
+class RenderKey(NamedTuple):
+    resume_id: int
+    version: int
+    template: str
+    format: str
+
+    @property
+    def filename(self) -> str:
+        return f"resume-{self.resume_id}-v{self.version}-{self.template}.{self.format}"
+
+    @property
+    def etag(self) -> str:
+        return f'"resume-{self.resume_id}-v{self.version}-{self.template}-{self.format}"'
+
+
+class RenderCache:
+    def __init__(self, root: Path, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._sizes: OrderedDict[str, int] | None = None  # filename -> size, least recently used first
+        self._total = 0
+        self._renders: dict[str, asyncio.Future] = {}
+
+    def _scan(self):
+        self.root.mkdir(parents=True, exist_ok=True)
+        files = []
+        for entry in os.scandir(self.root):
+            # Dot files are renders still being written
+            if entry.is_file() and not entry.name.startswith("."):
+                stat = entry.stat()
+                files.append((stat.st_mtime, entry.name, stat.st_size))
+        self._sizes = OrderedDict((name, size) for _, name, size in sorted(files))
+        self._total = sum(self._sizes.values())
+
+    async def _index(self) -> OrderedDict[str, int]:
+        if self._sizes is None:
+            await run_in_threadpool(self._scan)
+        return self._sizes
+
+    def _touch(self, path: Path) -> int | None:
+        # The mtime records recency for the next process that indexes the directory
+        try:
+            os.utime(path)
+            return path.stat().st_size
+        except FileNotFoundError:
+            return None
+
+    async def get(self, key: RenderKey) -> Path | None:
+        sizes = await self._index()
+        path = self.root / key.filename
+        size = await run_in_threadpool(self._touch, path)
+        if size is None:
+            # Evicted or discarded by another process
+            self._forget(key.filename)
+            render_cache_misses.inc()
+            return None
+        if key.filename not in sizes:
+            self._add(key.filename, size)
+        sizes.move_to_end(key.filename)
+        render_cache_hits.inc()
+        return path
+
+    async def render(self, key: RenderKey, render: Callable[[Path], Awaitable[int]]) -> Path:
+        """Render `key` into the cache with `render(destination)`, which returns the size.
+
+        Concurrent renders of the same key share one; it is shielded so a client
+        that disconnects doesn't cancel it for the others.
+        """
+        future = self._renders.get(key.filename)
+        if future is None:
+            future = asyncio.ensure_future(self._render(key, render))
+            self._renders[key.filename] = future
+            future.add_done_callback(lambda _: self._renders.pop(key.filename, None))
+        return await asyncio.shield(future)
+
+    async def _render(self, key: RenderKey, render: Callable[[Path], Awaitable[int]]) -> Path:
+        await self._index()
+        path = self.root / key.filename
+        size = await render(path)
+        self._add(key.filename, size)
+        await self._evict()
+        return path
+
+    def _add(self, filename: str, size: int):
+        self._forget(filename)
+        self._sizes[filename] = size
+        self._total += size
+
+    def _forget(self, filename: str):
+        size = self._sizes.pop(filename, None) if self._sizes is not None else None
+        if size is not None:
+            self._total -= size
+
+    async def _evict(self):
+        victims = []
+        # Never evict the file just rendered, even if it alone exceeds the limit
+        while self._total > self.max_bytes and len(self._sizes) > 1:
+            filename, size = self._sizes.popitem(last=False)
+            self._total -= size
+            victims.append(self.root / filename)
+        for path in victims:
+            await run_in_threadpool(path.unlink, missing_ok=True)
+        render_cache_evictions.inc(len(victims))
+
+    async def discard_resume(self, resume_id: int, keep_version: int | None = None):
+        """Delete the resume's cached files, except those of `keep_version`."""
+        await self._index()
+        prefix = f"resume-{resume_id}-v"
+        keep = None if keep_version is None else f"{prefix}{keep_version}-"
+        stale = [name for name in self._sizes if name.startswith(prefix) and not (keep and name.startswith(keep))]
+        for filename in stale:
+            self._forget(filename)
+            await run_in_threadpool((self.root / filename).unlink, missing_ok=True)
+
+
+_render_cache: RenderCache | None = None
+
+
+def get_render_cache() -> RenderCache:
+    global _render_cache
+    if _render_cache is None:
+        _render_cache = RenderCache(RENDER_CACHE_DIR, RENDER_CACHE_MAX_BYTES)
+    return _render_cache
+
+
+def resume_photo_path(resume: dict) -> Path | None:
+    """Local file of the resume's photo; the small derivative is plenty for the PDF."""
+    url = (resume.get("resume_image_variants") or {}).get("thumb") or resume.get("resume_image")
+    if url is None:
+        return None
+    key = blob_key_from_url(url)
+    if key is None:
+        return UPLOAD_DIR / Path(url).name
+    # Remote stores (S3) have no local copy; the PDF is rendered without the photo
+    return get_blob_store().local_path(key)
+
+
+async def render_cached_resume_pdf(key: RenderKey, document: str) -> Path:
+    """Render the resume `document` (JSON) as `key` into the render cache."""
+    photo_path = resume_photo_path(orjson.loads(document))
+    return await get_render_cache().render(
+        key, lambda destination: render_resume_pdf(document, key.template, destination, photo_path)
+    )
+
+
+@job_handler(RENDER_PDF_JOB)
+async def prewarm_resume_pdf(payload: dict):
+    async with AsyncSessionFactory() as session:
+        row = await get_resume_document(session, payload["resume_id"], payload["user_id"])
+    # Deleted, or saved again since; the later save queued its own job
+    if row is None or row.version != payload["version"]:
+        return
+    key = RenderKey(payload["resume_id"], row.version, DEFAULT_TEMPLATE, "pdf")
+    if await get_render_cache().get(key) is None:
+        await render_cached_resume_pdf(key, row.document)
+
+
+async def supersede_resume_renders(db: AsyncSession, user_id: int, resume_id: int, version: int | None):
+    """Once the mutation commits, drop the renders of other versions than `version` and pre-warm it.
+
+    `version` None means the resume is gone; all its renders are dropped.
+    """
+    after_commit(db, lambda: get_render_cache().discard_resume(resume_id, keep_version=version))
+    if version is not None and RENDER_PREWARM:
+        await enqueue_job(
+            db,
+            RENDER_PDF_JOB,
+            {"resume_id": resume_id, "user_id": user_id, "version": version},
+            priority=-10,  # after anything a user is waiting for
+            delay=timedelta(seconds=RENDER_PREWARM_DELAY_SECONDS),
+            user_id=user_id,
+        )
@@ -0,0 +1,68 @@
+from functools import lru_cache
+from typing import Any, Callable
+
+import orjson
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import ORJSONResponse as BaseORJSONResponse
+from fastapi.routing import APIRoute
+from pydantic import TypeAdapter
+
+
+class ORJSONResponse(BaseORJSONResponse):
+    """The app's default response class.
+
+    orjson writes date/datetime natively; OPT_UTC_Z renders UTC as "...Z", the
+    same as Pydantic, so a field looks the same whichever path produced it.
+    Anything orjson doesn't know falls back to jsonable_encoder.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(
+            content,
+            default=jsonable_encoder,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z,
+        )
+
+
+class ORJSONRequest(Request):
+    async def json(self) -> Any:
+        if not hasattr(self, "_json"):
+            # orjson.JSONDecodeError subclasses json.JSONDecodeError, so FastAPI
+            # still answers malformed bodies with its json_invalid 422.
+            self._json = orjson.loads(await self.body())
+        return self._json
+
+
+class ORJSONRoute(APIRoute):
+    """Route class that decodes JSON request bodies with orjson."""
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+
+        async def route_handler(request: Request) -> Response:
+            return await handler(ORJSONRequest(request.scope, request.receive))
+
+        return route_handler
+
+
+@lru_cache
+def _adapter(schema: Any) -> TypeAdapter:
+    return TypeAdapter(schema)
+
+
+def model_response(schema: Any, value: Any, response: Response | None = None, status_code: int = 200) -> Response:
+    """Validate `value` as `schema` and serialize it in one pass of Pydantic's core.
+
+    Use it where a route would return ORM objects through response_model: it
+    skips FastAPI's validate -> to_python -> jsonable_encoder -> render chain.
+    FastAPI ignores the injected `response` once a Response is returned, so its
+    status code and headers are carried over here.
+    """
+    adapter = _adapter(schema)
+    body = adapter.dump_json(adapter.validate_python(value, from_attributes=True))
+    headers = None
+    if response is not None:
+        status_code = response.status_code or status_code
+        headers = {key: value for key, value in response.headers.items() if key != "content-length"}
+    return Response(body, status_code=status_code, media_type="application/json", headers=headers)
@@ -9,10 +9,16 @@ from starlette import status
 
 from ..database import get_async_db
 from ..models.users import User
+from ..responses import ORJSONRoute
 from ..schemas.users import Token, UserBaseSchema, UserCreateSchema
-from ..utils import create_access_token, get_hashed_password, verify_password
-
-router = APIRouter(prefix="/auth", tags=["auth"])
+from ..utils import (
+    PasswordHasherBusy,
+    create_access_token,
+    get_hashed_password_async,
+    verify_and_update_password,
+)
+
+router = APIRouter(prefix="/auth", tags=["auth"], route_class=ORJSONRoute)
 db_dep = Annotated[AsyncSession, Depends(get_async_db)]
 
 
@@ -21,13 +27,32 @@ class UserLogin(BaseModel):
     password: str
 
 
+def password_hasher_busy() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Server is busy, please try again shortly.",
+        headers={"Retry-After": "1"},
+    )
+
+
+def user_already_exists() -> HTTPException:
+    return HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="User Already Exists")
+
+
 async def authenticate_user(email: str, password: str, db: db_dep):
-    user = await User.get_one(db, [User.email == email])
+    user = await User.get_by_email(db, email)
 
     if not user:
         return False
-    if not verify_password(password, user.password):
+    try:
+        verified, new_hash = await verify_and_update_password(password, user.password)
+    except PasswordHasherBusy:
+        raise password_hasher_busy()
+    if not verified:
         return False
+    if new_hash:
+        # Stored hash used an older cost factor; upgrade it with this request's commit.
+        user.password = new_hash
     return user
 
 
@@ -77,12 +102,6 @@ async def create_user(user: UserCreateSchema, db: db_dep):
 
     _user = user.model_dump()
 
-    user_exists = await User.get_one(db, [User.email == _user.get("email")])
-    if user_exists:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN, detail="User Already Exists"
-        )
-
     password = _user.pop("password")
     password2 = _user.pop("password2")
 
@@ -91,10 +110,20 @@ async def create_user(user: UserCreateSchema, db: db_dep):
             status_code=status.HTTP_403_FORBIDDEN, detail="Password Didn't macth"
         )
 
-    new_user = User(**_user, password=get_hashed_password(password), is_active=True)
+    # Turn away a taken email before spending a hash from the bounded pool on
+    # it, so repeated duplicate signups can't crowd out logins.
+    if await User.get_by_email(db, _user["email"]) is not None:
+        raise user_already_exists()
+
+    try:
+        hashed_password = await get_hashed_password_async(password)
+    except PasswordHasherBusy:
+        raise password_hasher_busy()
 
-    db.add(new_user)
-    await db.commit()
+    # The unique email indexes still decide a race; a double-submitted signup inserts once.
+    user_id = await User.create_if_absent(db, **_user, password=hashed_password, is_active=True)
+    if user_id is None:
+        raise user_already_exists()
 
 
 # @router.post("/logout", status_code=status.HTTP_201_CREATED, response_model=UserLogoutResponse)
@@ -0,0 +1,25 @@
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.dependencies.auth import get_current_user
+
+from ..database import get_async_db
+from ..models.job import Job
+from ..responses import ORJSONRoute, model_response
+from ..schemas import jobs as schemas
+
+router = APIRouter(prefix="/jobs", tags=["jobs"], route_class=ORJSONRoute)
+
+db_dep = Annotated[AsyncSession, Depends(get_async_db)]
+current_user_dep = Annotated[dict, Depends(get_current_user)]
+
+
+@router.get("/{job_id}", response_model=schemas.Job)
+async def get_job(job_id: int, db: db_dep, current_user: current_user_dep):
+    # Only jobs enqueued for the user are visible to them
+    job = await Job.get_for_user(db, job_id, current_user.get('id'))
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return model_response(schemas.Job, job)
@@ -1,18 +1,42 @@
+import hashlib
 import logging
-import os
-import shutil
+import re
 import uuid
-from math import exp
+from datetime import datetime
 from pathlib import Path
-from typing import Annotated, List
-
-from fastapi import APIRouter, Depends, File, HTTPException, UploadFile, status
-from sqlalchemy import select
+from typing import Annotated, List, Optional
+
+from fastapi import (
+    APIRouter,
+    BackgroundTasks,
+    Depends,
+    File,
+    Header,
+    HTTPException,
+    Request,
+    Response,
+    UploadFile,
+    status,
+)
+from fastapi.responses import FileResponse, RedirectResponse, StreamingResponse
+from sqlalchemy import select, update
 from sqlalchemy.ext.asyncio import AsyncSession
-
-from app.dependencies.auth import get_current_user
-
-from ..database import get_async_db
+from starlette.concurrency import run_in_threadpool
+
+from app.dependencies.auth import get_current_user, get_staff_user
+
+from ..cache import CachedResponse, get_resume_cache, resume_cache_key
+from ..database import after_commit, after_rollback, get_async_db
+from ..documents import get_resume_document, get_user_resume_documents
+from ..exports import stream_resume_zip
+from ..helpers.conditional import etag_in, http_date, is_conditional, not_modified
+from ..images import (
+    DEFAULT_DERIVATIVE,
+    IMAGE_DERIVATIVES,
+    InvalidImage,
+    generate_image_derivatives,
+)
+from ..jobs import enqueue_job
 from ..models.resume import (
     DrivingLicense,
     Education,
@@ -20,36 +44,200 @@ from ..models.resume import (
     LanguageSkill,
     Others,
     Resume,
+    SectionItemNotFound,
     TrainingAward,
 )
+from ..models.upload_blob import UploadBlob
+from ..models.users import User
+from ..pdf import (
+    DEFAULT_TEMPLATE,
+    RESUME_TEMPLATES,
+    PdfRendererBusy,
+)
+from ..render_cache import RenderKey, get_render_cache, render_cached_resume_pdf, supersede_resume_renders
+from ..responses import ORJSONRoute, model_response
 from ..schemas import resume as schemas
+from ..storage import COLLECT_BLOBS_JOB, blob_key_for, blob_key_from_url, discard_blobs, get_blob_store
+from ..uploads import (
+    INCOMING_DIR,
+    MAX_IMAGE_BYTES,
+    UPLOAD_DIR,
+    UnsupportedImage,
+    UploadTooLarge,
+    remove_upload,
+    save_image_upload,
+)
 
-router = APIRouter(prefix="/resumes")
+router = APIRouter(prefix="/resumes", route_class=ORJSONRoute)
 
 db_dep = Annotated[AsyncSession, Depends(get_async_db)]
 current_user_dep = Annotated[dict, Depends(get_current_user)]
+if_match_dep = Annotated[Optional[str], Header(alias="If-Match")]
+
+
+async def sync_resume_section(db: AsyncSession, resume_id: int, model, items: list, not_found_detail: str):
+    try:
+        # Existing items only change the fields the client sent
+        await model.sync_for_resume(db, resume_id, [item.model_dump(exclude_unset=item.id is not None) for item in items])
+    except SectionItemNotFound:
+        raise HTTPException(status_code=404, detail=not_found_detail)
+
+
+async def document_response(db: AsyncSession, resume_id: int, user_id: int, response: Response) -> Response:
+    """The resume as it stands in this transaction, rendered like the GETs render it."""
+    row = await get_resume_document(db, resume_id, user_id)
+    if row is None:
+        raise HTTPException(status_code=404, detail="Resume not found")
+    headers = {key: value for key, value in response.headers.items() if key != "content-length"}
+    return Response(row.document.encode(), media_type="application/json", headers=headers)
+
+
+def resume_etag(resume_id: int, version: int) -> str:
+    return f'"resume-{resume_id}-v{version}"'
+
+
+def resume_list_etag(versions: list[tuple[int, int]]) -> str:
+    digest = hashlib.sha256(",".join(f"{id}:{version}" for id, version in versions).encode()).hexdigest()
+    return f'"resumes-{digest[:32]}"'
+
+
+def cache_validators(etag: str, updated_at: datetime | None) -> dict[str, str]:
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if updated_at is not None:
+        headers["Last-Modified"] = http_date(updated_at)
+    return headers
+
+
+def if_match_versions(resume_id: int, if_match: str) -> list[int]:
+    """Versions of this resume named by an If-Match header (strong ETags only)."""
+    pattern = re.compile(rf'^"resume-{resume_id}-v(\d+)"$')
+    return [
+        int(match.group(1))
+        for match in map(pattern.match, (tag.strip() for tag in if_match.split(",")))
+        if match is not None
+    ]
+
+
+async def touch_resume(
+    db: AsyncSession,
+    resume_id: int,
+    user_id: int,
+    response: Response,
+    if_match: str | None = None,
+    not_found_detail: str = "Resume not found",
+):
+    """Check ownership and the If-Match precondition, and bump the resume's version.
+
+    One UPDATE ... RETURNING does all three; the new ETag goes on the response.
+    Only when it matches nothing is a second query needed, to tell a missing
+    resume (404) from a stale precondition (412).
+    """
+    expected = None
+    if if_match is not None and if_match.strip() != "*":
+        expected = if_match_versions(resume_id, if_match)
+        if not expected:
+            raise HTTPException(status_code=412, detail="Resume has been modified")
+
+    stamp = await Resume.bump_version(db, resume_id, user_id, expected)
+    if stamp is None:
+        if expected and await Resume.is_owned_by(db, resume_id, user_id):
+            raise HTTPException(status_code=412, detail="Resume has been modified")
+        raise HTTPException(status_code=404, detail=not_found_detail)
+
+    response.headers.update(cache_validators(resume_etag(resume_id, stamp.version), stamp.updated_at))
+    await invalidate_cached_resume(db, user_id, resume_id, stamp.version - 1, stamp.version)
+    return stamp
+
+
+async def invalidate_cached_resume(db: AsyncSession, user_id: int, resume_id: int, old_version: int, version: int | None = None):
+    # Cached responses are keyed by version, so the old one can't be served
+    # any more; this only frees it, once the change is committed. Renders of
+    # other versions than `version` go too (all of them when None).
+    cache = get_resume_cache()
+    after_commit(db, lambda: cache.delete(resume_cache_key(user_id, resume_id, old_version)))
+    await supersede_resume_renders(db, user_id, resume_id, version)
+
+
+# The GETs return JSON rendered by Postgres (see app/documents.py) as is;
+# response_model only documents the shape.
 
 @router.get("/", response_model=List[schemas.Resume])
-async def get_all_resumes(db: db_dep, current_user: current_user_dep):
-    return await Resume.get_all(db, where_conditions=[Resume.user_id == current_user.get('id')])
+async def get_all_resumes(request: Request, db: db_dep, current_user: current_user_dep):
+    user_id = current_user.get('id')
+    if is_conditional(request):
+        stamps = await Resume.get_versions_for_user(db, user_id)
+        etag = resume_list_etag([(stamp.id, stamp.version) for stamp in stamps])
+        last_modified = max((stamp.updated_at for stamp in stamps), default=None)
+        if not_modified(request, etag, last_modified):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=cache_validators(etag, last_modified))
+
+    rows = await get_user_resume_documents(db, user_id)
+    etag = resume_list_etag([(row.id, row.version) for row in rows])
+    last_modified = max((row.updated_at for row in rows), default=None)
+    body = "[" + ",".join(row.document for row in rows) + "]"
+    return Response(body.encode(), media_type="application/json", headers=cache_validators(etag, last_modified))
+
+# Declared before /{resume_id}, which would otherwise match "export"
+@router.get("/export", response_class=StreamingResponse)
+async def export_resumes(
+    staff: Annotated[User, Depends(get_staff_user)],
+    referred_by: Optional[str] = None,
+    updated_after: Optional[datetime] = None,
+    updated_before: Optional[datetime] = None,
+):
+    """Every matching resume as a PDF, in one ZIP archive streamed as it is built (staff only)."""
+    where_conditions = []
+    if referred_by is not None:
+        where_conditions.append(Resume.referred_by == referred_by)
+    if updated_after is not None:
+        where_conditions.append(Resume.updated_at >= updated_after)
+    if updated_before is not None:
+        where_conditions.append(Resume.updated_at < updated_before)
+
+    return StreamingResponse(
+        stream_resume_zip(where_conditions),
+        media_type="application/zip",
+        headers={"Content-Disposition": 'attachment; filename="resumes.zip"'},
+    )
 
 @router.get("/{resume_id}", response_model=schemas.Resume)
-async def get_resume(resume_id: int, db: db_dep, current_user: current_user_dep):
+async def get_resume(resume_id: int, request: Request, db: db_dep, current_user: current_user_dep):
+    # The current version comes from the resumes row alone, without the
+    # sections; it answers revalidation and keys the cached JSON bytes
+    stamp = await Resume.get_version(db, resume_id, current_user.get('id'))
+    if stamp is None:
+        raise HTTPException(status_code=404, detail="Resume not found")
+    etag = resume_etag(resume_id, stamp.version)
+    if not_modified(request, etag, stamp.updated_at):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=cache_validators(etag, stamp.updated_at))
+
+    cache = get_resume_cache()
+    cached = await cache.get(resume_cache_key(current_user.get('id'), resume_id, stamp.version))
+    if cached is not None:
+        return Response(cached.body, media_type="application/json", headers=cached.headers)
 
-    return await Resume.get_one(db, where_conditions=[Resume.id == resume_id, Resume.user_id == current_user.get('id')])
+    row = await get_resume_document(db, resume_id, current_user.get('id'))
+    if row is None:
+        raise HTTPException(status_code=404, detail="Resume not found")
+
+    # Stored under the version it was rendered from, which is newer than
+    # stamp's if a change committed in between
+    cached = CachedResponse(row.document.encode(), cache_validators(resume_etag(resume_id, row.version), row.updated_at))
+    await cache.set(resume_cache_key(current_user.get('id'), resume_id, row.version), cached)
+    return Response(cached.body, media_type="application/json", headers=cached.headers)
 
 @router.post("/", response_model=schemas.Resume, status_code=status.HTTP_201_CREATED)
 async def create_resume(resume: schemas.ResumeCreate, db: db_dep, current_user: current_user_dep):
-    already_resume_exists = await Resume.get_one(db, where_conditions=[Resume.user_id==current_user['id'] ])
-    print(already_resume_exists)
-    if already_resume_exists is not None:
+    db_resume = await Resume.create(db, **resume.model_dump(), user_id=current_user['id'])
+    if db_resume is None:
         raise HTTPException(status_code=402, detail="Resume already Exists, 1 Resume per User can't create more")
 
-    return await Resume.create(db, **resume.model_dump(), user_id=current_user['id'])
+    return model_response(schemas.Resume, db_resume, status_code=status.HTTP_201_CREATED)
 
 @router.put("/{resume_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def update_resume(resume_id: int,resume: schemas.ResumeUpdate, db: db_dep, current_user: current_user_dep):
-    db_resume = await Resume.get_one(db, [Resume.id == resume_id, Resume.user_id == current_user['id']])
+async def update_resume(resume_id: int,resume: schemas.ResumeUpdate, response: Response, db: db_dep, current_user: current_user_dep, if_match: if_match_dep = None):
+    await touch_resume(db, resume_id, current_user['id'], response, if_match)
+    db_resume = await Resume.get_owned(db, resume_id, current_user['id'], with_children=False)
     if db_resume is None:
         raise HTTPException(status_code=404, detail="Resume not found")
     
@@ -81,57 +269,23 @@ async def update_resume(resume_id: int,resume: schemas.ResumeUpdate, db: db_dep,
 #     return db_resume
 
 @router.put("/{resume_id}/experiences/multi/", response_model=schemas.Resume)
-async def update_resume_experience_multi(resume_id: int, data: schemas.ExperienceUpdateMulti, db: db_dep, current_user: current_user_dep):
-    db_resume = await Resume.get_one(db, [Resume.id == resume_id, Resume.user_id == current_user.get('id')])
-    if db_resume is None:
-        raise HTTPException(status_code=404, detail="Resume not found")
+async def update_resume_experience_multi(resume_id: int, data: schemas.ExperienceUpdateMulti, response: Response, db: db_dep, current_user: current_user_dep, if_match: if_match_dep = None):
+    await touch_resume(db, resume_id, current_user.get('id'), response, if_match)
     experiences = data.experiences    
     job_applied_for = data.job_applied_for
 
     if job_applied_for is not None:
-        db_resume.job_applied_for = job_applied_for
+        await db.execute(update(Resume).where(Resume.id == resume_id).values(job_applied_for=job_applied_for))
 
-    if not experiences:
-        await db.commit()
-        await db.refresh(db_resume)
-        return db_resume
-    
-    incoming_experience_ids = {experience.id for experience in experiences if experience.id is not None}
-
-    # Delete experiences that are not in the incoming data
-    for existing_experience in db_resume.experiences:
-        if existing_experience.id not in incoming_experience_ids:
-            await existing_experience.delete(db)
-
-    for experience in experiences:
-        if experience.id is None:
-            # Create new experience
-            new_experience = Experience(**experience.model_dump(exclude={'id'}), resume_id=resume_id)
-            db.add(new_experience)
-        else:
-            # Update existing experience
-            for existing_experience in db_resume.experiences:
-                if existing_experience.id == experience.id:
-                    for key, value in experience.model_dump(exclude_unset=True).items():
-                        setattr(existing_experience, key, value)
-                    break
-            else:
-                raise HTTPException(status_code=404, detail="Experience not found")
-    
-    await db.commit()
-    await db.refresh(db_resume)
-    return db_resume
+    if experiences:
+        await sync_resume_section(db, resume_id, Experience, experiences, "Experience not found")
+    return await document_response(db, resume_id, current_user.get('id'), response)
 
 @router.delete("/{resume_id}/experiences/{experience_id}/", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_resume_experience(resume_id: int, experience_id: int, db: db_dep, current_user: current_user_dep):
-    db_resume = await Resume.get_one(db, [Resume.id == resume_id, Resume.user_id == current_user.get('id')])
-    if db_resume is None:
-        raise HTTPException(status_code=404, detail="Resume not found")
+async def delete_resume_experience(resume_id: int, experience_id: int, response: Response, db: db_dep, current_user: current_user_dep, if_match: if_match_dep = None):
+    await touch_resume(db, resume_id, current_user.get('id'), response, if_match)
     
-    for experience in db_resume.experiences:
-        if experience.id == experience_id:
-            await experience.delete(db)
-            break
+    await Experience.delete_for_resume(db, resume_id, experience_id)
 
 
 # @router.put("/{resume_id}/education", response_model=schemas.Resume)
@@ -160,66 +314,34 @@ async def delete_resume_experience(resume_id: int, experience_id: int, db: db_de
 #     return db_resume
 
 @router.put("/{resume_id}/education/multi/", response_model=schemas.Resume)
-async def update_resume_education_multi(resume_id: int, data: schemas.EducationUpdateMulti, db: db_dep, current_user: current_user_dep):
-    db_resume = await Resume.get_one(db, [Resume.id == resume_id, Resume.user_id == current_user.get('id')])
-    if db_resume is None:
-        raise HTTPException(status_code=404, detail="Resume not found")
+async def update_resume_education_multi(resume_id: int, data: schemas.EducationUpdateMulti, response: Response, db: db_dep, current_user: current_user_dep, if_match: if_match_dep = None):
+    await touch_resume(db, resume_id, current_user.get('id'), response, if_match)
     
     educations = data.educations
 
-    
-
     if not educations:
         raise HTTPException(status_code=400, detail="No educations provided")
     
-    incoming_education_ids = {education.id for education in educations if education.id is not None}
-
-    # Delete educations that are not in the incoming data
-    for existing_education in db_resume.education:
-        if existing_education.id not in incoming_education_ids:
-            await existing_education.delete(db)
-
-    for education in educations:
-        if education.id is None:
-            # Create new education
-            new_education = Education(**education.model_dump(exclude={'id'}), resume_id=resume_id)
-            db.add(new_education)
-        else:
-            # Update existing education
-            for existing_education in db_resume.education:
-                if existing_education.id == education.id:
-                    for key, value in education.model_dump(exclude_unset=True).items():
-                        setattr(existing_education, key, value)
-                    break
-            else:
-                raise HTTPException(status_code=404, detail="Education not found")
-    
-    await db.commit()
-    await db.refresh(db_resume)
-    return db_resume
+    await sync_resume_section(db, resume_id, Education, educations, "Education not found")
+    return await document_response(db, resume_id, current_user.get('id'), response)
 
 @router.delete("/{resume_id}/education/{education_id}/", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_resume_education(resume_id: int, education_id: int, db: db_dep, current_user: current_user_dep):
-    db_resume = await Resume.get_one(db, [Resume.id == resume_id, Resume.user_id == current_user.get('id')])
-    if db_resume is None:
-        raise HTTPException(status_code=404, detail="Resume not found")
+async def delete_resume_education(resume_id: int, education_id: int, response: Response, db: db_dep, current_user: current_user_dep, if_match: if_match_dep = None):
+    await touch_resume(db, resume_id, current_user.get('id'), response, if_match)
     
-    for education in db_resume.education:
-        if education.id == education_id:
-            await education.delete(db)
-            break
+    await Education.delete_for_resume(db, resume_id, education_id)
 
 
 @router.put("/{resume_id}/language-skills/", response_model=schemas.Resume)
-async def update_resume_language_skill(resume_id: int, language_skill: schemas.LanguageSkillUpdate, db: db_dep, current_user: current_user_dep):
-    db_resume = await Resume.get_one(db, [Resume.id == resume_id, Resume.user_id == current_user.get('id')])
+async def update_resume_language_skill(resume_id: int, language_skill: schemas.LanguageSkillUpdate, response: Response, db: db_dep, current_user: current_user_dep, if_match: if_match_dep = None):
+    await touch_resume(db, resume_id, current_user.get('id'), response, if_match)
+    db_resume = await Resume.get_owned(db, resume_id, current_user.get('id'))
     if db_resume is None:
         raise HTTPException(status_code=404, detail="Resume not found")
 
     if db_resume.language_skills is None:
         # Create new language skill
-        new_language_skill = LanguageSkill(**language_skill.model_dump(exclude={'id'}), resume_id=resume_id)
-        db.add(new_language_skill)
+        db_resume.language_skills = LanguageSkill(**language_skill.model_dump(exclude={'id'}), resume_id=resume_id)
     else:
         db_language_skill = await db.execute(select(LanguageSkill).where(LanguageSkill.id == db_resume.language_skills.id, LanguageSkill.resume_id == resume_id))
         db_language_skill = db_language_skill.scalar_one_or_none()
@@ -230,35 +352,31 @@ async def update_resume_language_skill(resume_id: int, language_skill: schemas.L
         for key, value in language_skill.model_dump(exclude_unset=True).items():
             setattr(db_language_skill, key, value)
 
-    await db.commit()
-    await db.refresh(db_resume)
-    return db_resume
+    # Flush so the document query sees the changes.
+    await db.flush()
+    return await document_response(db, resume_id, current_user.get('id'), response)
 
 @router.delete("/{resume_id}/language-skills/{language_skill_id}/", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_resume_language_skill(resume_id: int, language_skill_id: int, db: db_dep, current_user: current_user_dep):
-    db_resume = await Resume.get_one(db, [Resume.id == resume_id, Resume.user_id == current_user.get('id') ])
-    if db_resume is None:
-        raise HTTPException(status_code=404, detail="Resume skill not found")
+async def delete_resume_language_skill(resume_id: int, language_skill_id: int, response: Response, db: db_dep, current_user: current_user_dep, if_match: if_match_dep = None):
+    await touch_resume(db, resume_id, current_user.get('id'), response, if_match, not_found_detail="Resume skill not found")
     
-    language_skill = await LanguageSkill.get_one(db, [LanguageSkill.resume_id == resume_id, LanguageSkill.id == language_skill_id])
+    deleted = await LanguageSkill.delete_for_resume(db, resume_id, language_skill_id)
     
-    if language_skill is None:
+    if not deleted:
         raise HTTPException(status_code=404, detail="Language skill not found")
 
-    await language_skill.delete(db)
-
 
 
 @router.put("/{resume_id}/driving-license/", response_model=schemas.Resume)
-async def update_resume_driving_license(resume_id: int, driving_license: schemas.DrivingLicenseUpdate, db: db_dep, current_user: current_user_dep):
-    db_resume = await Resume.get_one(db, [Resume.id == resume_id, Resume.user_id == current_user.get('id')])
+async def update_resume_driving_license(resume_id: int, driving_license: schemas.DrivingLicenseUpdate, response: Response, db: db_dep, current_user: current_user_dep, if_match: if_match_dep = None):
+    await touch_resume(db, resume_id, current_user.get('id'), response, if_match)
+    db_resume = await Resume.get_owned(db, resume_id, current_user.get('id'))
     if db_resume is None:
         raise HTTPException(status_code=404, detail="Resume not found")
     
     if driving_license.id is None:
         # Create new driving license
-        new_driving_license = DrivingLicense(**driving_license.model_dump(exclude={'id'}), resume_id=resume_id)
-        db.add(new_driving_license) 
+        db_resume.driving_license.append(DrivingLicense(**driving_license.model_dump(exclude={'id'}), resume_id=resume_id))
 
     else:
         # Update existing driving license
@@ -270,72 +388,41 @@ async def update_resume_driving_license(resume_id: int, driving_license: schemas
         else:
             raise HTTPException(status_code=404, detail="Driving license not found")
     
-    await db.commit()
-    await db.refresh(db_resume)
-    return db_resume
+    # Flush so the document query sees the changes.
+    await db.flush()
+    return await document_response(db, resume_id, current_user.get('id'), response)
 
 @router.put("/{resume_id}/driving-license/multi/", response_model=schemas.Resume)
-async def update_resume_driving_license_multi(resume_id: int, data: schemas.DrivingLicenseUpdateMulti, db: db_dep, current_user: current_user_dep):
-        db_resume = await Resume.get_one(db, [Resume.id == resume_id, Resume.user_id == current_user.get('id')])
-        if db_resume is None:
-            raise HTTPException(status_code=404, detail="Resume not found")
-        
-        driving_licenses = data.driving_licenses
-
-        if not driving_licenses:
-            raise HTTPException(status_code=400, detail="No driving licenses provided")
-        
-        incoming_driving_license_ids = {driving_license.id for driving_license in driving_licenses if driving_license.id is not None}
+async def update_resume_driving_license_multi(resume_id: int, data: schemas.DrivingLicenseUpdateMulti, response: Response, db: db_dep, current_user: current_user_dep, if_match: if_match_dep = None):
+    await touch_resume(db, resume_id, current_user.get('id'), response, if_match)
+    
+    driving_licenses = data.driving_licenses
 
-        # Delete driving licenses that are not in the incoming data
-        for existing_driving_license in db_resume.driving_license:
-            if existing_driving_license.id not in incoming_driving_license_ids:
-                await existing_driving_license.delete(db)
-
-        for driving_license in driving_licenses:
-            if driving_license.id is None:
-                # Create new driving license
-                new_driving_license = DrivingLicense(**driving_license.model_dump(exclude={'id'}), resume_id=resume_id)
-                db.add(new_driving_license)
-            else:
-                # Update existing driving license
-                for existing_driving_license in db_resume.driving_license:
-                    if existing_driving_license.id == driving_license.id:
-                        for key, value in driving_license.model_dump(exclude_unset=True).items():
-                            setattr(existing_driving_license, key, value)
-                        break
-                else:
-                    raise HTTPException(status_code=404, detail="Driving license not found")
-        
-        await db.commit()
-        await db.refresh(db_resume)
-        return db_resume
+    if not driving_licenses:
+        raise HTTPException(status_code=400, detail="No driving licenses provided")
+    
+    await sync_resume_section(db, resume_id, DrivingLicense, driving_licenses, "Driving license not found")
+    return await document_response(db, resume_id, current_user.get('id'), response)
 
 @router.delete("/{resume_id}/driving-license/{driving_license_id}/", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_resume_driving_license(resume_id: int, driving_license_id: int, db: db_dep, current_user: current_user_dep):
-    db_resume = await Resume.get_one(db, [Resume.id == resume_id, Resume.user_id == current_user.get('id')])
-    if db_resume is None:
-        raise HTTPException(status_code=404, detail="Resume not found")
+async def delete_resume_driving_license(resume_id: int, driving_license_id: int, response: Response, db: db_dep, current_user: current_user_dep, if_match: if_match_dep = None):
+    await touch_resume(db, resume_id, current_user.get('id'), response, if_match)
     
-    for driving_license in db_resume.driving_license:
-        if driving_license.id == driving_license_id:
-            await driving_license.delete(db)
-            break
-    else:
+    if not await DrivingLicense.delete_for_resume(db, resume_id, driving_license_id):
         raise HTTPException(status_code=404, detail="Driving license not found")
 
 
 @router.put("/{resume_id}/training-award/", response_model=schemas.Resume)
-async def update_resume_training_award(resume_id: int, training_award: schemas.TrainingAwardUpdate, db: db_dep, current_user: current_user_dep):
-    db_resume = await Resume.get_one(db, [Resume.id == resume_id, Resume.user_id == current_user.get('id')])
+async def update_resume_training_award(resume_id: int, training_award: schemas.TrainingAwardUpdate, response: Response, db: db_dep, current_user: current_user_dep, if_match: if_match_dep = None):
+    await touch_resume(db, resume_id, current_user.get('id'), response, if_match)
+    db_resume = await Resume.get_owned(db, resume_id, current_user.get('id'))
 
     if db_resume is None:
         raise HTTPException(status_code=404, detail="Resume not found")
 
     if training_award.id is None:
         # Create new training award
-        new_training_award = TrainingAward(**training_award.model_dump(exclude={'id'}), resume_id=resume_id)
-        db.add(new_training_award) 
+        db_resume.training_awards.append(TrainingAward(**training_award.model_dump(exclude={'id'}), resume_id=resume_id))
 
     else:
         # Update existing training award
@@ -347,65 +434,35 @@ async def update_resume_training_award(resume_id: int, training_award: schemas.T
         else:
             raise HTTPException(status_code=404, detail="Training award not found")
     
-    await db.commit()
-    await db.refresh(db_resume)
-    return db_resume
+    # Flush so the document query sees the changes.
+    await db.flush()
+    return await document_response(db, resume_id, current_user.get('id'), response)
 
 @router.put("/{resume_id}/training-award/multi/", response_model=schemas.Resume)
-async def update_resume_training_award_multi(resume_id: int, data: schemas.TrainingAwardUpdateMulti, db: db_dep, current_user: current_user_dep):
-    db_resume = await Resume.get_one(db, [Resume.id == resume_id, Resume.user_id == current_user.get('id')])
-    if db_resume is None:
-        raise HTTPException(status_code=404, detail="Resume not found")
+async def update_resume_training_award_multi(resume_id: int, data: schemas.TrainingAwardUpdateMulti, response: Response, db: db_dep, current_user: current_user_dep, if_match: if_match_dep = None):
+    await touch_resume(db, resume_id, current_user.get('id'), response, if_match)
     
     training_awards = data.training_awards
 
     if not training_awards:
         raise HTTPException(status_code=400, detail="No training awards provided")
     
-    incoming_training_award_ids = {training_award.id for training_award in training_awards if training_award.id is not None}
-
-    # Delete training awards that are not in the incoming data
-    for existing_training_award in db_resume.training_awards:
-        if existing_training_award.id not in incoming_training_award_ids:
-            await existing_training_award.delete(db)
-
-    for training_award in training_awards:
-        if training_award.id is None:
-            # Create new training award
-            new_training_award = TrainingAward(**training_award.model_dump(exclude={'id'}), resume_id=resume_id)
-            db.add(new_training_award)
-        else:
-            # Update existing training award
-            for existing_training_award in db_resume.training_awards:
-                if existing_training_award.id == training_award.id:
-                    for key, value in training_award.model_dump(exclude_unset=True).items():
-                        setattr(existing_training_award, key, value)
-                    break
-            else:
-                raise HTTPException(status_code=404, detail="Training award not found")
-    
-    await db.commit()
-    await db.refresh(db_resume)
-    return db_resume
+    await sync_resume_section(db, resume_id, TrainingAward, training_awards, "Training award not found")
+    return await document_response(db, resume_id, current_user.get('id'), response)
 
 @router.delete("/{resume_id}/training-award/{training_award_id}/", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_resume_training_award(resume_id: int, training_award_id: int, db: db_dep, current_user: current_user_dep):
-    db_resume = await Resume.get_one(db, [Resume.id == resume_id, Resume.user_id == current_user.get('id')])
-    if db_resume is None:
-        raise HTTPException(status_code=404, detail="Resume not found")
+async def delete_resume_training_award(resume_id: int, training_award_id: int, response: Response, db: db_dep, current_user: current_user_dep, if_match: if_match_dep = None):
+    await touch_resume(db, resume_id, current_user.get('id'), response, if_match)
     
-    for training_award in db_resume.training_awards:
-        if training_award.id == training_award_id:
-            await training_award.delete(db)
-            break
-    else:
+    if not await TrainingAward.delete_for_resume(db, resume_id, training_award_id):
         raise HTTPException(status_code=404, detail="Training award not found")
 
 
 @router.put("/{resume_id}/others/", response_model=schemas.Resume)
-async def update_resume_others(resume_id: int,  others: schemas.OthersUpdate, db: db_dep, current_user: current_user_dep):
+async def update_resume_others(resume_id: int,  others: schemas.OthersUpdate, response: Response, db: db_dep, current_user: current_user_dep, if_match: if_match_dep = None):
     
-    db_resume = await Resume.get_one(db, [Resume.id == resume_id, Resume.user_id == current_user.get('id')])
+    await touch_resume(db, resume_id, current_user.get('id'), response, if_match)
+    db_resume = await Resume.get_owned(db, resume_id, current_user.get('id'))
     if db_resume is None:
         raise HTTPException(status_code=404, detail="Resume not found")
 
@@ -414,8 +471,7 @@ async def update_resume_others(resume_id: int,  others: schemas.OthersUpdate, db
     
     if others.id is None:
         # Create new training award
-        new_others = Others(**others.model_dump(exclude={'id'}), resume_id=resume_id)
-        db.add(new_others) 
+        db_resume.others.append(Others(**others.model_dump(exclude={'id'}), resume_id=resume_id))
     
     else: 
         for existing_others in db_resume.others:
@@ -426,88 +482,189 @@ async def update_resume_others(resume_id: int,  others: schemas.OthersUpdate, db
         else:
             raise HTTPException(status_code=404, detail="Others not found")
     
-    await db.commit()
-    await db.refresh(db_resume)
-    return db_resume
+    # Flush so the document query sees the changes.
+    await db.flush()
+    return await document_response(db, resume_id, current_user.get('id'), response)
 
 logger = logging.getLogger(__name__)
 
 @router.delete("/{resume_id}/others/{others_id}/", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_resume_others(resume_id: int, others_id: int,  current_user: current_user_dep, db: db_dep):
+async def delete_resume_others(resume_id: int, others_id: int, response: Response, current_user: current_user_dep, db: db_dep, if_match: if_match_dep = None):
     logger.info(f"Deleting 'others' with ID {others_id} from resume {resume_id} for user {current_user.get('id')}")
     
-    db_resume = await Resume.get_one(db, [Resume.id == resume_id, Resume.user_id == current_user.get('id')])
-    if db_resume is None:
-        logger.warning(f"Resume with ID {resume_id} not found for user {current_user.get('id')}")
-        raise HTTPException(status_code=404, detail="Resume not found")
+    try:
+        await touch_resume(db, resume_id, current_user.get('id'), response, if_match)
+    except HTTPException as e:
+        if e.status_code == 404:
+            logger.warning(f"Resume with ID {resume_id} not found for user {current_user.get('id')}")
+        raise
 
-    for others in db_resume.others:
-        if others.id == others_id:
-            await others.delete(db)
-            logger.info(f"Successfully deleted 'others' with ID {others_id} from resume {resume_id}")
-            break
-    else:
+    if not await Others.delete_for_resume(db, resume_id, others_id):
         logger.warning(f"'Others' with ID {others_id} not found in resume {resume_id}")
         raise HTTPException(status_code=404, detail="Others not found")
+    logger.info(f"Successfully deleted 'others' with ID {others_id} from resume {resume_id}")
 
 
 
 
 
 @router.delete("/{resume_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_resume(resume_id: int, db: db_dep, current_user: current_user_dep):
-    db_resume = await Resume.get_one(db, [Resume.id == resume_id, Resume.user_id == current_user.get('id')])
+async def delete_resume(resume_id: int, db: db_dep, current_user: current_user_dep, background_tasks: BackgroundTasks, if_match: if_match_dep = None):
+    db_resume = await Resume.get_owned(db, resume_id, current_user.get('id'))
     if db_resume is None:
         raise HTTPException(status_code=404, detail="Resume not found")
+    if if_match is not None and not etag_in(if_match, resume_etag(resume_id, db_resume.version), weak=False):
+        raise HTTPException(status_code=412, detail="Resume has been modified")
 
+    await invalidate_cached_resume(db, current_user.get('id'), resume_id, db_resume.version)
+    await release_resume_images(db, db_resume, background_tasks)
     await db_resume.delete(db)
     
 
-UPLOAD_DIR = Path("uploads")
-UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+async def release_resume_images(db: AsyncSession, resume: Resume, background_tasks: BackgroundTasks):
+    """Drop the resume's references to its current image files."""
+    urls = {resume.resume_image, *(resume.resume_image_variants or {}).values()} - {None}
+    keys = [key for key in map(blob_key_from_url, urls) if key is not None]
+    await UploadBlob.release_references(db, keys)
+    if keys:
+        await enqueue_job(db, COLLECT_BLOBS_JOB, {"keys": keys})
+    # Files from before content addressing belong to this resume alone
+    for url in urls:
+        if blob_key_from_url(url) is None:
+            background_tasks.add_task(remove_upload, UPLOAD_DIR / Path(url).name)
+
 
 @router.post("/upload-image/{resume_id}/")
 async def upload_image(
     resume_id: int, 
     db: db_dep, 
     current_user: current_user_dep, 
+    background_tasks: BackgroundTasks,
+    response: Response,
     file: UploadFile = File(...),
+    if_match: if_match_dep = None,
 ):
-    # Check if the file is an image
-    if file.content_type is None or not file.content_type.startswith('image/'):
-        raise HTTPException(status_code=400, detail="File type not supported.")
-
     # Fetch the resume
-    resume = await Resume.get_one(db, [Resume.id == resume_id])
+    resume = await Resume.get_owned(db, resume_id, current_user.get('id'), with_children=False)
     if not resume:
         raise HTTPException(status_code=404, detail="Resume not found.")
+    if if_match is not None and not etag_in(if_match, resume_etag(resume_id, resume.version), weak=False):
+        raise HTTPException(status_code=412, detail="Resume has been modified")
 
-    # Delete the existing image if it exists
-    if resume.resume_image:
-    # Convert the relative URL to an absolute path
-        existing_image_path = UPLOAD_DIR / Path(resume.resume_image).name  # Get the filename and append to UPLOAD_DIR
-        if existing_image_path.exists():
-            try:
-                os.remove(existing_image_path)  # Delete the existing image
-            except Exception as e:
-                raise HTTPException(status_code=500, detail=f"Failed to delete existing image: {str(e)}")
-    # Generate a unique filename
-    unique_filename = f"{uuid.uuid4()}-{file.filename}"
-    file_location = UPLOAD_DIR / unique_filename
-
-    # Save the new file
+    # Scratch names for the upload and its derivatives until they are stored by content hash
+    stem = str(uuid.uuid4())
+    source_path = INCOMING_DIR / f"{stem}-original"
+
+    # Stream the new file to disk off the event loop
     try:
-        with open(file_location, "wb") as f:
-            shutil.copyfileobj(file.file, f)  # Save the file efficiently
+        await save_image_upload(file, source_path)
+    except UnsupportedImage:
+        raise HTTPException(status_code=400, detail="File type not supported.")
+    except UploadTooLarge:
+        raise HTTPException(status_code=413, detail=f"Image is larger than {MAX_IMAGE_BYTES} bytes.")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to save the file: {str(e)}")
     finally:
         await file.close()  # Close the file to free up resources
 
-    # Update the resume with the new image path
-    resume.resume_image = f"/static/{unique_filename}" # Save the new image path in the resume
-    await db.commit()
-    await db.refresh(resume)
+    # Resize/compress (and strip EXIF) on the image process pool; the original is not kept
+    try:
+        derivatives = await generate_image_derivatives(source_path, INCOMING_DIR, stem)
+    except InvalidImage:
+        raise HTTPException(status_code=400, detail="File type not supported.")
+    finally:
+        await run_in_threadpool(remove_upload, source_path)
+
+    # Bump the version (re-checking If-Match) only now, so the row isn't locked
+    # while the image is processed, but before anything is stored
+    try:
+        await touch_resume(db, resume_id, current_user.get('id'), response, if_match, not_found_detail="Resume not found.")
+    except HTTPException:
+        for filename in derivatives.values():
+            await run_in_threadpool(remove_upload, INCOMING_DIR / filename)
+        raise
+
+    # Store derivatives under their SHA-256; identical images share one file.
+    # The references are taken first: their rows stay locked until this
+    # commits, so a collection of the same keys can't delete the new files.
+    keys = {
+        name: await blob_key_for(INCOMING_DIR / filename, filename.rsplit(".", 1)[-1])
+        for name, filename in derivatives.items()
+    }
+    await UploadBlob.add_references(db, keys.values())
+    after_rollback(db, lambda: discard_blobs(list(keys.values())))
+    store = get_blob_store()
+    for name, filename in derivatives.items():
+        await store.put_file(INCOMING_DIR / filename, keys[name])
+    variants = {name: f"/static/{key}" for name, key in keys.items()}
+
+    # Old images are released; a job deletes the unreferenced files once this commits
+    await release_resume_images(db, resume, background_tasks)
+
+    # Update the resume with the new image paths
+    resume.resume_image_variants = variants
+    resume.resume_image = variants[DEFAULT_DERIVATIVE]
+
+    return {
+        "message": "Image uploaded successfully",
+        "resume_image": resume.resume_image,
+        "resume_image_variants": resume.resume_image_variants,
+    }
+
+
+@router.get("/{resume_id}/image", response_class=RedirectResponse)
+async def get_resume_image(resume_id: int, db: db_dep, current_user: current_user_dep, size: str = DEFAULT_DERIVATIVE):
+    if size not in IMAGE_DERIVATIVES:
+        raise HTTPException(status_code=400, detail=f"size must be one of: {', '.join(IMAGE_DERIVATIVES)}")
+
+    resume = await Resume.get_owned(db, resume_id, current_user.get('id'), with_children=False)
+    if resume is None:
+        raise HTTPException(status_code=404, detail="Resume not found.")
 
-    return {"message": "Image uploaded successfully", "resume_image": resume.resume_image}
+    # Images uploaded before derivatives existed only have resume_image
+    image_url = (resume.resume_image_variants or {}).get(size) or resume.resume_image
+    if image_url is None:
+        raise HTTPException(status_code=404, detail="Resume has no image.")
+    return RedirectResponse(image_url, status_code=status.HTTP_307_TEMPORARY_REDIRECT)
 
+
+@router.get("/{resume_id}/pdf", response_class=FileResponse)
+async def get_resume_pdf(
+    resume_id: int,
+    request: Request,
+    db: db_dep,
+    current_user: current_user_dep,
+    template: str = DEFAULT_TEMPLATE,
+):
+    if template not in RESUME_TEMPLATES:
+        raise HTTPException(status_code=400, detail=f"template must be one of: {', '.join(RESUME_TEMPLATES)}")
+
+    # Renders are cached by version, so a hit (or a 304) only needs the resumes row
+    stamp = await Resume.get_version(db, resume_id, current_user.get('id'))
+    if stamp is None:
+        raise HTTPException(status_code=404, detail="Resume not found")
+    key = RenderKey(resume_id, stamp.version, template, "pdf")
+    headers = cache_validators(key.etag, stamp.updated_at)
+    if not_modified(request, key.etag, stamp.updated_at):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    path = await get_render_cache().get(key)
+    if path is None:
+        row = await get_resume_document(db, resume_id, current_user.get('id'))
+        if row is None:
+            raise HTTPException(status_code=404, detail="Resume not found")
+        key = RenderKey(resume_id, row.version, template, "pdf")
+        headers = cache_validators(key.etag, row.updated_at)
+        # Nothing to write; give the connection back before the (slow) render
+        await db.close()
+        try:
+            path = await render_cached_resume_pdf(key, row.document)
+        except PdfRendererBusy:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server is busy, please try again shortly.",
+                headers={"Retry-After": "1"},
+            )
+
+    # FileResponse streams the file, with sendfile where the server supports it
+    return FileResponse(path, media_type="application/pdf", filename=f"resume-{resume_id}.pdf", headers=headers)
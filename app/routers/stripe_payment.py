@@ -1,52 +1,61 @@
-import json
+import asyncio
+from datetime import datetime, timezone
 from typing import Annotated, List
 
+import orjson
 import stripe
-from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, status
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app import settings
 from app.dependencies.auth import get_current_user
+from app.models.stripe_event import StripeEvent
 from app.models.stripe_payment import StripePayment
 from app.models.users import User
 from app.schemas.stripe_payment import PaymentCreate, PaymentUpdate
+from app.stripe_events import APPLY_EVENTS_JOB
+from app.stripe_gateway import StripeGateway, get_stripe_gateway
 
 from ..database import get_async_db
+from ..jobs import enqueue_job
+from ..responses import ORJSONRoute
 
-router = APIRouter(prefix="/stripe-payments", tags=["stripe-payments"])
+router = APIRouter(prefix="/stripe-payments", tags=["stripe-payments"], route_class=ORJSONRoute)
 
 db_dep = Annotated[AsyncSession, Depends(get_async_db)]
 current_user_dep = Annotated[dict, Depends(get_current_user)]
+stripe_gateway_dep = Annotated[StripeGateway, Depends(get_stripe_gateway)]
 
 stripe.api_key = settings.STRIPE_SECRET_KEY
 endpoint_secret = settings.STRIPE_WEBHOOK_SECRET
 
 
 @router.post("/")
-async def create_payment_intent(payment: PaymentCreate, db: db_dep, current_user: current_user_dep):
+async def create_payment_intent(
+    payment: PaymentCreate,
+    db: db_dep,
+    current_user: current_user_dep,
+    gateway: stripe_gateway_dep,
+    idempotency_key: Annotated[str | None, Header()] = None,
+):
 
-    user = await User.get_one(db, [User.id == current_user['id']])
+    user = await User.get_by_id(db, current_user['id'])
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    
-    print("web hook", endpoint_secret)
 
     try:
-        intent = stripe.PaymentIntent.create(
+        intent = await gateway.create_payment_intent(
             amount=int(payment.amount),
             currency="gbp",
             receipt_email=user.email,
             description=f"Referred by: {user.referred_by if user.referred_by else 'Individual'}",
-            # payment_method_types=[
-            #    "card",
-            # ],
-            # payment_method_types=["card", ],  # Any methods you want to support
-            # confirmation_method="manual",
             metadata={
                 "user_id": current_user['id'],
                 "email": current_user['email'], 
-            }
+            },
+            # Scope client-supplied keys to the user so a double submit reuses one intent.
+            idempotency_key=f"payment-intent-{current_user['id']}-{idempotency_key}" if idempotency_key else None,
         )
 
         # print(json.dumps(intent, indent=2))
@@ -60,13 +69,13 @@ async def create_payment_intent(payment: PaymentCreate, db: db_dep, current_user
             # payment_id=intent.id
         )
         db.add(db_payment)
-        await db.commit()
-        await db.refresh(db_payment)
 
         return {"clientSecret": intent.client_secret, "paymentId": db_payment.stripe_payment_intent_id}
         # return {
         #     "clientSecret": intent.client_secret,
         # }
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Payment provider timed out")
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -86,8 +95,6 @@ async def update_payment_status(
         db_payment.failure_code = payment_update.failure_code
     if payment_update.failure_message:
         db_payment.failure_message = payment_update.failure_message
-    await db.commit()
-    await db.refresh(db_payment)
 
     return {"message": "Payment status updated successfully"}
 
@@ -95,51 +102,29 @@ async def update_payment_status(
 @router.post("/webhook/", status_code=status.HTTP_200_OK)
 async def stripe_webhook(request: Request, db: db_dep):
     payload = await request.body()
-    # print(request.headers)
-    print("Received payload:")
-    print(json.dumps(json.loads(payload), indent=2))
     sig_header = request.headers.get("stripe-signature")
-    # print(sig_header)
-    print('endpoint_secret', endpoint_secret)
+    # Only the signature is checked by the SDK (construct_event would parse the
+    # payload with json as well); the event is parsed once, with orjson.
     try:
-        event = stripe.Webhook.construct_event(payload, sig_header, endpoint_secret)
-    except ValueError:
-        print("Invalid payload")
-        raise HTTPException(status_code=200, detail="Invalid payload")
-    except stripe.error.SignatureVerificationError as e:
-        print(f"Invalid signature: {str(e)}")
-        raise HTTPException(status_code=200, detail=f"Invalid signature {str(endpoint_secret)}")
-
-    # Database update logic (Example: AsyncSession injection)
-    if event["type"] == "payment_intent.succeeded":
-        payment_intent = event["data"]["object"]
-        payment_id = payment_intent["id"]
-        print(payment_id)
-        # Update the payment status in the database
-        print("succeeded")
-        # Update the payment status in the database
-        await StripePayment.update(db, payment_id, status="succeeded")
-
-        print('user_id', payment_intent["metadata"]["user_id"])
-        user_id = int(payment_intent["metadata"]["user_id"])
-        # Update user's expiry date
-        user = await User.get_one(db, [User.id == user_id])
-        if user:
-            from datetime import datetime, timedelta
-            new_expiry_date = datetime.now() + timedelta(days=90)  # 3 months
-            await User.update(db, user.id, expiry_date=new_expiry_date)
-        
-        await db.commit()
-
-    elif event["type"] == "payment_intent.payment_failed":
-        payment_intent = event["data"]["object"]
-        payment_id = payment_intent["id"]
-        failure_reason = payment_intent["last_payment_error"]["message"]
-        # Update the failure status in the database
-        print("failed")
-        await StripePayment.update(
-            db, payment_id, status="failed", failure_reason=failure_reason
+        stripe.WebhookSignature.verify_header(
+            payload.decode("utf-8"), sig_header, endpoint_secret, stripe.Webhook.DEFAULT_TOLERANCE
         )
-        await db.commit()
+        event = orjson.loads(payload)
+    except ValueError:  # UnicodeDecodeError, orjson.JSONDecodeError
+        raise HTTPException(status_code=400, detail="Invalid payload")
+    except stripe.error.SignatureVerificationError:
+        raise HTTPException(status_code=400, detail="Invalid signature")
+
+    # Only record the event here and answer Stripe right away; its effects are
+    # applied in order and once by the consumer, run as a job (app.stripe_events).
+    recorded = await StripeEvent.record(
+        db,
+        id=event["id"],
+        type=event["type"],
+        payload=event,
+        stripe_created_at=datetime.fromtimestamp(event["created"], tz=timezone.utc),
+    )
+    if recorded:
+        await enqueue_job(db, APPLY_EVENTS_JOB, {}, priority=10)
 
     return {"status": "success"}
@@ -0,0 +1,74 @@
+import re
+
+from fastapi import APIRouter, HTTPException, Request, status
+from fastapi.responses import Response, StreamingResponse
+
+from app.responses import ORJSONRoute
+from app.storage import content_type_for, get_blob_store, is_blob_key
+
+router = APIRouter(prefix="/static", tags=["static"], route_class=ORJSONRoute)
+
+# Content-addressed files never change, so clients and CDNs may keep them forever.
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Files stored before content addressing keep a short cache lifetime.
+LEGACY_CACHE_CONTROL = "public, max-age=3600"
+
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def parse_range(header: str, size: int) -> tuple[int, int] | None:
+    """Single 'bytes=start-end' range -> inclusive (start, end); None if unsatisfiable."""
+    match = RANGE_RE.match(header.strip())
+    if match is None or match.groups() == ("", ""):
+        return None
+    start, end = match.groups()
+    if start == "":
+        # Suffix range: the last N bytes
+        length = int(end)
+        if length == 0:
+            return None
+        return max(size - length, 0), size - 1
+    start = int(start)
+    end = size - 1 if end == "" else min(int(end), size - 1)
+    if start > end:
+        return None
+    return start, end
+
+
+@router.get("/{key}")
+async def get_upload(key: str, request: Request):
+    store = get_blob_store()
+    size = await store.size(key)
+    if size is None:
+        raise HTTPException(status_code=404, detail="Not found")
+
+    headers = {"Accept-Ranges": "bytes"}
+    if is_blob_key(key):
+        # The key is the SHA-256 of the content, which makes it a strong validator.
+        etag = f'"{key.split(".", 1)[0]}"'
+        headers.update({"ETag": etag, "Cache-Control": IMMUTABLE_CACHE_CONTROL})
+        if etag in request.headers.get("if-none-match", ""):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    else:
+        headers["Cache-Control"] = LEGACY_CACHE_CONTROL
+
+    media_type = content_type_for(key)
+    range_header = request.headers.get("range")
+    if range_header and (request.headers.get("if-range") in (None, headers.get("ETag"))):
+        byte_range = parse_range(range_header, size)
+        if byte_range is None:
+            return Response(
+                status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+                headers={**headers, "Content-Range": f"bytes */{size}"},
+            )
+        start, end = byte_range
+        headers.update({"Content-Range": f"bytes {start}-{end}/{size}", "Content-Length": str(end - start + 1)})
+        return StreamingResponse(
+            store.read(key, start, end),
+            status_code=status.HTTP_206_PARTIAL_CONTENT,
+            media_type=media_type,
+            headers=headers,
+        )
+
+    headers["Content-Length"] = str(size)
+    return StreamingResponse(store.read(key), media_type=media_type, headers=headers)
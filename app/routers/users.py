@@ -1,30 +1,75 @@
+from datetime import datetime
 from typing import Annotated, Optional
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from starlette import status
 
-from app.database import get_async_db
-from app.dependencies.auth import get_current_user
+from app.database import AsyncSessionFactory, get_async_db, statement_timeout
+from app.dependencies.auth import get_current_user, get_staff_user
 from app.models.users import User
+from app.responses import ORJSONRoute, model_response
 from app.schemas.users import UserBaseSchema, UserDetailSchema
 
-router = APIRouter(prefix="/users", tags=["Users"])
+router = APIRouter(prefix="/users", tags=["Users"], route_class=ORJSONRoute)
 
 db_dep = Annotated[AsyncSession, Depends(get_async_db)]
 user_dep = Annotated[dict,Depends(get_current_user)]
+staff_dep = Annotated[User, Depends(get_staff_user)]
+
+
+USERS_PAGE_SIZE = 50
+USERS_MAX_PAGE_SIZE = 200
+
+
+async def stream_users_ndjson(where_conditions: list):
+    # The request's session is closed before a streaming body is sent, so the
+    # export reads through its own session and server-side cursor.
+    async with AsyncSessionFactory() as session:
+        users = await User.stream_all(session, where_conditions)
+        async for user in users:
+            yield UserBaseSchema.model_validate(user, from_attributes=True).model_dump_json() + "\n"
+
+
+def user_filters(referred_by: Optional[str] = None, expiry_after: Optional[datetime] = None, expiry_before: Optional[datetime] = None) -> list:
+    where_conditions = []
+    if referred_by is not None:
+        where_conditions.append(User.referred_by == referred_by)
+    if expiry_after is not None:
+        where_conditions.append(User.expiry_date >= expiry_after)
+    if expiry_before is not None:
+        where_conditions.append(User.expiry_date < expiry_before)
+    return where_conditions
+
+
+filters_dep = Annotated[list, Depends(user_filters)]
 
 
 @router.get("/", status_code=status.HTTP_200_OK, response_model=Optional[list[UserBaseSchema]])
-async def get_all_users(db:db_dep):
+async def get_all_users(
+    db: Annotated[AsyncSession, Depends(statement_timeout(5000))],
+    response: Response,
+    where_conditions: filters_dep,
+    cursor: Annotated[Optional[int], Query(description="`X-Next-Cursor` from the previous page")] = None,
+    limit: Annotated[int, Query(ge=1, le=USERS_MAX_PAGE_SIZE)] = USERS_PAGE_SIZE,
+):
+    # One extra row tells us whether another page exists
+    users = await User.get_page(db, where_conditions, before_id=cursor, limit=limit + 1)
+    if len(users) > limit:
+        users = users[:limit]
+        response.headers["X-Next-Cursor"] = str(users[-1].id)
 
-    users =await  User.get_all(db, [])
+    return model_response(list[UserBaseSchema], users, response)
 
-    return users
+@router.get("/export", response_class=StreamingResponse)
+async def export_users(staff: staff_dep, where_conditions: filters_dep):
+    """Every matching user as NDJSON, streamed from a server-side cursor (staff only)."""
+    return StreamingResponse(stream_users_ndjson(where_conditions), media_type="application/x-ndjson")
 
 @router.get("/me", status_code=status.HTTP_200_OK, response_model=Optional[UserDetailSchema])
 async def get_current_login_user(db:db_dep, current_user:user_dep):
 
-    user =await  User.get_one(db, [User.id == current_user.get('id')])
+    user =await  User.get_by_id(db, current_user.get('id'))
 
-    return user
\ No newline at end of file
+    return model_response(Optional[UserDetailSchema], user)
\ No newline at end of file
@@ -1,4 +1,4 @@
-from datetime import date
+from datetime import date, datetime
 from typing import List, Optional
 
 from pydantic import BaseModel, EmailStr, field_validator
@@ -232,6 +232,9 @@ class Resume(ResumeBase):
     user_id: int
     job_applied_for: Optional[str]
     resume_image: Optional[str]
+    resume_image_variants: Optional[dict[str, str]] = None
+    version: int = 1
+    updated_at: Optional[datetime] = None
     experiences: Optional[List[Experience]] 
     education: Optional[List[Education]] 
     language_skills: Optional[LanguageSkill] 
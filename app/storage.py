@@ -0,0 +1,237 @@
+import hashlib
+import os
+import re
+from pathlib import Path
+from typing import AsyncIterator
+
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
+
+from app.database import AsyncSessionFactory
+from app.jobs import job_handler
+from app.models.upload_blob import UploadBlob
+from app.uploads import CHUNK_SIZE, UPLOAD_DIR
+
+# Content-addressed keys look like "<sha256 hex>.<extension>".
+BLOB_KEY_RE = re.compile(r"^[0-9a-f]{64}\.[a-z0-9]+$")
+
+COLLECT_BLOBS_JOB = "uploads.collect_blobs"
+
+CONTENT_TYPES = {
+    "jpg": "image/jpeg",
+    "png": "image/png",
+    "gif": "image/gif",
+    "webp": "image/webp",
+    "avif": "image/avif",
+}
+
+
+def is_blob_key(key: str) -> bool:
+    return BLOB_KEY_RE.match(key) is not None
+
+
+def blob_key_from_url(url: str | None) -> str | None:
+    """'/static/<key>' -> '<key>' for content-addressed URLs, None for anything else."""
+    if not url:
+        return None
+    key = url.rsplit("/", 1)[-1]
+    return key if is_blob_key(key) else None
+
+
+def content_type_for(key: str) -> str:
+    return CONTENT_TYPES.get(key.rsplit(".", 1)[-1], "application/octet-stream")
+
+
+def hash_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+async def blob_key_for(path: Path, extension: str) -> str:
+    """Key the file at `path` will be stored under: its SHA-256 and extension."""
+    return f"{await run_in_threadpool(hash_file, path)}.{extension}"
+
+
+class BlobStore:
+    """Content-addressed storage for uploaded files.
+
+    Files are stored under their SHA-256 (see blob_key_for), so storing the
+    same bytes twice keeps a single copy. Reference counting lives in the
+    upload_blobs table (see UploadBlob); the store itself only moves bytes.
+    """
+
+    async def put_file(self, path: Path, key: str):
+        """Move the local file at `path` into the store under `key`, its blob_key_for()."""
+        raise NotImplementedError
+
+    async def size(self, key: str) -> int | None:
+        """Size in bytes, or None when the key is not stored."""
+        raise NotImplementedError
+
+    def read(self, key: str, start: int = 0, end: int | None = None) -> AsyncIterator[bytes]:
+        """Stream bytes start..end (inclusive) of a stored file."""
+        raise NotImplementedError
+
+    async def delete(self, key: str):
+        raise NotImplementedError
+
+    def local_path(self, key: str) -> Path | None:
+        """Path of the stored file on this machine, for backends that keep one."""
+        return None
+
+
+class LocalBlobStore(BlobStore):
+    def __init__(self, root: Path):
+        self.root = root
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, key: str) -> Path:
+        # Keys are plain file names; anything else could escape the root.
+        if Path(key).name != key or key.startswith("."):
+            raise KeyError(key)
+        return self.root / key
+
+    def _put_file(self, path: Path, key: str):
+        destination = self._path(key)
+        if destination.exists():
+            path.unlink(missing_ok=True)
+        else:
+            os.replace(path, destination)
+
+    async def put_file(self, path: Path, key: str):
+        await run_in_threadpool(self._put_file, path, key)
+
+    async def size(self, key: str) -> int | None:
+        try:
+            return (await run_in_threadpool(os.stat, self._path(key))).st_size
+        except (KeyError, FileNotFoundError):
+            return None
+
+    def _read(self, key: str, start: int, end: int | None):
+        with open(self._path(key), "rb") as f:
+            f.seek(start)
+            remaining = None if end is None else end - start + 1
+            while remaining is None or remaining > 0:
+                chunk = f.read(CHUNK_SIZE if remaining is None else min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+
+    def read(self, key: str, start: int = 0, end: int | None = None) -> AsyncIterator[bytes]:
+        return iterate_in_threadpool(self._read(key, start, end))
+
+    async def delete(self, key: str):
+        await run_in_threadpool(self._path(key).unlink, missing_ok=True)
+
+    def local_path(self, key: str) -> Path | None:
+        try:
+            return self._path(key)
+        except KeyError:
+            return None
+
+
+class S3BlobStore(BlobStore):
+    """S3-compatible backend; point S3_ENDPOINT_URL at MinIO or similar to run it locally.
+
+    Needs boto3, which is only imported when this backend is configured.
+    """
+
+    def __init__(self, bucket: str, endpoint_url: str | None = None, prefix: str = ""):
+        import boto3
+
+        self.bucket = bucket
+        self.prefix = prefix
+        self._client = boto3.client("s3", endpoint_url=endpoint_url)
+
+    def _object_key(self, key: str) -> str:
+        return f"{self.prefix}{key}"
+
+    def _head(self, key: str) -> dict | None:
+        try:
+            return self._client.head_object(Bucket=self.bucket, Key=self._object_key(key))
+        except self._client.exceptions.ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+
+    def _put_file(self, path: Path, key: str):
+        if self._head(key) is None:
+            self._client.upload_file(
+                str(path),
+                self.bucket,
+                self._object_key(key),
+                ExtraArgs={"ContentType": content_type_for(key)},
+            )
+        path.unlink(missing_ok=True)
+
+    async def put_file(self, path: Path, key: str):
+        await run_in_threadpool(self._put_file, path, key)
+
+    async def size(self, key: str) -> int | None:
+        head = await run_in_threadpool(self._head, key)
+        return None if head is None else head["ContentLength"]
+
+    def _read(self, key: str, start: int, end: int | None):
+        byte_range = f"bytes={start}-{'' if end is None else end}"
+        response = self._client.get_object(Bucket=self.bucket, Key=self._object_key(key), Range=byte_range)
+        yield from response["Body"].iter_chunks(CHUNK_SIZE)
+
+    def read(self, key: str, start: int = 0, end: int | None = None) -> AsyncIterator[bytes]:
+        return iterate_in_threadpool(self._read(key, start, end))
+
+    async def delete(self, key: str):
+        await run_in_threadpool(self._client.delete_object, Bucket=self.bucket, Key=self._object_key(key))
+
+
+_blob_store: BlobStore | None = None
+
+
+def get_blob_store() -> BlobStore:
+    """Store selected by UPLOAD_STORAGE ('local', the default, or 's3')."""
+    global _blob_store
+    if _blob_store is None:
+        if os.getenv("UPLOAD_STORAGE", "local") == "s3":
+            _blob_store = S3BlobStore(
+                bucket=os.environ["S3_BUCKET"],
+                endpoint_url=os.getenv("S3_ENDPOINT_URL"),
+                prefix=os.getenv("S3_PREFIX", ""),
+            )
+        else:
+            _blob_store = LocalBlobStore(UPLOAD_DIR)
+    return _blob_store
+
+
+async def collect_unreferenced_blobs(keys: list[str]):
+    """Delete blobs whose reference count dropped to zero.
+
+    Runs after the request committed its reference changes, in its own
+    transaction. The files go before that commits, while their rows are
+    still locked: an upload of the same bytes references the key first, so
+    it either keeps the row alive or waits and then stores the file again.
+    """
+    if not keys:
+        return
+    store = get_blob_store()
+    async with AsyncSessionFactory() as session:
+        for key in await UploadBlob.delete_unreferenced(session, keys):
+            await store.delete(key)
+        await session.commit()
+
+
+async def discard_blobs(keys: list[str]):
+    """Delete files stored for an upload whose transaction rolled back, unless something else references them."""
+    if not keys:
+        return
+    async with AsyncSessionFactory() as session:
+        await UploadBlob.track(session, keys)
+        await session.commit()
+    await collect_unreferenced_blobs(keys)
+
+
+@job_handler(COLLECT_BLOBS_JOB)
+async def collect_unreferenced_blobs_job(payload: dict):
+    await collect_unreferenced_blobs(payload["keys"])
@@ -0,0 +1,129 @@
+"""Applying recorded Stripe webhook events.
+
+The webhook only stores events (StripeEvent.record) and enqueues an
+APPLY_EVENTS_JOB job (app.jobs), which runs process_pending_stripe_events.
+One consumer at a time (a transaction-level advisory lock) takes the oldest
+pending event, applies it and marks it processed in the same transaction, so
+events apply in order and exactly once however often Stripe redelivers them.
+
+An event whose handler fails is parked ('retrying') and the events behind it
+still apply; the job then fails, so the job runner's backoff decides when
+the parked events are tried again. The handlers are written so applying an
+event late doesn't undo a newer one.
+"""
+import logging
+from datetime import timedelta
+
+from sqlalchemy import func, select
+
+from app.database import AsyncSessionFactory
+from app.jobs import job_handler
+from app.models.stripe_event import StripeEvent
+from app.models.stripe_payment import StripePayment
+from app.models.users import User
+
+logger = logging.getLogger(__name__)
+
+MEMBERSHIP_PERIOD = timedelta(days=90)  # 3 months
+MAX_ATTEMPTS = 5
+# Arbitrary application-wide key for pg_try_advisory_xact_lock
+CONSUMER_LOCK_KEY = 7_301_512_001
+APPLY_EVENTS_JOB = "stripe.apply_events"
+
+
+async def payment_succeeded(db, event: StripeEvent):
+    payment_intent = event.payload["data"]["object"]
+    await StripePayment.update(db, payment_intent["id"], status="succeeded")
+    # Counted from the event, not from now, so the effect doesn't depend on when it is applied
+    user_id = int(payment_intent["metadata"]["user_id"])
+    user = await User.get_by_id(db, user_id)
+    expiry_date = event.stripe_created_at + MEMBERSHIP_PERIOD
+    # A parked event applied late must not shorten a newer payment's membership
+    if user is not None and (user.expiry_date is None or user.expiry_date < expiry_date):
+        user.expiry_date = expiry_date
+
+
+async def payment_failed(db, event: StripeEvent):
+    payment_intent = event.payload["data"]["object"]
+    error = payment_intent.get("last_payment_error") or {}
+    payment = await StripePayment.get_by_intent_id(db, payment_intent["id"])
+    # An earlier failed attempt of an intent that has since succeeded, applied late
+    if payment is None or payment.status == "succeeded":
+        return
+    payment.status = "failed"
+    payment.failure_code = error.get("code")
+    payment.failure_message = error.get("message")
+
+
+EVENT_HANDLERS = {
+    "payment_intent.succeeded": payment_succeeded,
+    "payment_intent.payment_failed": payment_failed,
+}
+
+
+async def process_next_event() -> str:
+    """Apply the oldest pending event: 'applied', 'empty', 'busy' (another consumer runs) or 'failed'."""
+    async with AsyncSessionFactory() as session:
+        locked = await session.execute(select(func.pg_try_advisory_xact_lock(CONSUMER_LOCK_KEY)))
+        if not locked.scalar():
+            return "busy"
+        event = await StripeEvent.lock_next_pending(session)
+        if event is None:
+            return "empty"
+
+        event_id = event.id
+        try:
+            handler = EVENT_HANDLERS.get(event.type)
+            if handler is not None:
+                await handler(session, event)
+            event.status = "processed"
+            event.processed_at = func.now()
+            await session.commit()
+            return "applied"
+        except Exception as e:
+            await session.rollback()
+            logger.exception(f"Applying Stripe event {event_id} failed")
+            error = repr(e)
+
+    async with AsyncSessionFactory() as session:
+        await StripeEvent.record_failure(session, event_id, error, MAX_ATTEMPTS)
+        await session.commit()
+    return "failed"
+
+
+class StripeEventsFailed(Exception):
+    """Raised by the job when some events failed and were parked for a retry."""
+
+
+@job_handler(APPLY_EVENTS_JOB)
+async def apply_stripe_events(payload: dict):
+    failed = await process_pending_stripe_events()
+    if failed:
+        raise StripeEventsFailed(f"{failed} Stripe event(s) failed and wait for a retry")
+
+
+async def process_pending_stripe_events() -> int:
+    """Apply pending events until none are left; returns how many failed.
+
+    Parked events are made pending again first, so every run retries them
+    once. A failing event is parked again and doesn't stop the events behind
+    it, nor is it picked up twice in one run.
+    """
+    async with AsyncSessionFactory() as session:
+        await StripeEvent.requeue_retrying(session)
+        await session.commit()
+
+    failed = 0
+    while True:
+        outcome = await process_next_event()
+        if outcome == "failed":
+            failed += 1
+        if outcome in ("applied", "failed"):
+            continue
+        if outcome == "busy":
+            return failed
+        # A webhook that committed while we held the lock found it taken and
+        # left its event to us; look once more now that the lock is released.
+        async with AsyncSessionFactory() as session:
+            if not await StripeEvent.has_pending(session):
+                return failed
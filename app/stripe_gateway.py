@@ -0,0 +1,118 @@
+import asyncio
+import itertools
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any
+
+import stripe
+
+from app import settings
+from app.metrics import stripe_request_duration
+
+
+@dataclass
+class PaymentIntentResult:
+    id: str
+    client_secret: str
+
+
+class StripeGateway:
+    """Async access to the Stripe API over a shared keep-alive httpx pool.
+
+    The SDK retries network failures itself (reusing the idempotency key we
+    pass), and every call is capped by an overall timeout so a slow Stripe
+    never holds a request open indefinitely.
+    """
+
+    def __init__(
+        self,
+        api_key: str | None,
+        timeout: float = settings.STRIPE_TIMEOUT_SECONDS,
+        max_network_retries: int = settings.STRIPE_MAX_NETWORK_RETRIES,
+    ):
+        self.timeout = timeout
+        self._http_client = stripe.HTTPXClient(timeout=timeout)
+        self._client = stripe.StripeClient(
+            api_key or "",
+            http_client=self._http_client,
+            max_network_retries=max_network_retries,
+        )
+
+    async def create_payment_intent(
+        self,
+        *,
+        amount: int,
+        currency: str,
+        receipt_email: str,
+        description: str,
+        metadata: dict[str, Any],
+        idempotency_key: str | None = None,
+    ) -> PaymentIntentResult:
+        started, outcome = time.perf_counter(), "error"
+        try:
+            intent = await asyncio.wait_for(
+                self._client.payment_intents.create_async(
+                    params={
+                        "amount": amount,
+                        "currency": currency,
+                        "receipt_email": receipt_email,
+                        "description": description,
+                        "metadata": metadata,
+                    },
+                    options={"idempotency_key": idempotency_key or str(uuid.uuid4())},
+                ),
+                # Leave room for the SDK's own retries inside the overall budget.
+                timeout=self.timeout * 2,
+            )
+            outcome = "success"
+        except asyncio.TimeoutError:
+            outcome = "timeout"
+            raise
+        finally:
+            stripe_request_duration.labels("payment_intents.create", outcome).observe(time.perf_counter() - started)
+        return PaymentIntentResult(id=intent.id, client_secret=intent.client_secret)
+
+    async def close(self):
+        await self._http_client.close_async()
+
+
+@dataclass
+class FakeStripeGateway:
+    """In-memory stand-in for StripeGateway, for local runs and tests.
+
+    Repeating an idempotency key returns the original intent, like Stripe does.
+    """
+
+    payment_intents: dict[str, PaymentIntentResult] = field(default_factory=dict)
+    calls: list[dict[str, Any]] = field(default_factory=list)
+    _ids: Any = field(default_factory=lambda: itertools.count(1))
+
+    async def create_payment_intent(self, *, idempotency_key: str | None = None, **params) -> PaymentIntentResult:
+        self.calls.append({**params, "idempotency_key": idempotency_key})
+        key = idempotency_key or str(uuid.uuid4())
+        if key not in self.payment_intents:
+            intent_id = f"pi_fake_{next(self._ids)}"
+            self.payment_intents[key] = PaymentIntentResult(id=intent_id, client_secret=f"{intent_id}_secret")
+        return self.payment_intents[key]
+
+    async def close(self):
+        pass
+
+
+_gateway: StripeGateway | None = None
+
+
+def get_stripe_gateway() -> StripeGateway:
+    """FastAPI dependency; override it with FakeStripeGateway in tests."""
+    global _gateway
+    if _gateway is None:
+        _gateway = StripeGateway(settings.STRIPE_SECRET_KEY)
+    return _gateway
+
+
+async def close_stripe_gateway():
+    global _gateway
+    if _gateway is not None:
+        await _gateway.close()
+        _gateway = None
@@ -0,0 +1,94 @@
+import hashlib
+import os
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO
+
+from fastapi import UploadFile
+from starlette.concurrency import run_in_threadpool
+
+UPLOAD_DIR = Path("uploads")
+UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+# Scratch space for uploads that are still being processed; never served.
+INCOMING_DIR = UPLOAD_DIR / ".incoming"
+INCOMING_DIR.mkdir(parents=True, exist_ok=True)
+
+MAX_IMAGE_BYTES = int(os.getenv("MAX_IMAGE_BYTES", 5 * 1024 * 1024))  # 5 MB
+CHUNK_SIZE = 64 * 1024
+
+# Leading bytes of the image formats we accept; the client's content_type is not trusted.
+IMAGE_SIGNATURES = {
+    b"\xff\xd8\xff": "image/jpeg",
+    b"\x89PNG\r\n\x1a\n": "image/png",
+    b"GIF87a": "image/gif",
+    b"GIF89a": "image/gif",
+}
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+class UnsupportedImage(Exception):
+    pass
+
+
+@dataclass
+class StoredUpload:
+    path: Path
+    content_type: str
+    sha256: str
+    size: int
+
+
+def sniff_image_type(head: bytes) -> str | None:
+    for signature, content_type in IMAGE_SIGNATURES.items():
+        if head.startswith(signature):
+            return content_type
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+
+def _write_stream(source: BinaryIO, destination: Path, max_bytes: int) -> StoredUpload:
+    # Write to a hidden temp file next to the destination and rename it into
+    # place, so readers never see a partially written image.
+    temp_path = destination.with_name(f".{uuid.uuid4()}.part")
+    digest = hashlib.sha256()
+    size = 0
+    content_type = None
+    try:
+        with open(temp_path, "wb") as out:
+            while chunk := source.read(CHUNK_SIZE):
+                if content_type is None:
+                    content_type = sniff_image_type(chunk)
+                    if content_type is None:
+                        raise UnsupportedImage()
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLarge()
+                digest.update(chunk)
+                out.write(chunk)
+        if content_type is None:
+            raise UnsupportedImage()
+        os.replace(temp_path, destination)
+    except BaseException:
+        temp_path.unlink(missing_ok=True)
+        raise
+    return StoredUpload(path=destination, content_type=content_type, sha256=digest.hexdigest(), size=size)
+
+
+async def save_image_upload(file: UploadFile, destination: Path, max_bytes: int = MAX_IMAGE_BYTES) -> StoredUpload:
+    """Stream an uploaded image to `destination` on a worker thread.
+
+    Raises UnsupportedImage if the bytes are not a known image format and
+    UploadTooLarge as soon as more than `max_bytes` have been read.
+    """
+    await file.seek(0)
+    return await run_in_threadpool(_write_stream, file.file, destination, max_bytes)
+
+
+def remove_upload(path: Path):
+    """Delete a stored upload; meant to run as a background task after the commit."""
+    path.unlink(missing_ok=True)
@@ -1,11 +1,32 @@
+import asyncio
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import UTC, datetime, timedelta
-from typing import Any, Optional, Union
+from typing import Any
 
 from jose import jwt
 from passlib.context import CryptContext
 
-password_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from app.metrics import Gauge, password_hash_duration, password_hash_rejected
+
+# Raising BCRYPT_ROUNDS makes older, cheaper hashes "need update"; they are
+# re-hashed transparently on the next successful login.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))
+# bcrypt releases the GIL, so a small thread pool keeps hashing off the event loop.
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", 4))
+# Hash jobs allowed to be running or queued before new ones are rejected.
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", 32))
+
+password_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+)
+
+_password_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
+_password_jobs_pending = 0
 
 ACCESS_TOKEN_EXPIRE_MINUTES = 30  # 30 minutes
 REFRESH_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7  # 7 days
@@ -14,12 +35,49 @@ JWT_SECRET_KEY = "248BA6C7F1468"  # should be kept secret
 JWT_REFRESH_SECRET_KEY = "test"
 
 
-def get_hashed_password(password: str) -> str:
-    return password_context.hash(password)
+class PasswordHasherBusy(Exception):
+    """Raised when the password hashing pool already has too much queued work."""
+
+
+def _timed(operation: str, func, *args):
+    # Runs on the pool thread, so queueing for a worker isn't counted
+    started = time.perf_counter()
+    try:
+        return func(*args)
+    finally:
+        password_hash_duration.labels(operation).observe(time.perf_counter() - started)
+
+
+async def _run_password_job(operation: str, func, *args):
+    global _password_jobs_pending
+    if _password_jobs_pending >= PASSWORD_HASH_MAX_PENDING:
+        password_hash_rejected.inc()
+        raise PasswordHasherBusy()
+    _password_jobs_pending += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_password_executor, _timed, operation, func, *args)
+    finally:
+        _password_jobs_pending -= 1
 
 
-def verify_password(password: str, hashed_pass: str) -> bool:
-    return password_context.verify(password, hashed_pass)
+async def get_hashed_password_async(password: str) -> str:
+    return await _run_password_job("hash", password_context.hash, password)
+
+
+async def verify_and_update_password(password: str, hashed_pass: str) -> tuple[bool, str | None]:
+    """Verify off the event loop; also returns a new hash when the stored one uses outdated settings."""
+    return await _run_password_job("verify", password_context.verify_and_update, password, hashed_pass)
+
+
+def password_pool_stats() -> dict[str, int]:
+    return {
+        "workers": PASSWORD_HASH_WORKERS,
+        "pending": _password_jobs_pending,
+        "max_pending": PASSWORD_HASH_MAX_PENDING,
+    }
+
+
+Gauge("password_hash_pool", "Password hashing pool size and queued work.", labelnames=("stat",), collect=password_pool_stats)
 
 
 def create_access_token(
@@ -30,8 +88,6 @@ def create_access_token(
     else:
         expires_at = datetime.now(UTC) + timedelta(days=30)
 
-    print(expires_at)
-
     encode = {"sub": email, "id": user_id, }
     encode.update({"exp": expires_at})
     encoded_jwt = jwt.encode(encode, JWT_SECRET_KEY, ALGORITHM)
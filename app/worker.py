@@ -0,0 +1,38 @@
+"""Job worker process, for running app.jobs outside the web processes.
+
+    JOB_WORKERS_IN_PROCESS=false uvicorn app.main:app ...
+    python -m app.worker
+
+Runs JOB_WORKERS workers until SIGINT/SIGTERM; jobs they were running go back
+to the queue.
+"""
+import asyncio
+import logging
+import signal
+
+# Imported for their @job_handler registrations
+import app.render_cache  # noqa: F401
+import app.storage  # noqa: F401
+import app.stripe_events  # noqa: F401
+from app.database import engine
+from app.jobs import JOB_WORKERS, start_job_workers, stop_job_workers
+from app.pdf import shutdown_pdf_pool
+
+
+async def main():
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stopping.set)
+
+    start_job_workers(JOB_WORKERS)
+    logging.getLogger(__name__).info(f"Running {JOB_WORKERS} job workers")
+    await stopping.wait()
+    await stop_job_workers()
+    shutdown_pdf_pool()
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
@@ -0,0 +1,12 @@
+import os
+
+# Before the app is imported: no job workers in the test process, cheap bcrypt
+os.environ.setdefault("JOB_WORKERS_IN_PROCESS", "false")
+os.environ.setdefault("BCRYPT_ROUNDS", "5")
+
+import pytest
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
@@ -0,0 +1,37 @@
+from typing import Annotated
+
+from fastapi import Depends, FastAPI, HTTPException
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import after_commit, after_rollback, get_async_db
+
+
+def build_app(events: list[str]) -> FastAPI:
+    app = FastAPI()
+    db_dep = Annotated[AsyncSession, Depends(get_async_db)]
+
+    async def record(event: str):
+        events.append(event)
+
+    @app.post("/{outcome}")
+    async def handler(outcome: str, db: db_dep):
+        after_commit(db, lambda: record("after_commit"))
+        after_rollback(db, lambda: record("after_rollback"))
+        if outcome == "fail":
+            raise HTTPException(status_code=412)
+        return {}
+
+    return app
+
+
+def test_after_commit_callbacks_run_when_the_request_succeeds():
+    events = []
+    assert TestClient(build_app(events)).post("/ok").status_code == 200
+    assert events == ["after_commit"]
+
+
+def test_after_rollback_callbacks_run_when_the_request_fails():
+    events = []
+    assert TestClient(build_app(events)).post("/fail").status_code == 412
+    assert events == ["after_rollback"]
@@ -0,0 +1,143 @@
+"""The Postgres-rendered resume document against the schemas.Resume path,
+and the section syncs behind the */multi/ PUTs that feed it.
+
+Needs a scratch Postgres database in TEST_DATABASE_URL (postgresql+psycopg://...);
+the tables are created in a transaction that is rolled back at the end.
+"""
+import os
+from datetime import date, datetime, timezone
+
+import orjson
+import pytest
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app.documents import get_resume_document, get_user_resume_documents
+from app.models import Base
+from app.models.resume import DrivingLicense, Education, Experience, LanguageSkill, Others, Resume, TrainingAward
+from app.models.users import User
+from app.responses import ORJSONResponse
+from app.schemas import resume as schemas
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+pytestmark = [
+    pytest.mark.anyio,
+    pytest.mark.skipif(not TEST_DATABASE_URL, reason="TEST_DATABASE_URL is not set"),
+]
+
+
+@pytest.fixture
+async def session():
+    engine = create_async_engine(TEST_DATABASE_URL)
+    async with engine.connect() as connection:
+        transaction = await connection.begin()
+        await connection.run_sync(Base.metadata.create_all)
+        await connection.execute(text("SET LOCAL TIME ZONE 'UTC'"))
+        yield AsyncSession(bind=connection, expire_on_commit=False)
+        await transaction.rollback()
+    await engine.dispose()
+
+
+async def add_resume(session: AsyncSession, email: str, **fields) -> Resume:
+    user = User(first_name="Zoë", last_name="Ørsted", email=email, password="x", phone="+44 1", is_active=True)
+    session.add(user)
+    await session.flush()
+    resume = Resume(user_id=user.id, resume_title="Backend engineer", **fields)
+    session.add(resume)
+    await session.flush()
+    return resume
+
+
+def expected_document(resume: Resume) -> schemas.Resume:
+    model = schemas.Resume.model_validate(resume)
+    # Only experiences have an ordered relationship; documents order every section by id
+    for section in ("experiences", "education", "driving_license", "training_awards", "others"):
+        getattr(model, section).sort(key=lambda item: item.id)
+    return model
+
+
+async def load(session: AsyncSession, resume_id: int) -> Resume:
+    session.expunge_all()
+    return (await session.execute(select(Resume).where(Resume.id == resume_id))).scalar_one()
+
+
+async def test_document_matches_the_schema_and_orjson_response(session):
+    resume = await add_resume(
+        session,
+        "zoe@example.com",
+        first_name="Zoë",
+        city='São "Paulo"\n',
+        resume_image_variants={"thumb": "/t/ä.webp", "large": "/l.webp"},
+        date_of_birth=date(1990, 2, 28),
+    )
+    session.add_all([
+        Experience(resume_id=resume.id, employer="Acme ✓", location="Berlin", occupation="Dev",
+                   from_date=date(2020, 1, 1), responsibilities="Ship </script> things"),
+        Experience(resume_id=resume.id, employer="Initech", location="Austin", occupation="Dev",
+                   from_date=date(2018, 5, 1), to_date=date(2019, 12, 31), currently_working=False,
+                   responsibilities="TPS reports"),
+        Education(resume_id=resume.id, title_of_qualification="BSc", organization_name="Uni",
+                  from_date=date(2014, 9, 1), city="Leeds", country="UK"),
+        LanguageSkill(resume_id=resume.id, language="English", other_languages="Deutsch, 日本語"),
+        DrivingLicense(resume_id=resume.id, license_type="B", license_issued_date=date(2012, 3, 4),
+                       license_expiry_date=date(2032, 3, 4)),
+        TrainingAward(resume_id=resume.id, title="Award", awarding_institute="Inst",
+                      from_date=date(2021, 6, 1), location="Online"),
+        Others(resume_id=resume.id, sectiontitle="Hobbies", title="Chess", description="\t1. e4"),
+    ])
+    await session.flush()
+    # Both a timestamp with and without microseconds
+    await session.execute(
+        Resume.__table__.update().where(Resume.id == resume.id)
+        .values(updated_at=datetime(2026, 10, 18, 12, 30, 15, 120, tzinfo=timezone.utc))
+    )
+
+    resume = await load(session, resume.id)
+    model = expected_document(resume)
+    document = (await get_resume_document(session, resume.id, resume.user_id)).document
+
+    assert document == model.model_dump_json()
+    assert orjson.loads(document) == orjson.loads(ORJSONResponse(model.model_dump()).body)
+
+
+async def test_empty_sections_and_the_list_document(session):
+    first = await add_resume(session, "a@example.com")
+    second = await add_resume(session, "b@example.com", resume_image_variants={})
+
+    for resume_id in (first.id, second.id):
+        resume = await load(session, resume_id)
+        document = (await get_resume_document(session, resume.id, resume.user_id)).document
+        assert document == expected_document(resume).model_dump_json()
+
+    rows = await get_user_resume_documents(session, first.user_id)
+    assert [orjson.loads(row.document)["id"] for row in rows] == [first.id]
+    assert await get_resume_document(session, first.id, second.user_id) is None
+
+
+async def test_a_multi_put_keeps_the_fields_an_existing_item_leaves_out(session):
+    resume = await add_resume(session, "c@example.com")
+    experience = Experience(resume_id=resume.id, employer="Acme", website="https://acme.example", location="Berlin",
+                            occupation="Dev", from_date=date(2020, 1, 1), to_date=date(2022, 1, 1),
+                            currently_working=False, about_company="Anvils", responsibilities="Ship")
+    session.add(experience)
+    await session.flush()
+
+    # What the router passes on for {"id": ..., "employer": ...} and a new item
+    items = [
+        schemas.ExperienceUpdate.model_validate({"id": experience.id, "employer": "Acme Ltd", "location": "Berlin",
+                                                 "occupation": "Dev", "from_date": "2020-01-01",
+                                                 "responsibilities": "Ship"}),
+        schemas.ExperienceUpdate.model_validate({"id": experience.id, "occupation": "Lead dev", "location": "Berlin",
+                                                 "employer": "Acme Ltd", "from_date": "2020-01-01",
+                                                 "responsibilities": "Ship"}),
+        schemas.ExperienceUpdate.model_validate({"employer": "Initech", "location": "Austin", "occupation": "Dev",
+                                                 "from_date": "2023-01-01", "responsibilities": "TPS"}),
+    ]
+    await Experience.sync_for_resume(session, resume.id, [item.model_dump(exclude_unset=item.id is not None) for item in items])
+
+    document = orjson.loads((await get_resume_document(session, resume.id, resume.user_id)).document)
+    kept, added = document["experiences"]
+    assert (kept["employer"], kept["occupation"]) == ("Acme Ltd", "Lead dev")
+    assert (kept["website"], kept["to_date"], kept["about_company"]) == ("https://acme.example", "2022-01-01", "Anvils")
+    assert (added["employer"], added["website"], added["to_date"]) == ("Initech", None, None)
@@ -0,0 +1,129 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+
+from app import jobs
+from sqlalchemy.dialects import postgresql
+
+from app.jobs import JOB_HANDLERS, JOB_LEASE, JOB_PRUNE_BATCH, JOB_TIMEOUT_SECONDS, prune_finished_jobs, run_next_job
+from app.models.job import Job
+
+LEASE_END = datetime(2026, 10, 18, 12, 5, tzinfo=timezone.utc)
+
+
+class FakeSession:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def commit(self):
+        pass
+
+
+@pytest.fixture
+def outcomes(monkeypatch):
+    """Calls of the Job methods the runner records outcomes with."""
+    calls = []
+
+    def recorder(name):
+        async def record(cls, db, *args):
+            calls.append((name, *args))
+        return classmethod(record)
+
+    monkeypatch.setattr(jobs, "AsyncSessionFactory", FakeSession)
+    for name in ("release", "mark_failed", "mark_succeeded"):
+        monkeypatch.setattr(Job, name, recorder(name))
+    return calls
+
+
+def claim(monkeypatch, name: str, attempts: int = 1):
+    job = SimpleNamespace(id=7, name=name, payload={}, attempts=attempts, max_attempts=5, locked_until=LEASE_END)
+
+    async def claim_next(cls, db, lease):
+        return job
+
+    monkeypatch.setattr(Job, "claim_next", classmethod(claim_next))
+
+
+@pytest.mark.anyio
+async def test_a_job_interrupted_by_shutdown_is_released_without_using_an_attempt(monkeypatch, outcomes):
+    started = asyncio.Event()
+
+    async def slow(payload: dict):
+        started.set()
+        await asyncio.sleep(60)
+
+    monkeypatch.setitem(JOB_HANDLERS, "test.slow", slow)
+    claim(monkeypatch, "test.slow")
+    task = asyncio.create_task(run_next_job())
+    await started.wait()
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    assert outcomes == [("release", 7, LEASE_END)]
+
+
+@pytest.mark.anyio
+async def test_a_failing_job_is_retried_with_backoff(monkeypatch, outcomes):
+    async def broken(payload: dict):
+        raise KeyError("user_id")
+
+    monkeypatch.setitem(JOB_HANDLERS, "test.broken", broken)
+    claim(monkeypatch, "test.broken", attempts=2)
+    assert await run_next_job()
+
+    [(name, id, error, retry_in)] = outcomes
+    assert (name, id, error) == ("mark_failed", 7, "KeyError('user_id')")
+    assert retry_in > timedelta(0)
+
+
+@pytest.mark.anyio
+async def test_pruning_deletes_in_batches_until_nothing_is_left(monkeypatch):
+    remaining = {"succeeded": 2 * JOB_PRUNE_BATCH + 5, "failed": 3}
+    batches = []
+
+    async def fail_exhausted(cls, db):
+        batches.append("fail_exhausted")
+        return 1
+
+    async def delete_finished(cls, db, status, older_than, limit):
+        count = min(remaining[status], limit)
+        remaining[status] -= count
+        batches.append((status, older_than, count))
+        return count
+
+    monkeypatch.setattr(jobs, "AsyncSessionFactory", FakeSession)
+    monkeypatch.setattr(Job, "delete_finished", classmethod(delete_finished))
+    monkeypatch.setattr(Job, "fail_exhausted", classmethod(fail_exhausted))
+
+    assert await prune_finished_jobs() == 2 * JOB_PRUNE_BATCH + 8
+    # Jobs that died on their last attempt are failed first, to be pruned in turn
+    assert batches.pop(0) == "fail_exhausted"
+    assert remaining == {"succeeded": 0, "failed": 0}
+    assert [(status, count) for status, _, count in batches] == [
+        ("succeeded", JOB_PRUNE_BATCH), ("succeeded", JOB_PRUNE_BATCH), ("succeeded", 5), ("failed", 3),
+    ]
+    assert batches[0][1] == jobs.JOB_RETENTION["succeeded"] < batches[-1][1] == jobs.JOB_RETENTION["failed"]
+
+
+def test_handlers_time_out_before_their_lease_runs_out():
+    assert 0 < JOB_TIMEOUT_SECONDS <= JOB_LEASE.total_seconds() - 30
+
+
+@pytest.mark.anyio
+async def test_an_expired_lease_is_only_claimed_again_while_attempts_are_left():
+    statements = []
+
+    class Session:
+        async def execute(self, statement):
+            statements.append(statement)
+            return SimpleNamespace(scalar_one_or_none=lambda: None)
+
+    await Job.claim_next(Session(), JOB_LEASE)
+    sql = str(statements[0].compile(dialect=postgresql.dialect()))
+    assert "status = 'running' AND jobs.locked_until < now() AND jobs.attempts < jobs.max_attempts" in sql
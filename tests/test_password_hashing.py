@@ -0,0 +1,77 @@
+import asyncio
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+from passlib.context import CryptContext
+
+from app import utils
+from app.main import app
+from app.metrics import password_hash_rejected
+from app.models.users import User
+
+SIGNUP = {
+    "first_name": "Ada",
+    "last_name": "Lovelace",
+    "email": "ada@example.com",
+    "phone": "0",
+    "password": "secret",
+    "password2": "secret",
+}
+
+
+def email_taken(monkeypatch, taken: bool):
+    async def get_by_email(cls, db, email):
+        return User(id=7, email=email) if taken else None
+
+    monkeypatch.setattr(User, "get_by_email", classmethod(get_by_email))
+
+
+@pytest.mark.anyio
+async def test_hash_and_verify_off_the_event_loop():
+    hashed = await utils.get_hashed_password_async("secret")
+    assert await utils.verify_and_update_password("secret", hashed) == (True, None)
+    assert (await utils.verify_and_update_password("wrong", hashed))[0] is False
+
+
+@pytest.mark.anyio
+async def test_outdated_hash_is_upgraded():
+    cheaper = CryptContext(schemes=["bcrypt"], bcrypt__default_rounds=utils.BCRYPT_ROUNDS - 1).hash("secret")
+    verified, new_hash = await utils.verify_and_update_password("secret", cheaper)
+    assert verified
+    assert new_hash is not None and utils.password_context.verify("secret", new_hash)
+
+
+@pytest.mark.anyio
+async def test_pool_rejects_work_beyond_max_pending(monkeypatch):
+    monkeypatch.setattr(utils, "PASSWORD_HASH_MAX_PENDING", 2)
+    release = threading.Event()
+    running = [asyncio.ensure_future(utils._run_password_job("hash", release.wait)) for _ in range(2)]
+    await asyncio.sleep(0)
+    rejected = password_hash_rejected.value
+    try:
+        with pytest.raises(utils.PasswordHasherBusy):
+            await utils._run_password_job("hash", release.wait)
+        assert password_hash_rejected.value == rejected + 1
+        assert utils.password_pool_stats()["pending"] == 2
+    finally:
+        release.set()
+        await asyncio.gather(*running)
+    assert utils.password_pool_stats()["pending"] == 0
+
+
+def test_signup_answers_503_when_the_pool_is_full(monkeypatch):
+    email_taken(monkeypatch, False)
+    monkeypatch.setattr(utils, "_password_jobs_pending", utils.PASSWORD_HASH_MAX_PENDING)
+    response = TestClient(app).post("/auth/signup", json=SIGNUP)
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+
+def test_duplicate_signup_is_refused_without_hashing(monkeypatch):
+    email_taken(monkeypatch, True)
+    # A hash would be refused; the taken email is answered before one is needed
+    monkeypatch.setattr(utils, "_password_jobs_pending", utils.PASSWORD_HASH_MAX_PENDING)
+    response = TestClient(app).post("/auth/signup", json=SIGNUP)
+    assert response.status_code == 403
+    assert response.json() == {"detail": "User Already Exists"}
@@ -0,0 +1,144 @@
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import cache
+from app.cache import CachedResponse, LRUResponseCache, NullResponseCache, RedisResponseCache, resume_cache_key
+from app.main import app
+from app.models.resume import Resume
+from app.routers import resume as resume_router
+from app.utils import create_access_token
+
+
+class FakeRedis:
+    """The part of redis.asyncio.Redis the cache uses."""
+
+    def __init__(self):
+        self.values = {}
+
+    async def get(self, key):
+        return self.values.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.values[key] = value
+
+    async def delete(self, *keys):
+        for key in keys:
+            self.values.pop(key, None)
+
+
+BACKENDS = [lambda: LRUResponseCache(), lambda: RedisResponseCache(client=FakeRedis())]
+RESPONSE = CachedResponse(b'{"id":1}', {"ETag": '"resume-1-v3"', "Cache-Control": "private, no-cache"})
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("backend", BACKENDS, ids=["memory", "redis"])
+async def test_get_set_delete(backend):
+    response_cache = backend()
+    key = resume_cache_key(7, 1, 3)
+    assert await response_cache.get(key) is None
+    await response_cache.set(key, RESPONSE)
+    assert await response_cache.get(key) == RESPONSE
+    assert await response_cache.get(resume_cache_key(7, 1, 4)) is None
+    await response_cache.delete(key)
+    assert await response_cache.get(key) is None
+
+
+@pytest.mark.anyio
+async def test_a_broken_backend_degrades_to_misses():
+    class BrokenRedis(FakeRedis):
+        async def get(self, key):
+            raise ConnectionError()
+
+    response_cache = RedisResponseCache(client=BrokenRedis())
+    await response_cache.set("key", RESPONSE)
+    assert await response_cache.get("key") is None
+
+
+@pytest.mark.anyio
+async def test_memory_backend_evicts_least_recently_used_beyond_max_bytes():
+    size = len(RESPONSE.to_bytes())
+    response_cache = LRUResponseCache(max_bytes=2 * size)
+    for key in ("a", "b"):
+        await response_cache.set(key, RESPONSE)
+    await response_cache.get("a")
+    await response_cache.set("c", RESPONSE)
+    assert await response_cache.get("b") is None
+    assert await response_cache.get("a") == RESPONSE
+    assert response_cache.size == 2 * size
+
+
+@pytest.mark.anyio
+async def test_memory_backend_expires_entries():
+    response_cache = LRUResponseCache(ttl=-1)
+    await response_cache.set("a", RESPONSE)
+    assert await response_cache.get("a") is None
+
+
+def test_default_backend_caches_nothing_without_redis(monkeypatch):
+    monkeypatch.setattr(cache, "_resume_cache", None)
+    assert cache.RESUME_CACHE_BACKEND == "none"
+    assert isinstance(cache.get_resume_cache(), NullResponseCache)
+
+
+class StoredResume:
+    """Stands in for the resumes row and its rendered document."""
+
+    def __init__(self):
+        self.version = 1
+        self.updated_at = datetime(2026, 10, 18, 12, 0, tzinfo=timezone.utc)
+
+    @property
+    def document(self) -> str:
+        return f'{{"id":1,"version":{self.version}}}'
+
+
+@pytest.fixture
+def stored_resume(monkeypatch):
+    stored = StoredResume()
+    reads = []
+
+    async def get_version(cls, db, resume_id, user_id):
+        return SimpleNamespace(version=stored.version, updated_at=stored.updated_at)
+
+    async def get_resume_document(db, resume_id, user_id):
+        reads.append(stored.version)
+        return SimpleNamespace(document=stored.document, version=stored.version, updated_at=stored.updated_at)
+
+    monkeypatch.setattr(Resume, "get_version", classmethod(get_version))
+    monkeypatch.setattr(resume_router, "get_resume_document", get_resume_document)
+    monkeypatch.setattr(cache, "_resume_cache", LRUResponseCache())
+    stored.reads = reads
+    return stored
+
+
+def test_get_resume_is_served_from_the_cache_until_the_version_changes(stored_resume):
+    client = TestClient(app, headers={"Authorization": f"Bearer {create_access_token('ada@example.com', 7)}"})
+    first = client.get("/resumes/1")
+    assert first.json() == {"id": 1, "version": 1}
+    assert client.get("/resumes/1").json() == {"id": 1, "version": 1}
+    assert stored_resume.reads == [1]
+
+    # Another worker committed a change; nothing invalidated this cache
+    stored_resume.version = 2
+    second = client.get("/resumes/1", headers={"If-None-Match": first.headers["ETag"]})
+    assert second.status_code == 200
+    assert second.json() == {"id": 1, "version": 2}
+    assert second.headers["ETag"] == '"resume-1-v2"'
+    assert client.get("/resumes/1", headers={"If-None-Match": second.headers["ETag"]}).status_code == 304
+
+
+def test_a_read_racing_a_write_caches_under_the_version_it_read(stored_resume, monkeypatch):
+    client = TestClient(app, headers={"Authorization": f"Bearer {create_access_token('ada@example.com', 7)}"})
+
+    # The version check sees v1, but the write commits before the document is read
+    async def get_version(cls, db, resume_id, user_id):
+        version = stored_resume.version
+        stored_resume.version = 2
+        return SimpleNamespace(version=version, updated_at=stored_resume.updated_at)
+
+    monkeypatch.setattr(Resume, "get_version", classmethod(get_version))
+    assert client.get("/resumes/1").json() == {"id": 1, "version": 2}
+    assert cache._resume_cache._entries.keys() == {resume_cache_key(7, 1, 2)}
@@ -0,0 +1,78 @@
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.sql import Delete, Insert, Select, Update
+
+from app.models.resume import Experience, SectionItemNotFound
+
+
+class RecordingSession:
+    """Records the statements of a section sync; every id it is asked about exists."""
+
+    def __init__(self, missing: set[int] = frozenset()):
+        self.missing = missing
+        self.statements = []
+
+    async def execute(self, statement):
+        self.statements.append(statement)
+        rows = []
+        if isinstance(statement, Update):
+            rows = [{"id": row[0]} for row in incoming_rows(statement) if row[0] not in self.missing]
+        elif isinstance(statement, Select):
+            ids = statement.compile(dialect=postgresql.dialect()).params["id_1"]
+            rows = [{"id": id} for id in ids if id not in self.missing]
+        elif isinstance(statement, Insert):
+            rows = [{"id": 100 + n} for n in range(len(statement._multi_values[0]))]
+        return SimpleNamespace(mappings=lambda: SimpleNamespace(all=lambda: rows))
+
+    def updated_columns(self) -> list[set[str]]:
+        return [
+            set(statement._values)
+            for statement in self.statements if isinstance(statement, Update)
+        ]
+
+
+def incoming_rows(statement: Update) -> list[tuple]:
+    # WHERE section.id = incoming.id AND ...
+    incoming = statement._where_criteria[0].right.table
+    return [row for rows in incoming._data for row in rows]
+
+
+EXPERIENCE = {"employer": "Acme", "location": "Berlin", "occupation": "Dev", "from_date": "2020-01-01", "responsibilities": "Ship"}
+
+
+@pytest.mark.anyio
+async def test_updates_only_write_the_fields_they_carry():
+    session = RecordingSession()
+    rows = await Experience.sync_for_resume(session, 1, [
+        {"id": 1, "employer": "Acme Ltd"},
+        {"id": 2, "employer": "Initech", "website": None},
+        {"id": 3, "employer": "Hooli"},
+        {"id": 4},
+        {**EXPERIENCE, "website": None, "to_date": None, "about_company": None, "currently_working": False},
+    ])
+
+    assert isinstance(session.statements[0], Delete)
+    # One UPDATE per set of fields; {"id": 4} only has to exist
+    assert session.updated_columns() == [{"employer"}, {"employer", "website"}]
+    assert [row["id"] for row in rows] == [1, 2, 3, 4, 100]
+
+
+@pytest.mark.anyio
+async def test_an_id_sent_twice_is_one_update_with_the_later_fields_winning():
+    session = RecordingSession()
+    rows = await Experience.sync_for_resume(session, 1, [
+        {"id": 1, "employer": "Acme", "website": "https://acme.example"},
+        {"id": 1, "employer": "Acme Ltd"},
+    ])
+
+    [update] = [statement for statement in session.statements if isinstance(statement, Update)]
+    assert incoming_rows(update) == [(1, "Acme Ltd", "https://acme.example")]
+    assert [row["id"] for row in rows] == [1]
+
+
+@pytest.mark.anyio
+async def test_an_id_of_another_resume_is_not_found():
+    with pytest.raises(SectionItemNotFound):
+        await Experience.sync_for_resume(RecordingSession(missing={2}), 1, [{"id": 1, "employer": "A"}, {"id": 2}])
@@ -0,0 +1,32 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.models.users import User
+from app.utils import create_access_token
+
+EXPORTS = ["/users/export", "/resumes/export"]
+
+
+@pytest.fixture
+def as_user(monkeypatch):
+    def log_in() -> dict:
+        user = User(id=7, email="ada@example.com", is_staff=False, is_superuser=False)
+
+        async def get_by_id(cls, db, id):
+            return user if id == user.id else None
+
+        monkeypatch.setattr(User, "get_by_id", classmethod(get_by_id))
+        return {"Authorization": f"Bearer {create_access_token(user.email, user.id)}"}
+
+    return log_in
+
+
+@pytest.mark.parametrize("path", EXPORTS)
+def test_exports_need_a_login(path):
+    assert TestClient(app).get(path).status_code == 401
+
+
+@pytest.mark.parametrize("path", EXPORTS)
+def test_exports_are_staff_only(path, as_user):
+    assert TestClient(app).get(path, headers=as_user()).status_code == 403
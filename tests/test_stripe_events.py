@@ -0,0 +1,155 @@
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+
+from app import stripe_events
+from app.models.stripe_event import StripeEvent
+from app.models.stripe_payment import StripePayment
+from app.models.users import User
+from app.stripe_events import MAX_ATTEMPTS, MEMBERSHIP_PERIOD, StripeEventsFailed, apply_stripe_events
+
+CREATED = datetime(2026, 10, 18, 12, 0, tzinfo=timezone.utc)
+
+
+class FakeSession:
+    """Grants the consumer lock; the queue itself lives in EventLog."""
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def execute(self, statement):
+        return SimpleNamespace(scalar=lambda: True)
+
+    async def commit(self):
+        pass
+
+    async def rollback(self):
+        pass
+
+
+class EventLog:
+    """The stripe_events table, behind StripeEvent's queue methods."""
+
+    def __init__(self, monkeypatch):
+        self.events = []
+        monkeypatch.setattr(stripe_events, "AsyncSessionFactory", FakeSession)
+        monkeypatch.setattr(StripeEvent, "lock_next_pending", classmethod(lambda cls, db: self.lock_next_pending()))
+        monkeypatch.setattr(StripeEvent, "has_pending", classmethod(lambda cls, db: self.has_pending()))
+        monkeypatch.setattr(StripeEvent, "requeue_retrying", classmethod(lambda cls, db: self.requeue_retrying()))
+        monkeypatch.setattr(
+            StripeEvent, "record_failure",
+            classmethod(lambda cls, db, id, error, max_attempts: self.record_failure(id, max_attempts)),
+        )
+
+    def add(self, type: str, payment_intent: dict, minutes: int = 0):
+        self.events.append(SimpleNamespace(
+            id=f"evt_{len(self.events)}",
+            type=type,
+            payload={"data": {"object": payment_intent}},
+            stripe_created_at=CREATED + timedelta(minutes=minutes),
+            status="pending",
+            attempts=0,
+        ))
+
+    def status(self) -> list[str]:
+        return [event.status for event in self.events]
+
+    async def lock_next_pending(self):
+        pending = [event for event in self.events if event.status == "pending"]
+        return min(pending, key=lambda event: event.stripe_created_at, default=None)
+
+    async def has_pending(self):
+        return any(event.status == "pending" for event in self.events)
+
+    async def requeue_retrying(self):
+        for event in self.events:
+            if event.status == "retrying":
+                event.status = "pending"
+
+    async def record_failure(self, id: str, max_attempts: int):
+        event = next(event for event in self.events if event.id == id)
+        event.attempts += 1
+        event.status = "failed" if event.attempts >= max_attempts else "retrying"
+
+
+@pytest.fixture
+def log(monkeypatch):
+    return EventLog(monkeypatch)
+
+
+@pytest.fixture
+def accounts(monkeypatch):
+    users = {1: SimpleNamespace(expiry_date=None), 2: SimpleNamespace(expiry_date=None)}
+    payments = {"pi_1": SimpleNamespace(status="pending"), "pi_2": SimpleNamespace(status="pending")}
+
+    async def get_by_id(cls, db, id):
+        return users.get(id)
+
+    async def get_by_intent_id(cls, db, intent_id):
+        return payments.get(intent_id)
+
+    async def update(cls, db, intent_id, **kwargs):
+        payment = payments.get(intent_id)
+        if payment:
+            vars(payment).update(kwargs)
+        return payment
+
+    monkeypatch.setattr(User, "get_by_id", classmethod(get_by_id))
+    monkeypatch.setattr(StripePayment, "get_by_intent_id", classmethod(get_by_intent_id))
+    monkeypatch.setattr(StripePayment, "update", classmethod(update))
+    return SimpleNamespace(users=users, payments=payments)
+
+
+@pytest.mark.anyio
+async def test_a_failing_event_does_not_block_the_events_behind_it(log, accounts):
+    # No user_id in the metadata: KeyError
+    log.add("payment_intent.succeeded", {"id": "pi_x", "metadata": {}}, minutes=0)
+    log.add("payment_intent.succeeded", {"id": "pi_1", "metadata": {"user_id": "1"}}, minutes=1)
+    log.add("payment_intent.payment_failed", {"id": "pi_2", "last_payment_error": {"code": "card_declined"}}, minutes=2)
+
+    # The job fails so the job runner retries it with backoff...
+    with pytest.raises(StripeEventsFailed):
+        await apply_stripe_events({})
+
+    # ... but only after the events behind the bad one were applied
+    assert log.status() == ["retrying", "processed", "processed"]
+    assert accounts.payments["pi_1"].status == "succeeded"
+    assert accounts.users[1].expiry_date == CREATED + timedelta(minutes=1) + MEMBERSHIP_PERIOD
+    assert accounts.payments["pi_2"].failure_code == "card_declined"
+
+
+@pytest.mark.anyio
+async def test_a_parked_event_is_retried_once_per_run_until_it_fails_for_good(log, accounts):
+    log.add("payment_intent.succeeded", {"id": "pi_x", "metadata": {}})
+
+    for attempt in range(1, MAX_ATTEMPTS):
+        with pytest.raises(StripeEventsFailed):
+            await apply_stripe_events({})
+        assert (log.events[0].status, log.events[0].attempts) == ("retrying", attempt)
+
+    with pytest.raises(StripeEventsFailed):
+        await apply_stripe_events({})
+    assert (log.events[0].status, log.events[0].attempts) == ("failed", MAX_ATTEMPTS)
+
+    # Given up on: later runs leave it alone
+    await apply_stripe_events({})
+    assert log.events[0].attempts == MAX_ATTEMPTS
+
+
+@pytest.mark.anyio
+async def test_events_applied_late_do_not_undo_newer_ones(log, accounts):
+    newer_expiry = CREATED + timedelta(days=30) + MEMBERSHIP_PERIOD
+    accounts.users[1].expiry_date = newer_expiry
+    accounts.payments["pi_1"].status = "succeeded"
+    log.add("payment_intent.succeeded", {"id": "pi_2", "metadata": {"user_id": "1"}})
+    log.add("payment_intent.payment_failed", {"id": "pi_1", "last_payment_error": {}})
+
+    await apply_stripe_events({})
+
+    assert log.status() == ["processed", "processed"]
+    assert accounts.users[1].expiry_date == newer_expiry
+    assert accounts.payments["pi_1"].status == "succeeded"
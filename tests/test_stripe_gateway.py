@@ -0,0 +1,72 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.metrics import stripe_request_duration
+from app.stripe_gateway import FakeStripeGateway, StripeGateway
+
+INTENT = {
+    "amount": 4999,
+    "currency": "gbp",
+    "receipt_email": "ada@example.com",
+    "description": "Referred by: Individual",
+    "metadata": {"user_id": 1},
+}
+
+
+@pytest.mark.anyio
+async def test_fake_gateway_reuses_the_intent_for_a_repeated_key():
+    gateway = FakeStripeGateway()
+    first = await gateway.create_payment_intent(**INTENT, idempotency_key="payment-intent-1-abc")
+    again = await gateway.create_payment_intent(**INTENT, idempotency_key="payment-intent-1-abc")
+    other = await gateway.create_payment_intent(**INTENT, idempotency_key="payment-intent-1-def")
+    assert again == first
+    assert other.id != first.id
+    assert len(gateway.payment_intents) == 2
+
+
+@pytest.mark.anyio
+async def test_fake_gateway_without_a_key_creates_a_new_intent_each_time():
+    gateway = FakeStripeGateway()
+    first = await gateway.create_payment_intent(**INTENT)
+    second = await gateway.create_payment_intent(**INTENT)
+    assert first.id != second.id
+
+
+def stub_sdk(gateway: StripeGateway, delay: float = 0) -> list[dict]:
+    calls = []
+
+    async def create_async(params, options):
+        calls.append({"params": params, "options": options})
+        await asyncio.sleep(delay)
+        return SimpleNamespace(id="pi_123", client_secret="pi_123_secret")
+
+    gateway._client = SimpleNamespace(payment_intents=SimpleNamespace(create_async=create_async))
+    return calls
+
+
+@pytest.mark.anyio
+async def test_gateway_sends_the_idempotency_key_to_stripe():
+    gateway = StripeGateway("sk_test")
+    calls = stub_sdk(gateway)
+    intent = await gateway.create_payment_intent(**INTENT, idempotency_key="payment-intent-1-abc")
+    await gateway.create_payment_intent(**INTENT)
+    await gateway.close()
+
+    assert (intent.id, intent.client_secret) == ("pi_123", "pi_123_secret")
+    assert calls[0]["params"] == INTENT
+    assert calls[0]["options"] == {"idempotency_key": "payment-intent-1-abc"}
+    # Without a key one is generated, so the SDK's own retries stay idempotent
+    assert calls[1]["options"]["idempotency_key"]
+
+
+@pytest.mark.anyio
+async def test_gateway_times_out():
+    gateway = StripeGateway("sk_test", timeout=0.01)
+    stub_sdk(gateway, delay=1)
+    timeouts = stripe_request_duration.labels("payment_intents.create", "timeout").snapshot()["count"]
+    with pytest.raises(asyncio.TimeoutError):
+        await gateway.create_payment_intent(**INTENT)
+    await gateway.close()
+    assert stripe_request_duration.labels("payment_intents.create", "timeout").snapshot()["count"] == timeouts + 1
@@ -0,0 +1,78 @@
+import hashlib
+import hmac
+import time
+
+import orjson
+import pytest
+import stripe
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.models.stripe_event import StripeEvent
+from app.routers import stripe_payment
+
+SECRET = "whsec_test"
+EVENT = {
+    "id": "evt_1",
+    "type": "payment_intent.succeeded",
+    "created": 1_760_000_000,
+    "data": {"object": {"id": "pi_1", "metadata": {"user_id": "7"}}},
+}
+
+
+def signed(body: bytes, timestamp: int | None = None) -> dict:
+    timestamp = int(time.time()) if timestamp is None else timestamp
+    signature = hmac.new(SECRET.encode(), f"{timestamp}.".encode() + body, hashlib.sha256).hexdigest()
+    return {"stripe-signature": f"t={timestamp},v1={signature}", "content-type": "application/json"}
+
+
+@pytest.fixture
+def recorded(monkeypatch):
+    events = []
+
+    async def record(cls, db, **event):
+        events.append(event)
+        return True
+
+    async def enqueue_job(db, name, payload, **options):
+        events.append(name)
+
+    monkeypatch.setattr(stripe_payment, "endpoint_secret", SECRET)
+    monkeypatch.setattr(StripeEvent, "record", classmethod(record))
+    monkeypatch.setattr(stripe_payment, "enqueue_job", enqueue_job)
+    return events
+
+
+def post(body: bytes, headers: dict):
+    return TestClient(app).post("/stripe-payments/webhook/", content=body, headers=headers)
+
+
+def test_a_signed_event_is_recorded_as_sent(recorded, monkeypatch):
+    # The payload is parsed once, by orjson; construct_event would parse it with json too
+    def construct_event(*args, **kwargs):
+        raise AssertionError("construct_event parses the payload again")
+
+    monkeypatch.setattr(stripe.Webhook, "construct_event", construct_event)
+    body = orjson.dumps(EVENT)
+    response = post(body, signed(body))
+    assert response.status_code == 200
+    [event, job] = recorded
+    assert (event["id"], event["type"], event["payload"]) == ("evt_1", "payment_intent.succeeded", EVENT)
+    assert job == stripe_payment.APPLY_EVENTS_JOB
+
+
+@pytest.mark.parametrize("headers", [
+    {},
+    {"stripe-signature": "t=1,v1=0"},
+    signed(orjson.dumps(EVENT), timestamp=int(time.time()) - 3600),
+], ids=["missing", "wrong", "replayed"])
+def test_unsigned_or_stale_events_are_refused(recorded, headers):
+    response = post(orjson.dumps(EVENT), headers)
+    assert (response.status_code, response.json()) == (400, {"detail": "Invalid signature"})
+    assert recorded == []
+
+
+def test_a_signed_body_that_is_not_json_is_refused(recorded):
+    body = b'{"id": "evt_1",'
+    response = post(body, signed(body))
+    assert (response.status_code, response.json()) == (400, {"detail": "Invalid payload"})